@@ -0,0 +1,67 @@
+'''
+Measure CommandExecutor's per-job overhead by running many trivial `true` jobs
+
+Run from the repository root with:
+
+    python -m benchmark.bench_command_executor_queue --num-jobs 100000 --num-parallel-jobs 64
+'''
+
+import argparse
+import time
+
+from cppbuild.command_executor import CommandExecutor, CommandJob, DrainMode, all_are_finished
+
+
+def run_benchmark(*, drain_mode: DrainMode, num_jobs: int, num_parallel_jobs: int) -> dict:
+	'''
+	Run the specified number of `true` jobs through a CommandExecutor and return the measurements
+
+	:param drain_mode        : The drain mode to use
+	:param num_jobs          : The total number of jobs to run
+	:param num_parallel_jobs : The number of jobs to run in parallel
+	'''
+	command_executor = CommandExecutor(num_parallel_jobs=num_parallel_jobs, drain_mode=drain_mode)
+
+	start_time = time.monotonic()
+	command_executor.extend_queue(CommandJob(command=['true']) for _ in range(num_jobs))
+	update_time = 0.0
+	num_updates = 0
+	while not all_are_finished(command_executor):
+		command_executor.wait_for_completion()
+		update_start_time = time.monotonic()
+		command_executor.update()
+		update_time += time.monotonic() - update_start_time
+		num_updates += 1
+	wall_time = time.monotonic() - start_time
+	command_executor.close()
+
+	return {
+		'drain_mode'        : drain_mode.name,
+		'wall_time_s'       : wall_time,
+		'jobs_per_s'        : num_jobs / wall_time,
+		'num_updates'       : num_updates,
+		'mean_update_us'    : 1e6 * update_time / max(1, num_updates),
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-jobs',          type=int, default=100000, help='The total number of jobs to run')
+	parser.add_argument('--num-parallel-jobs', type=int, default=64,     help='The number of jobs to run in parallel')
+	args = parser.parse_args()
+
+	print(f'{"drain_mode":<10} {"wall_time_s":>11} {"jobs_per_s":>10} {"num_updates":>11} {"mean_update_us":>14}')
+	for drain_mode in DrainMode:
+		result = run_benchmark(
+			drain_mode=drain_mode,
+			num_jobs=args.num_jobs,
+			num_parallel_jobs=args.num_parallel_jobs,
+		)
+		print(
+			f'{result["drain_mode"]:<10} {result["wall_time_s"]:>11.3f} {result["jobs_per_s"]:>10.1f} '
+			f'{result["num_updates"]:>11} {result["mean_update_us"]:>14.1f}'
+		)
+
+
+if __name__ == '__main__':
+	main()
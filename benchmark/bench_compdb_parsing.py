@@ -0,0 +1,158 @@
+'''
+Compare the parse time and peak memory of a synthetic `ninja -t compdb` dump as a list of NinjaCompDBRecords
+against as a ColumnarCompDB (parsed from one whole string and streamed line by line)
+
+Run from the repository root with:
+
+    python -m benchmark.bench_compdb_parsing --num-entries 80000 --num-targets 400 --num-flags 150
+'''
+
+import argparse
+import json
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Callable, Sized
+
+from cppbuild.columnar_compdb import (
+	columnar_compdb_of_compdb_dicts,
+	columnar_compdb_of_compdb_lines,
+	columnar_compdb_of_compdb_str,
+	iter_compdb_dicts,
+)
+from cppbuild.ninja_call import compdb_of_compdb_str
+
+
+def write_synthetic_compdb(out_path: Path, *, num_entries: int, num_targets: int, num_flags: int) -> None:
+	'''
+	Write a synthetic `ninja -t compdb` dump to the specified file, in which the entries of each target
+	share their compiler, defines, includes and flags
+
+	:param out_path    : The file to write
+	:param num_entries : The number of entries to write
+	:param num_targets : The number of targets between which the entries are spread
+	:param num_flags   : The number of defines/includes/flags in each command
+	'''
+	with open(out_path, 'w') as out_fh:
+		out_fh.write('[\n')
+		for entry_index in range(num_entries):
+			target_index = entry_index % num_targets
+			flags = ' '.join(
+				f'-I/project/source/target_{target_index}/include/component_{flag_index}'
+				for flag_index in range(num_flags)
+			)
+			source = f'../source/target_{target_index}/file_{entry_index}.cpp'
+			output = f'source/target_{target_index}/CMakeFiles/target_{target_index}.dir/file_{entry_index}.cpp.o'
+			out_fh.write(('' if entry_index == 0 else ',\n') + json.dumps({
+				'directory': '/project/build',
+				'command': f'/usr/bin/c++ -DTARGET_{target_index} {flags} -O2 -o {output} -c {source}',
+				'file': source,
+				'output': output,
+			}, indent='\t'))
+		out_fh.write('\n]\n')
+
+
+def records_from_whole_string(dump_path: Path) -> Sized:
+	'''
+	Read the dump as get_ninja_compdb_for_dir() does (capturing the whole output as a str) and make NinjaCompDBRecords
+
+	:param dump_path : The dump to read
+	'''
+	whole_str = subprocess.run(['cat', str(dump_path)], capture_output=True, check=True, text=True).stdout
+	return compdb_of_compdb_str(whole_str)
+
+
+def columnar_from_whole_string(dump_path: Path) -> Sized:
+	'''
+	Read the dump as a whole str but parse it incrementally into a ColumnarCompDB
+
+	:param dump_path : The dump to read
+	'''
+	whole_str = subprocess.run(['cat', str(dump_path)], capture_output=True, check=True, text=True).stdout
+	return columnar_compdb_of_compdb_str(whole_str)
+
+
+def columnar_from_stream_via_json_decoder(dump_path: Path) -> Sized:
+	'''
+	Stream the dump through a pipe into a ColumnarCompDB, JSON-decoding each object with iter_compdb_dicts()
+
+	:param dump_path : The dump to read
+	'''
+	with subprocess.Popen(['cat', str(dump_path)], stdout=subprocess.PIPE, text=True) as popen:
+		assert popen.stdout is not None
+		return columnar_compdb_of_compdb_dicts(iter_compdb_dicts(popen.stdout))
+
+
+def columnar_from_stream(dump_path: Path) -> Sized:
+	'''
+	Stream the dump through a pipe into a ColumnarCompDB as get_columnar_compdb_for_dir() does (reading a field per line)
+
+	:param dump_path : The dump to read
+	'''
+	with subprocess.Popen(['cat', str(dump_path)], stdout=subprocess.PIPE, text=True) as popen:
+		assert popen.stdout is not None
+		return columnar_compdb_of_compdb_lines(popen.stdout)
+
+
+def lines_only_from_stream(dump_path: Path) -> Sized:
+	'''
+	Only read the lines of the dump through a pipe (the floor for any streaming parse)
+
+	:param dump_path : The dump to read
+	'''
+	with subprocess.Popen(['cat', str(dump_path)], stdout=subprocess.PIPE, text=True) as popen:
+		assert popen.stdout is not None
+		return [None] * sum(1 for _line in popen.stdout)
+
+
+def measure(compdb_fn: Callable[[Path], Sized], dump_path: Path) -> dict:
+	'''
+	Make the compdb with the specified function and return the measurements
+
+	The time and the peak memory are measured in separate runs because tracemalloc slows the parsing considerably.
+	The peak memory includes the resulting compdb.
+
+	:param compdb_fn : The function returning the compdb
+	:param dump_path : The dump to parse
+	'''
+	start_time = time.monotonic()
+	num_entries = len(compdb_fn(dump_path))
+	wall_time = time.monotonic() - start_time
+
+	tracemalloc.start()
+	compdb = compdb_fn(dump_path)
+	_current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del compdb
+	return { 'num_entries': num_entries, 'wall_time_s': wall_time, 'peak_mib': peak / (1024 * 1024) }
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-entries', type=int, default=80000, help='The number of entries in the compdb')
+	parser.add_argument('--num-targets', type=int, default=400,   help='The number of targets between which they are spread')
+	parser.add_argument('--num-flags',   type=int, default=150,   help='The number of flags in each command')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		dump_path = Path(temp_dir) / 'compdb.json'
+		write_synthetic_compdb(dump_path, num_entries=args.num_entries, num_targets=args.num_targets, num_flags=args.num_flags)
+		print(f'dump size: {dump_path.stat().st_size / (1024 * 1024):.1f} MiB')
+
+		print(f'{"approach":<27} {"num_entries":>11} {"wall_time_s":>11} {"peak_mib":>9}')
+		for name, compdb_fn in (
+				('records_whole_str',           records_from_whole_string),
+				('columnar_whole_str',          columnar_from_whole_string),
+				('columnar_streaming_decoder',  columnar_from_stream_via_json_decoder),
+				('columnar_streaming',          columnar_from_stream),
+				('read_lines_only (floor)',     lines_only_from_stream),
+		):
+			result = measure(compdb_fn, dump_path)
+			print(f'{name:<27} {result["num_entries"]:>11} {result["wall_time_s"]:>11.2f} {result["peak_mib"]:>9.1f}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,94 @@
+'''
+Compare the thread count, RSS and wall time of CommandExecutor's drain modes
+
+Run from the repository root with:
+
+    python -m benchmark.bench_drain_modes --num-jobs 512 --num-parallel-jobs 128
+'''
+
+import argparse
+import threading
+import time
+
+from cppbuild.command_executor import CommandExecutor, CommandJob, DrainMode, all_are_finished
+
+
+def current_rss_kib() -> int:
+	'''
+	The current resident set size of this process in KiB (read from /proc/self/status)
+	'''
+	with open('/proc/self/status') as status_fh:
+		for line in status_fh:
+			if line.startswith('VmRSS:'):
+				return int(line.split()[1])
+	raise RuntimeError('Unable to find VmRSS in /proc/self/status')
+
+
+def run_benchmark(*,
+                  drain_mode: DrainMode,
+                  num_jobs: int,
+                  num_parallel_jobs: int,
+                  seq_value: int,
+                  sleep_seconds: float,
+                  ) -> dict:
+	'''
+	Run the specified number of `seq`-then-`sleep` jobs through a CommandExecutor with the specified drain mode
+	and return the measurements
+
+	:param drain_mode        : The drain mode to benchmark
+	:param num_jobs          : The total number of jobs to run
+	:param num_parallel_jobs : The number of jobs to run in parallel
+	:param seq_value         : The argument to pass to each `seq` command (to control the amount of output)
+	:param sleep_seconds     : The time for each job to sleep after its output (so that many jobs overlap)
+	'''
+	baseline_rss_kib = current_rss_kib()
+	peak_thread_count = threading.active_count()
+	peak_rss_kib = baseline_rss_kib
+
+	start_time = time.monotonic()
+	command_executor = CommandExecutor(num_parallel_jobs=num_parallel_jobs, drain_mode=drain_mode)
+	command_executor.extend_queue(
+		CommandJob(command=['sh', '-c', f'seq {seq_value}; sleep {sleep_seconds}']) for _ in range(num_jobs)
+	)
+	while not all_are_finished(command_executor):
+		# Sample just after update() has started new jobs, when the most drainer threads are alive
+		peak_thread_count = max(peak_thread_count, threading.active_count())
+		peak_rss_kib = max(peak_rss_kib, current_rss_kib())
+		command_executor.wait_for_completion()
+		command_executor.update()
+	wall_time = time.monotonic() - start_time
+	command_executor.close()
+
+	return {
+		'drain_mode'        : drain_mode.name,
+		'peak_threads'      : peak_thread_count,
+		'peak_rss_delta_kib': peak_rss_kib - baseline_rss_kib,
+		'wall_time_s'       : wall_time,
+	}
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-jobs',          type=int, default=512, help='The total number of jobs to run')
+	parser.add_argument('--num-parallel-jobs', type=int, default=128, help='The number of jobs to run in parallel')
+	parser.add_argument('--seq-value',         type=int,   default=2000, help='The argument to each job\'s `seq`')
+	parser.add_argument('--sleep-seconds',     type=float, default=0.05, help='The time each job sleeps after its output')
+	args = parser.parse_args()
+
+	print(f'{"drain_mode":<10} {"peak_threads":>12} {"peak_rss_delta_kib":>18} {"wall_time_s":>11}')
+	for drain_mode in DrainMode:
+		result = run_benchmark(
+			drain_mode=drain_mode,
+			num_jobs=args.num_jobs,
+			num_parallel_jobs=args.num_parallel_jobs,
+			seq_value=args.seq_value,
+			sleep_seconds=args.sleep_seconds,
+		)
+		print(
+			f'{result["drain_mode"]:<10} {result["peak_threads"]:>12} '
+			f'{result["peak_rss_delta_kib"]:>18} {result["wall_time_s"]:>11.3f}'
+		)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,105 @@
+'''
+Compare the shlex-based parsing of compiler .d files (as parse_compiler_deps() used to do) against the
+single-pass parse_make_deps() tokenizer, and the serial parsing of a directory of .d files against the process pool
+
+The .d content is the repository's test/test-data/example.compiler-deps.txt scaled up by repeating its dependencies.
+
+Run from the repository root with:
+
+    python -m benchmark.bench_make_deps_parsing --scale 10 --num-files 2000
+'''
+
+import argparse
+import os
+import shlex
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable, List
+
+from cppbuild.make_deps import parse_make_deps, parse_make_deps_files
+
+EXAMPLE_DEPS_FILE = Path(__file__).resolve().parent.parent / 'test' / 'test-data' / 'example.compiler-deps.txt'
+
+EXAMPLE_TARGET = 'source/options/options_block/pdb: input_spec.hpp'
+
+
+def scaled_deps_str(scale: int) -> str:
+	'''
+	The example .d content with its dependency lines repeated the specified number of times
+
+	:param scale : The number of copies of the dependency lines
+	'''
+	first_line, _newline, dep_lines = EXAMPLE_DEPS_FILE.read_text().partition('\n')
+	dep_lines = dep_lines.rstrip('\n')
+	if not dep_lines.endswith('\\'):
+		dep_lines += ' \\'
+	return first_line + '\n' + '\n'.join([dep_lines] * scale).rstrip(' \\') + '\n'
+
+
+def shlex_parse(deps_str: str) -> List[str]:
+	'''
+	Parse the .d content as parse_compiler_deps() used to (dropping backslash-newlines and then using shlex.split())
+
+	:param deps_str : The .d content
+	'''
+	return shlex.split(deps_str[len(EXAMPLE_TARGET) + 1:].replace('\\\n', ''))
+
+
+def tokenizer_parse(deps_str: str) -> List[str]:
+	'''
+	Parse the .d content with parse_make_deps()
+
+	:param deps_str : The .d content
+	'''
+	return parse_make_deps(deps_str, first_target=EXAMPLE_TARGET)[EXAMPLE_TARGET]
+
+
+def time_per_call(parse_fn: Callable[[str], List[str]], deps_str: str, num_repeats: int) -> float:
+	start_time = time.monotonic()
+	for _ in range(num_repeats):
+		parse_fn(deps_str)
+	return (time.monotonic() - start_time) / num_repeats
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--scale',       type=int, default=10,   help='The number of copies of the example dependencies')
+	parser.add_argument('--num-repeats', type=int, default=20,   help='The number of times to parse the content')
+	parser.add_argument('--num-files',   type=int, default=2000, help='The number of .d files for the bulk comparison')
+	args = parser.parse_args()
+
+	deps_str = scaled_deps_str(args.scale)
+	assert len(set(shlex_parse(deps_str))) == len(tokenizer_parse(deps_str))
+
+	print(f'single file: {len(shlex_parse(deps_str))} dependencies, {len(deps_str) / 1024:.0f} KiB')
+	shlex_time = time_per_call(shlex_parse, deps_str, args.num_repeats)
+	tokenizer_time = time_per_call(tokenizer_parse, deps_str, args.num_repeats)
+	print(f'{"approach":<18} {"ms_per_file":>11}')
+	print(f'{"shlex":<18} {shlex_time * 1000:>11.2f}')
+	print(f'{"parse_make_deps":<18} {tokenizer_time * 1000:>11.2f}')
+	print(f'speedup: {shlex_time / tokenizer_time:.1f}x')
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		example_str = scaled_deps_str(1)
+		deps_files = []
+		for file_index in range(args.num_files):
+			deps_file = Path(temp_dir) / f'{file_index}.d'
+			deps_file.write_text(example_str.replace(EXAMPLE_TARGET, f'target_{file_index}.o', 1))
+			deps_files.append(deps_file)
+
+		start_time = time.monotonic()
+		for deps_file in deps_files:
+			parse_make_deps(deps_file.read_text())
+		serial_time = time.monotonic() - start_time
+
+		start_time = time.monotonic()
+		parse_make_deps_files(deps_files)
+		pool_time = time.monotonic() - start_time
+
+		print(f'{args.num_files} files: serial {serial_time:.2f} s, process pool of {os.cpu_count()} {pool_time:.2f} s')
+
+
+if __name__ == '__main__':
+	main()
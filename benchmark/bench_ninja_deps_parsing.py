@@ -0,0 +1,97 @@
+'''
+Compare parsing a synthetic `ninja -t deps` dump as one whole string against streaming it line by line
+
+Run from the repository root with:
+
+    python -m benchmark.bench_ninja_deps_parsing --num-targets 100000 --deps-per-target 50
+'''
+
+import argparse
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Callable, Iterator
+
+from cppbuild.raw_dep_record import RawDepRecord, parse_ninja_deps
+
+
+def write_synthetic_deps_dump(out_path: Path, *, num_targets: int, deps_per_target: int) -> None:
+	'''
+	Write a synthetic `ninja -t deps` dump to the specified file
+
+	:param out_path        : The file to write
+	:param num_targets     : The number of targets to write
+	:param deps_per_target : The number of dependencies per target
+	'''
+	with open(out_path, 'w') as out_fh:
+		for target_index in range(num_targets):
+			out_fh.write(f'source/dir_{target_index % 100}/file_{target_index}.cpp.o: #deps {deps_per_target}, deps mtime 1600000000 (VALID)\n')
+			out_fh.write(f'    ../source/dir_{target_index % 100}/file_{target_index}.cpp\n')
+			for dep_index in range(deps_per_target - 1):
+				out_fh.write(f'    /usr/include/some/library/header_{(target_index + dep_index) % 3000}.hpp\n')
+			out_fh.write('\n')
+
+
+def records_from_whole_string(dump_path: Path) -> Iterator[RawDepRecord]:
+	'''
+	Read the dump as get_ninja_deps_str_for_dir() does (capturing the whole output as a str) and then parse it
+
+	:param dump_path : The dump to read
+	'''
+	whole_str = subprocess.run(['cat', str(dump_path)], capture_output=True, check=True, text=True).stdout
+	return parse_ninja_deps(whole_str.splitlines())
+
+
+def records_from_stream(dump_path: Path) -> Iterator[RawDepRecord]:
+	'''
+	Stream the dump through a pipe as iter_ninja_deps_for_dir() does
+
+	:param dump_path : The dump to read
+	'''
+	with subprocess.Popen(['cat', str(dump_path)], stdout=subprocess.PIPE, text=True) as popen:
+		assert popen.stdout is not None
+		yield from parse_ninja_deps(popen.stdout)
+
+
+def measure(records_fn: Callable[[Path], Iterator[RawDepRecord]], dump_path: Path) -> dict:
+	'''
+	Consume the records from the specified function (without retaining them) and return the measurements
+
+	The time and the peak memory are measured in separate runs because tracemalloc slows the parsing considerably.
+
+	:param records_fn : The function returning the records
+	:param dump_path  : The dump to parse
+	'''
+	start_time = time.monotonic()
+	num_records = sum(1 for _ in records_fn(dump_path))
+	wall_time = time.monotonic() - start_time
+
+	tracemalloc.start()
+	sum(1 for _ in records_fn(dump_path))
+	_current, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return { 'num_records': num_records, 'wall_time_s': wall_time, 'peak_mib': peak / (1024 * 1024) }
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-targets',     type=int, default=100000, help='The number of targets in the dump')
+	parser.add_argument('--deps-per-target', type=int, default=50,     help='The number of dependencies per target')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		dump_path = Path(temp_dir) / 'deps.txt'
+		write_synthetic_deps_dump(dump_path, num_targets=args.num_targets, deps_per_target=args.deps_per_target)
+		print(f'dump size: {dump_path.stat().st_size / (1024 * 1024):.1f} MiB')
+
+		print(f'{"approach":<12} {"num_records":>11} {"wall_time_s":>11} {"peak_mib":>9}')
+		for name, records_fn in (('whole_str', records_from_whole_string), ('streaming', records_from_stream)):
+			result = measure(records_fn, dump_path)
+			print(f'{name:<12} {result["num_records"]:>11} {result["wall_time_s"]:>11.2f} {result["peak_mib"]:>9.1f}')
+
+
+if __name__ == '__main__':
+	main()
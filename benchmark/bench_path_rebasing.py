@@ -0,0 +1,57 @@
+'''
+Compare rebasing many dependency paths with from_changed_working_dir() one Path at a time against
+from_changed_working_dir_bulk() on strings
+
+Run from the repository root with:
+
+    python -m benchmark.bench_path_rebasing --num-paths 500000 --num-dirs 3000
+'''
+
+import argparse
+import time
+
+from pathlib import Path
+from typing import List
+
+from cppbuild.dir_tools import WorkingDirChange, from_changed_working_dir, from_changed_working_dir_bulk
+
+
+def synthetic_dep_paths(*, num_paths: int, num_dirs: int) -> List[str]:
+	'''
+	Synthetic dependency paths, as ninja reports them relative to a build directory
+
+	:param num_paths : The number of paths
+	:param num_dirs  : The number of distinct directories between which they're spread
+	'''
+	return [
+		f'../source/component_{index % num_dirs}/include/../detail/header_{index}.hpp'
+		for index in range(num_paths)
+	]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-paths', type=int, default=500000, help='The number of paths to rebase')
+	parser.add_argument('--num-dirs',  type=int, default=3000,   help='The number of distinct directories')
+	args = parser.parse_args()
+
+	paths = synthetic_dep_paths(num_paths=args.num_paths, num_dirs=args.num_dirs)
+	working_dir_change = WorkingDirChange(prev_working_dir=Path('/project/build'), new_working_dir=Path('/project'))
+
+	start_time = time.monotonic()
+	per_path_results = [str(from_changed_working_dir(Path(x), working_dir_change)) for x in paths]
+	per_path_time = time.monotonic() - start_time
+
+	start_time = time.monotonic()
+	bulk_results = from_changed_working_dir_bulk(paths, working_dir_change)
+	bulk_time = time.monotonic() - start_time
+
+	assert bulk_results == per_path_results
+	print(f'{"approach":<10} {"num_paths":>9} {"wall_time_s":>11}')
+	print(f'{"per_path":<10} {args.num_paths:>9} {per_path_time:>11.2f}')
+	print(f'{"bulk":<10} {args.num_paths:>9} {bulk_time:>11.2f}')
+	print(f'speedup: {per_path_time / bulk_time:.1f}x')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,64 @@
+'''
+Compare the simulated makespan of the job scheduling policies on a deterministic, heavy-tailed set of job costs
+
+Run from the repository root with:
+
+    python -m benchmark.bench_scheduling_makespan --num-jobs 2000 --num-parallel-jobs 64
+'''
+
+import argparse
+import random
+
+from typing import List
+
+from cppbuild.command_job import CommandJob
+from cppbuild.job_scheduler import FifoScheduler, LongestProcessingTimeFirstScheduler, PriorityScheduler, simulate_makespan
+
+
+def make_jobs(*, num_jobs: int, seed: int) -> List[CommandJob]:
+	'''
+	Make jobs with deterministic pseudo-random heavy-tailed costs (roughly like the compile times of translation units)
+	with priorities set from a coarse, noisy view of the cost
+
+	:param num_jobs : The number of jobs to make
+	:param seed     : The random seed
+	'''
+	rng = random.Random(seed)
+	jobs = []
+	for index in range(num_jobs):
+		cost = rng.paretovariate(1.5)
+		jobs.append(CommandJob(
+			command=['true'],
+			associated_data=index,
+			priority=round(cost * rng.uniform(0.5, 1.5)),
+			estimated_cost=cost,
+		))
+	return jobs
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--num-jobs',          type=int, default=2000, help='The number of jobs to simulate')
+	parser.add_argument('--num-parallel-jobs', type=int, default=64,   help='The number of slots to simulate')
+	parser.add_argument('--seed',              type=int, default=0,    help='The random seed for the job costs')
+	args = parser.parse_args()
+
+	jobs = make_jobs(num_jobs=args.num_jobs, seed=args.seed)
+	total_cost = sum(job.estimated_cost for job in jobs if job.estimated_cost is not None)
+	lower_bound = max(
+		total_cost / args.num_parallel_jobs,
+		max(job.estimated_cost for job in jobs if job.estimated_cost is not None),
+	)
+
+	print(f'{"policy":<10} {"makespan":>10} {"vs_lower_bound":>14}')
+	for name, scheduler in (
+			('fifo',     FifoScheduler()),
+			('priority', PriorityScheduler()),
+			('lpt',      LongestProcessingTimeFirstScheduler()),
+	):
+		makespan = simulate_makespan(jobs, num_parallel_jobs=args.num_parallel_jobs, scheduler=scheduler)
+		print(f'{name:<10} {makespan:>10.2f} {makespan / lower_bound:>14.3f}')
+
+
+if __name__ == '__main__':
+	main()
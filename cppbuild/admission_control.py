@@ -0,0 +1,168 @@
+import os
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from cppbuild.command_job import CommandJob
+
+# The file from which the available memory is read
+PROC_MEMINFO_PATH = Path('/proc/meminfo')
+
+
+@dataclass
+class ResourceBudget:
+	'''
+	The global resource budget within which an AdmissionController packs running jobs
+	'''
+
+	# The total memory (in bytes) that the running jobs' memory_estimates may sum to (or None for no limit)
+	memory_bytes: Optional[int] = None
+
+	# The total number of CPUs that the running jobs' cpu_weights may sum to (or None for no limit)
+	cpus: Optional[float] = None
+
+
+def available_memory_bytes(meminfo_path: Path = PROC_MEMINFO_PATH) -> Optional[int]:
+	'''
+	The MemAvailable reported in /proc/meminfo in bytes (or None if unavailable, eg not on Linux)
+
+	:param meminfo_path : The meminfo file to read (default: /proc/meminfo)
+	'''
+	try:
+		with open(meminfo_path) as meminfo_fh:
+			for line in meminfo_fh:
+				if line.startswith('MemAvailable:'):
+					return int(line.split()[1]) * 1024
+	except OSError:
+		pass
+	return None
+
+
+def one_minute_load_average() -> Optional[float]:
+	'''
+	The one-minute system load average (or None if unavailable)
+	'''
+	try:
+		return os.getloadavg()[0]
+	except (AttributeError, OSError):
+		return None
+
+
+class AdmissionController:
+	'''
+	Decide whether a CommandExecutor may start another job, given the jobs already running
+
+	A job is admitted if:
+
+	 * its memory_estimate and cpu_weight fit within what remains of the static ResourceBudget and
+	 * (if dynamic throttling is enabled) its memory_estimate fits within the system's currently available memory
+	   (less a reserve) and (if a max_load is given) the system's one-minute load average is below max_load.
+
+	The dynamic readings are taken at most once per refresh(), which the CommandExecutor calls on each update().
+
+	A running job may not yet have reached its peak memory use, so a fresh reading of the available memory can
+	overstate what is really free. The available memory is therefore taken as the lesser of the reading and the
+	reading taken when no admitted jobs were running less the memory_estimates of the admitted jobs.
+
+	The load average lags behind reality by design, so it only guards against sustained overload.
+	It also counts the executor's own jobs, so a max_load at or below the number of parallel jobs
+	would throttle a fully loaded executor by itself; hence there's no load limit by default.
+	'''
+
+	def __init__(self,
+	             *,
+	             budget: Optional[ResourceBudget] = None,
+	             dynamic: bool = True,
+	             memory_reserve_bytes: int = 0,
+	             max_load: Optional[float] = None,
+	             meminfo_path: Path = PROC_MEMINFO_PATH,
+	             ):
+		'''
+		Ctor
+
+		:param budget               : The static resource budget (default: no limits)
+		:param dynamic              : Whether to also throttle on the available memory and the load average
+		:param memory_reserve_bytes : The amount of available memory to leave unclaimed when throttling dynamically
+		:param max_load             : (optional) The load average at or above which to stop admitting jobs when throttling
+		                              dynamically (default: no limit), which should allow for the executor's own jobs
+		:param meminfo_path         : The meminfo file from which to read the available memory (default: /proc/meminfo)
+		'''
+		self._budget: ResourceBudget = ResourceBudget() if budget is None else budget
+		self._dynamic = dynamic
+		self._memory_reserve_bytes = memory_reserve_bytes
+		self._max_load: Optional[float] = max_load
+		self._meminfo_path = meminfo_path
+
+		# The number of admitted (running) jobs and the totals of their memory_estimates and cpu_weights
+		self._num_admitted: int = 0
+		self._admitted_memory: int = 0
+		self._admitted_cpus: float = 0.0
+
+		# The available memory most recently read whilst no admitted jobs were running
+		self._baseline_available_memory: Optional[int] = None
+
+		# The available memory (as estimated from the most recent reading and the admitted jobs)
+		# and the most recent load average
+		self._available_memory: Optional[int] = None
+		self._load_average: Optional[float] = None
+
+	def refresh(self) -> None:
+		'''
+		Take fresh readings of the available memory and the load average (if throttling dynamically)
+		'''
+		if not self._dynamic:
+			return
+		available_memory = available_memory_bytes(self._meminfo_path)
+		if available_memory is not None and self._num_admitted == 0:
+			self._baseline_available_memory = available_memory
+		if available_memory is not None and self._baseline_available_memory is not None:
+			available_memory = min(available_memory, self._baseline_available_memory - self._admitted_memory)
+		self._available_memory = available_memory
+		if self._max_load is not None:
+			self._load_average = one_minute_load_average()
+
+	def can_admit(self, job: CommandJob) -> bool:
+		'''
+		Whether the specified job may be started alongside the currently admitted jobs
+
+		:param job : The job to consider
+		'''
+		if self._budget.memory_bytes is not None:
+			if self._admitted_memory + job.memory_estimate > self._budget.memory_bytes:
+				return False
+		if self._budget.cpus is not None:
+			if self._admitted_cpus + job.cpu_weight > self._budget.cpus:
+				return False
+		if self._dynamic:
+			if self._available_memory is not None:
+				if job.memory_estimate > self._available_memory - self._memory_reserve_bytes:
+					return False
+			if self._max_load is not None and self._load_average is not None and self._load_average >= self._max_load:
+				return False
+		return True
+
+	def admit(self, job: CommandJob) -> None:
+		'''
+		Record that the specified job has been started
+
+		:param job : The job that has been started
+		'''
+		self._num_admitted += 1
+		self._admitted_memory += job.memory_estimate
+		self._admitted_cpus += job.cpu_weight
+
+		# Assume the new job will claim its estimated memory, so that later jobs admitted
+		# before the next refresh() don't all claim the same memory
+		if self._available_memory is not None:
+			self._available_memory -= job.memory_estimate
+
+	def release(self, job: CommandJob) -> None:
+		'''
+		Record that the specified (previously admitted) job has completed
+
+		:param job : The job that has completed
+		'''
+		self._num_admitted -= 1
+		self._admitted_memory -= job.memory_estimate
+		self._admitted_cpus -= job.cpu_weight
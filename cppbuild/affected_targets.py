@@ -0,0 +1,128 @@
+'''
+Find the compile targets affected by a set of changed files via a persisted reverse-dependency index
+
+Build the index from a ninja build directory (eg after each build):
+
+    python -m cppbuild.affected_targets build-index path/to/build deps.index
+
+Then query it with the changed files (as arguments, or one per line on stdin):
+
+    git diff --name-only | python -m cppbuild.affected_targets query deps.index
+
+The affected targets are printed one per line (as named by ninja, so they can be passed straight back to ninja)
+and any changed files that aren't known dependencies of any target are reported on stderr.
+'''
+
+import argparse
+import os
+import sys
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from cppbuild.dep_graph import DepGraph, dep_graph_of_raw_dep_records, load_dep_graph, save_dep_graph
+from cppbuild.dir_tools import absolute_path_str
+from cppbuild.ninja_call import iter_ninja_deps_for_dir
+
+
+@dataclass
+class AffectedTargets:
+	'''
+	The result of querying the targets affected by a set of changed files
+	'''
+
+	# The affected targets, sorted
+	targets: List[str]
+
+	# The changed files that aren't dependencies of any target (eg new files or build-system files),
+	# which callers may wish to treat as affecting everything
+	unknown_files: List[str]
+
+
+def build_affected_targets_index(ninja_build_dir: Path, index_path: Path) -> DepGraph:
+	'''
+	Build the reverse-dependency index of the specified ninja build directory, save it to the specified file
+	and return it
+
+	The dependencies are stored as absolute paths so they can be matched against changed files from anywhere.
+
+	:param ninja_build_dir : The ninja build directory to index
+	:param index_path      : The file to which to save the index (replaced atomically)
+	'''
+	build_dir = Path(os.path.abspath(ninja_build_dir))
+	graph = dep_graph_of_raw_dep_records(
+		iter_ninja_deps_for_dir(build_dir),
+		key_of_dep=lambda dep: absolute_path_str(dep, build_dir),
+	)
+	save_dep_graph(graph, index_path)
+	return graph
+
+
+def affected_targets(graph: DepGraph,
+                     changed_files: Iterable[Path],
+                     *,
+                     base_dir: Optional[Path] = None,
+                     ) -> AffectedTargets:
+	'''
+	The targets affected by the specified changed files, according to the specified index
+
+	This costs time proportional to the number of changed files plus the number of affected targets.
+
+	:param graph         : The index, as built by build_affected_targets_index() (or loaded with load_dep_graph())
+	:param changed_files : The changed files (eg from `git diff --name-only`)
+	:param base_dir      : (optional) The directory relative to which relative changed files are interpreted
+	                       (default: the current working directory)
+	'''
+	base_dir = Path(os.getcwd()) if base_dir is None else base_dir
+	target_ids: Set[int] = set()
+	unknown_files: List[str] = []
+	for changed_file in changed_files:
+		header_id = graph.headers.id_of(absolute_path_str(changed_file, base_dir))
+		if header_id is None:
+			unknown_files.append(str(changed_file))
+		else:
+			target_ids.update(graph.target_ids_including(header_id))
+	return AffectedTargets(
+		targets=sorted(graph.targets.path_of(x) for x in target_ids),
+		unknown_files=unknown_files,
+	)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+	'''
+	Run the command-line interface (see the module docstring)
+
+	:param args : (optional) The command-line arguments (default: sys.argv[1:])
+	'''
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+	build_parser = subparsers.add_parser('build-index', help='Build the index from a ninja build directory')
+	build_parser.add_argument('ninja_build_dir', type=Path, help='The ninja build directory to index')
+	build_parser.add_argument('index', type=Path, help='The index file to write')
+
+	query_parser = subparsers.add_parser('query', help='Print the targets affected by the changed files')
+	query_parser.add_argument('index', type=Path, help='The index file to read')
+	query_parser.add_argument('changed_files', type=Path, nargs='*',
+	                          help='The changed files (default: read one per line from stdin)')
+	query_parser.add_argument('--base-dir', type=Path, default=None,
+	                          help='The directory relative to which the changed files are interpreted (default: cwd)')
+	parsed_args = parser.parse_args(args)
+
+	if parsed_args.subcommand == 'build-index':
+		graph = build_affected_targets_index(parsed_args.ninja_build_dir, parsed_args.index)
+		print(f'Indexed {graph.num_targets()} targets and {graph.num_headers()} dependencies', file=sys.stderr)
+		return 0
+
+	changed_files = parsed_args.changed_files or [Path(x.strip()) for x in sys.stdin if x.strip()]
+	result = affected_targets(load_dep_graph(parsed_args.index), changed_files, base_dir=parsed_args.base_dir)
+	for unknown_file in result.unknown_files:
+		print(f'Not a known dependency: {unknown_file}', file=sys.stderr)
+	for target in result.targets:
+		print(target)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
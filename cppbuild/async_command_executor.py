@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import time
+
+from typing import AsyncIterator, Callable, Deque, Iterable, List, Optional, Union
+
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+
+
+def _do_nothing(*args, **kwargs):
+	pass
+
+
+class AsyncCommandExecutor:
+	'''
+	An asyncio equivalent of CommandExecutor, which runs CommandJobs via asyncio.create_subprocess_exec()
+
+	This uses no threads, so it can share an event loop with other work (eg ninja queries or TUI refreshes).
+	'''
+
+	def __init__(self, *, num_parallel_jobs: int, callback: Callable = _do_nothing):
+		'''
+		Construct
+
+		:param num_parallel_jobs : The maximum number of commands to execute simultaneously
+		:param callback          : A callback to call once after job completes with the details
+		                           (with the same arguments as for CommandExecutor)
+		'''
+		if num_parallel_jobs < 1:
+			raise ValueError(f'AsyncCommandExecutor num_parallel_jobs must be positive (got {num_parallel_jobs})')
+
+		# Stash the callback and the number of parallel jobs
+		self.callback: Callable = callback
+		self._num_parallel_jobs: int = num_parallel_jobs
+
+		# The queue of jobs that have not yet been started
+		self._queue: Deque[CommandJob] = collections.deque()
+
+		# The number of jobs currently running
+		self._num_running: int = 0
+
+		# Whether a call to iter_results() (or run()) is in progress
+		self._is_iterating: bool = False
+
+	async def run(self, jobs: Iterable[CommandJob]) -> None:
+		'''
+		Run the specified jobs to completion, calling the callback for each as it completes
+
+		:param jobs : The jobs to run
+		'''
+		async for _result in self.iter_results(jobs):
+			pass
+
+	async def iter_results(self, jobs: Iterable[CommandJob]) -> AsyncIterator[CommandResult]:
+		'''
+		Run the specified jobs, yielding their results in completion order
+		(calling the callback for each before it's yielded)
+
+		If the iteration is abandoned early, any running jobs are killed and the jobs not yet started are dropped.
+		If a job can't be run (eg its executable doesn't exist), the exception is re-raised from here
+		(as for CommandExecutor) once the other running jobs have been killed (and the rest dropped).
+
+		Only one call may be in progress at a time (as the calls would otherwise share the queue and the
+		num_parallel_jobs limit), so this raises a RuntimeError if called whilst another is in progress.
+
+		:param jobs : The jobs to run
+		'''
+		if self._is_iterating:
+			raise RuntimeError('AsyncCommandExecutor is already running jobs')
+		self._is_iterating = True
+		workers: List['asyncio.Future[None]'] = []
+		try:
+			enqueue_time = time.monotonic()
+			for job in jobs:
+				job.enqueue_time = enqueue_time
+				self._queue.append(job)
+			result_queue: 'asyncio.Queue[Union[CommandResult, Exception, None]]' = asyncio.Queue()
+			workers = [
+				asyncio.ensure_future(self._run_queued_jobs(result_queue, worker_index))
+				for worker_index in range(min(self._num_parallel_jobs, len(self._queue)))
+			]
+			num_active_workers = len(workers)
+			while num_active_workers > 0:
+				result = await result_queue.get()
+				if result is None:
+					num_active_workers -= 1
+					continue
+				if isinstance(result, Exception):
+					raise result
+				self.callback(
+					result=result,
+					num_remaining_commands=self.num_running() + self.num_in_queue(),
+				)
+				yield result
+		finally:
+			self._queue.clear()
+			for worker in workers:
+				worker.cancel()
+			await asyncio.gather(*workers, return_exceptions=True)
+			self._is_iterating = False
+
+	async def _run_queued_jobs(self,
+	                           result_queue: 'asyncio.Queue[Union[CommandResult, Exception, None]]',
+	                           worker_index: int,
+	                           ) -> None:
+		'''
+		Run jobs from the queue until it's empty, putting each result on the result queue
+		and then putting None to indicate this has finished
+
+		If a job can't be run, this puts the exception on the result queue (followed by None) and stops.
+
+		:param result_queue : The queue on which to put the results
+		:param worker_index : The index of this worker, which serves as the slot_index of its jobs' results
+		                      (as each worker runs one job at a time)
+		'''
+		try:
+			while self._queue:
+				command_job = self._queue.popleft()
+				self._num_running += 1
+				try:
+					result = await _run_job(command_job, worker_index)
+				finally:
+					self._num_running -= 1
+				result_queue.put_nowait(result)
+		except Exception as exception: # pylint: disable=broad-except
+			result_queue.put_nowait(exception)
+		finally:
+			result_queue.put_nowait(None)
+
+	def num_running(self) -> int:
+		'''
+		The number of jobs currently running
+		'''
+		return self._num_running
+
+	def num_in_queue(self) -> int:
+		'''
+		The number of jobs waiting in the queue
+		'''
+		return len(self._queue)
+
+
+async def _run_job(command_job: CommandJob, slot_index: int) -> CommandResult:
+	'''
+	Run the specified job to completion and return its result, killing the process if this is cancelled
+
+	:param command_job : The job to run
+	:param slot_index  : The index of the slot (worker) in which the job is run
+	'''
+	start_time = time.monotonic()
+	process = await asyncio.create_subprocess_exec(
+		*command_job.command,
+		cwd=command_job.run_dir,
+		stdout=asyncio.subprocess.PIPE,
+		stderr=asyncio.subprocess.PIPE,
+	)
+	try:
+		stdout, stderr = await process.communicate()
+	except asyncio.CancelledError:
+		if process.returncode is None:
+			process.kill()
+			await process.wait()
+		raise
+	assert process.returncode is not None
+	return CommandResult(
+		returncode=process.returncode,
+		stdout=stdout,
+		stderr=stderr,
+		command=command_job.command,
+		run_dir=command_job.run_dir,
+		associated_data=command_job.associated_data,
+		enqueue_time=command_job.enqueue_time,
+		start_time=start_time,
+		end_time=time.monotonic(),
+		stdout_num_bytes=len(stdout),
+		stderr_num_bytes=len(stderr),
+		slot_index=slot_index,
+	)
+
+
+async def run_all(jobs: Iterable[CommandJob], *, num_parallel_jobs: int) -> List[CommandResult]:
+	'''
+	Run the specified jobs with an AsyncCommandExecutor and return the results in completion order
+
+	:param jobs              : The jobs to run
+	:param num_parallel_jobs : The maximum number of commands to execute simultaneously
+	'''
+	executor = AsyncCommandExecutor(num_parallel_jobs=num_parallel_jobs)
+	return [result async for result in executor.iter_results(jobs)]
@@ -0,0 +1,149 @@
+import json
+import os
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+from cppbuild.command_result import CommandResult
+from cppbuild.shlex_join import shlex_join_shim
+
+# The process ID under which all the events are recorded
+_TRACE_PID = 1
+
+# The thread ID of the lane for results that weren't run in an executor slot (eg jobs cancelled before starting)
+_UNSLOTTED_TID = -1
+
+
+def _command_name(result: CommandResult) -> str:
+	return os.path.basename(result.command[0]) if result.command else ''
+
+
+class ChromeTraceWriter:
+	'''
+	Stream the results of a CommandExecutor's jobs to a Trace Event Format JSON file, as viewed by chrome://tracing or
+	Perfetto, with one lane (thread) per executor slot and one complete ('X') event per job
+
+	Each event is written (and flushed) as its job completes, so the memory use is constant however many jobs are
+	traced and an interrupted run loses no events. The file is a valid JSON array once closed (and, as the format
+	allows, still loadable without the closing bracket).
+
+	Use record_command_result() as (or from) a CommandExecutor (or AsyncCommandExecutor) callback.
+	'''
+
+	def __init__(self,
+	             trace_path: Path,
+	             *,
+	             origin_time: Optional[float] = None,
+	             name_of_result: Callable[[CommandResult], str] = _command_name,
+	             ):
+		'''
+		Ctor
+
+		:param trace_path     : The file to which to write the trace (overwritten)
+		:param origin_time    : (optional) The time.monotonic() time to treat as the start of the trace (default: now)
+		:param name_of_result : A function that returns the name of a job's event from its result
+		                        (default: the base name of the command's executable)
+		'''
+		self._name_of_result = name_of_result
+		self._origin_time: float = time.monotonic() if origin_time is None else origin_time
+		self._trace_fh = open(trace_path, 'w')
+		self._trace_fh.write('[')
+		self._num_events: int = 0
+
+		# The thread IDs of the lanes that have been named so far
+		self._named_tids: Set[int] = set()
+
+		self._write_event({
+			'name': 'process_name', 'ph': 'M', 'pid': _TRACE_PID, 'tid': 0, 'args': { 'name': 'cppbuild' },
+		})
+
+	def close(self) -> None:
+		'''
+		Terminate the JSON array and close the file
+		'''
+		if self._trace_fh.closed:
+			return
+		self._trace_fh.write('\n]\n')
+		self._trace_fh.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_args):
+		self.close()
+
+	@property
+	def num_events(self) -> int:
+		'''
+		The number of events written so far (including the metadata events that name the process and lanes)
+		'''
+		return self._num_events
+
+	def _write_event(self, event: Dict[str, Any]) -> None:
+		'''
+		Append the specified event to the file (flushing it, so that it survives the run being interrupted)
+
+		:param event : The event
+		'''
+		self._trace_fh.write(',\n' if self._num_events else '\n')
+		self._trace_fh.write(json.dumps(event, separators=(',', ':')))
+		self._trace_fh.flush()
+		self._num_events += 1
+
+	def _micros_of_time(self, monotonic_time: float) -> float:
+		'''
+		The trace timestamp (in microseconds since the origin) of the specified time.monotonic() time
+		'''
+		return round((monotonic_time - self._origin_time) * 1e6, 3)
+
+	def record(self, result: CommandResult) -> None:
+		'''
+		Write the event of the specified result (if it was started, ie its start and end times are known)
+
+		:param result : The result to record
+		'''
+		if result.start_time is None or result.end_time is None:
+			return
+		tid = _UNSLOTTED_TID if result.slot_index is None else result.slot_index
+		if tid not in self._named_tids:
+			self._named_tids.add(tid)
+			lane_name = 'unslotted' if tid == _UNSLOTTED_TID else f'slot {tid}'
+			self._write_event({ 'name': 'thread_name', 'ph': 'M', 'pid': _TRACE_PID, 'tid': tid, 'args': { 'name': lane_name } })
+			self._write_event({ 'name': 'thread_sort_index', 'ph': 'M', 'pid': _TRACE_PID, 'tid': tid, 'args': { 'sort_index': tid } })
+
+		args: Dict[str, Any] = {
+			'command': shlex_join_shim(result.command),
+			'run_dir': str(result.run_dir),
+			'returncode': result.returncode,
+		}
+		if result.cancelled:
+			args['cancelled'] = True
+		for name in ('queue_latency', 'cpu_time', 'max_rss_kib', 'stdout_num_bytes', 'stderr_num_bytes'):
+			value = getattr(result, name)
+			if value is not None:
+				args[name] = value
+
+		self._write_event({
+			'name': self._name_of_result(result),
+			'cat': 'job' if result.returncode == 0 else 'job,failed',
+			'ph': 'X',
+			'pid': _TRACE_PID,
+			'tid': tid,
+			'ts': self._micros_of_time(result.start_time),
+			'dur': round((result.end_time - result.start_time) * 1e6, 3),
+			'args': args,
+		})
+
+	def record_command_result(self,
+	                          *,
+	                          result: CommandResult,
+	                          num_remaining_commands: int,
+	                          ) -> None:
+		'''
+		Record the result of a command having been executed (matching the CommandExecutor callback arguments)
+
+		:param result                 : The result of the command execution
+		:param num_remaining_commands : The number of remaining commands (unused)
+		'''
+		self.record(result)
@@ -0,0 +1,372 @@
+import itertools
+import json
+import logging
+
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cppbuild.ninja_call import NinjaCompDBRecord, _iter_checked_ninja_run_lines
+
+logger = logging.getLogger(__name__)
+
+_JSON_WHITESPACE = ' \t\n\r'
+
+# The number of leading characters of a command by which its candidate shared prefixes are looked up
+_COMMAND_HEAD_LENGTH = 256
+
+# The maximum number of candidate shared prefixes to try for a command (most recently added first)
+_MAX_PREFIX_CANDIDATES = 8
+
+
+def iter_compdb_dicts(chunks: Iterable[str]) -> Iterator[dict]:
+	'''
+	Incrementally parse a JSON compdb (ie an array of objects) from the specified chunks of text,
+	yielding each object as soon as it has been read
+
+	Unlike json.loads(), this never holds more than one object (and the current chunk) in memory.
+
+	:param chunks : The chunks of the JSON text (eg the lines of `ninja -t compdb` output, or one whole string)
+	'''
+	decoder = json.JSONDecoder()
+	buffer = ''
+	position = 0
+	has_started = False
+	has_finished = False
+	# Whether an incomplete object is waiting for a closing brace (so there's no point retrying the decode until one arrives)
+	is_awaiting_close = False
+	for chunk in chunks:
+		buffer = buffer[position:] + chunk if position < len(buffer) else chunk
+		position = 0
+		if is_awaiting_close and '}' not in chunk:
+			continue
+		is_awaiting_close = False
+		while not has_finished:
+			while position < len(buffer) and buffer[position] in _JSON_WHITESPACE:
+				position += 1
+			if position == len(buffer):
+				break
+			if not has_started:
+				if buffer[position] != '[':
+					raise ValueError(f'Expected a JSON compdb array but found {buffer[position:position + 20]!r}')
+				has_started = True
+				position += 1
+				continue
+			if buffer[position] == ',':
+				position += 1
+				continue
+			if buffer[position] == ']':
+				has_finished = True
+				position += 1
+				break
+			try:
+				compdb_dict, position = decoder.raw_decode(buffer, position)
+			except json.JSONDecodeError:
+				# Assume the object is incomplete until there's no more input
+				is_awaiting_close = True
+				break
+			yield compdb_dict
+
+	trailing_content = buffer[position:].strip(_JSON_WHITESPACE)
+	if has_finished:
+		if trailing_content:
+			raise ValueError(f'Unexpected content after the JSON compdb array: {trailing_content[:20]!r}')
+		return
+	if not has_started:
+		raise ValueError('Expected a JSON compdb array but found no content')
+	if trailing_content:
+		# Raise the decode error of the incomplete (or invalid) object
+		decoder.raw_decode(buffer, position)
+	raise ValueError('The JSON compdb array is not terminated')
+
+
+class ColumnarCompDB:
+	'''
+	A compact, columnar compdb, which stores the fields of each record in parallel columns
+
+	 * Each directory string is stored once, with each record holding its ID in an array('I')
+	 * Each command is split into a prefix that's shared with other commands (eg the compiler, defines, includes and
+	   flags) and a per-record suffix, with each distinct prefix stored once. A command that starts with a prefix
+	   already stored (looked up by the command's first few hundred characters) shares it without being searched;
+	   otherwise its prefix is everything before the first mention of the record's output or file.
+	 * Paths are only made on demand
+
+	Indexing or iterating this yields NinjaCompDBRecords (made on demand).
+	'''
+
+	def __init__(self):
+		'''
+		Ctor of an empty compdb
+		'''
+		self._directories: List[str] = []
+		self._directory_id_of_directory: Dict[str, int] = {}
+		self._directory_ids = array('I')
+
+		self._command_prefixes: List[str] = []
+		self._command_prefix_id_of_prefix: Dict[str, int] = {}
+		# The IDs of the stored prefixes that start with each command head
+		self._command_prefix_ids_of_head: Dict[str, List[int]] = {}
+		self._command_prefix_ids = array('I')
+		self._command_suffixes: List[str] = []
+
+		self._files: List[str] = []
+		self._outputs: List[str] = []
+
+		# The Paths of the directories (made on demand)
+		self._directory_paths: List[Optional[Path]] = []
+
+	def append(self, *, directory: str, command: str, file: str, output: str) -> None:
+		'''
+		Append a record
+
+		:param directory : The directory in which the command is run
+		:param command   : The command
+		:param file      : The primary input file
+		:param output    : The name of the output target
+		'''
+		directory_id = self._directory_id_of_directory.get(directory)
+		if directory_id is None:
+			directory_id = len(self._directories)
+			self._directory_id_of_directory[directory] = directory_id
+			self._directories.append(directory)
+			self._directory_paths.append(None)
+		self._directory_ids.append(directory_id)
+
+		prefix_id = self._known_command_prefix_id(command)
+		if prefix_id is None:
+			prefix = command[:_command_split_index(command, file=file, output=output)]
+			prefix_id = self._command_prefix_id_of_prefix.get(prefix)
+			if prefix_id is None:
+				prefix_id = len(self._command_prefixes)
+				self._command_prefix_id_of_prefix[prefix] = prefix_id
+				self._command_prefixes.append(prefix)
+				if len(prefix) >= _COMMAND_HEAD_LENGTH:
+					self._command_prefix_ids_of_head.setdefault(prefix[:_COMMAND_HEAD_LENGTH], []).append(prefix_id)
+		self._command_prefix_ids.append(prefix_id)
+		self._command_suffixes.append(command[len(self._command_prefixes[prefix_id]):])
+
+		self._files.append(file)
+		self._outputs.append(output)
+
+	def _known_command_prefix_id(self, command: str) -> Optional[int]:
+		'''
+		The ID of a stored (long) prefix with which the specified command starts (or None if there's none)
+
+		:param command : The command
+		'''
+		candidate_ids = self._command_prefix_ids_of_head.get(command[:_COMMAND_HEAD_LENGTH])
+		if candidate_ids is None:
+			return None
+		for candidate_id in reversed(candidate_ids[-_MAX_PREFIX_CANDIDATES:]):
+			if command.startswith(self._command_prefixes[candidate_id]):
+				return candidate_id
+		return None
+
+	def __len__(self) -> int:
+		return len(self._files)
+
+	def directory_str(self, index: int) -> str:
+		'''
+		The directory of the specified record as a string
+
+		:param index : The index of the record
+		'''
+		return self._directories[self._directory_ids[index]]
+
+	def directory(self, index: int) -> Path:
+		'''
+		The directory of the specified record (as a Path shared between all the records with the same directory)
+
+		:param index : The index of the record
+		'''
+		directory_id = self._directory_ids[index]
+		directory_path = self._directory_paths[directory_id]
+		if directory_path is None:
+			directory_path = Path(self._directories[directory_id])
+			self._directory_paths[directory_id] = directory_path
+		return directory_path
+
+	def command(self, index: int) -> str:
+		'''
+		The command of the specified record
+
+		:param index : The index of the record
+		'''
+		return self._command_prefixes[self._command_prefix_ids[index]] + self._command_suffixes[index]
+
+	def file_str(self, index: int) -> str:
+		'''
+		The primary input file of the specified record as a string
+
+		:param index : The index of the record
+		'''
+		return self._files[index]
+
+	def output(self, index: int) -> str:
+		'''
+		The output of the specified record
+
+		:param index : The index of the record
+		'''
+		return self._outputs[index]
+
+	def num_distinct_command_prefixes(self) -> int:
+		'''
+		The number of distinct command prefixes (eg for judging how well the commands are being shared)
+		'''
+		return len(self._command_prefixes)
+
+	def __getitem__(self, index: int) -> NinjaCompDBRecord:
+		if index < 0:
+			index += len(self)
+		return NinjaCompDBRecord(
+			directory=self.directory(index),
+			command=self.command(index),
+			file=Path(self._files[index]),
+			output=self._outputs[index],
+		)
+
+	def __iter__(self) -> Iterator[NinjaCompDBRecord]:
+		return (self[index] for index in range(len(self)))
+
+
+def _command_split_index(command: str, *, file: str, output: str) -> int:
+	'''
+	The index at which to split the specified command into the part likely to be shared with other commands and
+	the part specific to this record, ie the index of the space before the first mention of the output or the file
+	(or the end of the command if neither is mentioned)
+
+	:param command : The command
+	:param file    : The primary input file of the command
+	:param output  : The output of the command
+	'''
+	split_index = len(command)
+	for per_record_str in (output, file):
+		if per_record_str:
+			found_index = command.find(' ' + per_record_str)
+			if 0 <= found_index < split_index:
+				split_index = found_index
+	return split_index
+
+
+def columnar_compdb_of_compdb_dicts(compdb_dicts: Iterable[dict]) -> ColumnarCompDB:
+	'''
+	Make a ColumnarCompDB from the specified dicts as parsed from `ninja -t compdb` json
+
+	:param compdb_dicts : The dicts (eg from iter_compdb_dicts())
+	'''
+	compdb = ColumnarCompDB()
+	for x in compdb_dicts:
+		compdb.append(directory=x['directory'], command=x['command'], file=x['file'], output=x['output'])
+	return compdb
+
+
+def _field_of_line(stripped_line: str) -> Optional[Tuple[str, str]]:
+	'''
+	The key and the value of the string field on the specified (stripped) line of a JSON object, eg
+	`"file": "a.cpp",` (or None if the line isn't exactly one string field)
+
+	:param stripped_line : The line, without its leading or trailing whitespace
+	'''
+	key_end = stripped_line.find('": "')
+	if key_end <= 0 or stripped_line[0] != '"' or '"' in stripped_line[1:key_end]:
+		return None
+	if stripped_line.endswith('",'):
+		value = stripped_line[key_end + 4:-2]
+	elif stripped_line.endswith('"'):
+		value = stripped_line[key_end + 4:-1]
+	else:
+		return None
+	if '\\' in value or '"' in value:
+		try:
+			value = json.loads('"' + value + '"')
+		except ValueError:
+			return None
+	return stripped_line[1:key_end], value
+
+
+def columnar_compdb_of_compdb_lines(lines: Iterable[str]) -> ColumnarCompDB:
+	'''
+	Make a ColumnarCompDB from the specified lines of a JSON compdb, as streamed from `ninja -t compdb`
+
+	Ninja writes each object's opening and closing braces and each of its string fields on lines of their own, so
+	this reads each field from its line with string operations (only JSON-decoding values that contain escapes)
+	rather than running the JSON decoder over every object. From the first line that doesn't fit that layout
+	(eg if the whole compdb is on one line), the rest of the content is parsed with iter_compdb_dicts().
+
+	:param lines : The lines of the JSON compdb
+	'''
+	compdb = ColumnarCompDB()
+	lines = iter(lines)
+	has_started = False
+	has_finished = False
+	# The raw lines and the fields of the object being read
+	object_lines: List[str] = []
+	fields: Dict[str, str] = {}
+	for line in lines:
+		stripped = line.strip()
+		field = _field_of_line(stripped) if object_lines else None
+		if field is not None:
+			fields[field[0]] = field[1]
+			object_lines.append(line)
+		elif not stripped and not object_lines:
+			pass
+		elif has_finished:
+			raise ValueError(f'Unexpected content after the JSON compdb array: {stripped[:20]!r}')
+		elif stripped == '{' and has_started and not object_lines:
+			object_lines.append(line)
+		elif (stripped == '}' or stripped == '},') and object_lines and len(fields) == 4:
+			compdb.append(directory=fields['directory'], command=fields['command'], file=fields['file'], output=fields['output'])
+			object_lines = []
+			fields = {}
+		elif stripped == '[' and not has_started:
+			has_started = True
+		elif stripped == ']' and has_started and not object_lines:
+			has_finished = True
+		else:
+			remaining_lines = itertools.chain(['['] if has_started else [], object_lines, [line], lines)
+			for x in iter_compdb_dicts(remaining_lines):
+				compdb.append(directory=x['directory'], command=x['command'], file=x['file'], output=x['output'])
+			return compdb
+	if not has_finished:
+		# Raise the error of the incomplete (or missing) array
+		list(iter_compdb_dicts(itertools.chain(['['] if has_started else [], object_lines)))
+	return compdb
+
+
+def _iter_lines_of_str(content: str) -> Iterator[str]:
+	'''
+	Yield the lines of the specified string (with their line endings), copying only one line at a time
+
+	:param content : The string
+	'''
+	start = 0
+	while start < len(content):
+		end = content.find('\n', start) + 1 or len(content)
+		yield content[start:end]
+		start = end
+
+
+def columnar_compdb_of_compdb_str(compdb_str: str) -> ColumnarCompDB:
+	'''
+	Make a ColumnarCompDB from the specified ninja compdb string (without holding its parsed JSON in memory at once)
+
+	:param compdb_str: A string as generated by `ninja compdb -t compdb`
+	'''
+	return columnar_compdb_of_compdb_lines(_iter_lines_of_str(compdb_str))
+
+
+def get_columnar_compdb_for_dir(ninja_build_dir: Path) -> ColumnarCompDB:
+	'''
+	Call ninja to query the compdb and return the resulting ColumnarCompDB,
+	streaming ninja's output rather than holding it all in memory
+
+	:param ninja_build_dir: The ninja build directory to process
+	'''
+	logger.info(f'Calling ninja on directory {ninja_build_dir} to stream the compdb...')
+
+	return columnar_compdb_of_compdb_lines(_iter_checked_ninja_run_lines([
+		'ninja',
+		'-C', str(ninja_build_dir),
+		'-t', 'compdb',
+	]))
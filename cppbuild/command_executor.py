@@ -1,112 +1,383 @@
-import datetime
+import collections
+import contextlib
+import enum
+import functools
+import signal
 import time
 
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Any, Callable, Iterable, List, Optional, Tuple
+from typing import Callable, Collection, Deque, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
+from cppbuild.admission_control import AdmissionController
+from cppbuild.command_job import CommandJob
 from cppbuild.command_result import CommandResult
+from cppbuild.job_scheduler import FifoScheduler, JobScheduler
+from cppbuild.selector_draining_popen import SelectorDrainingPopen
 from cppbuild.self_draining_popen import SelfDrainingPopen
+from cppbuild.wakeup_selector import WakeupSelector
+from process.execute_on_signals import execute_on_signals
 
-@dataclass
-class CommandJob:
+# The returncode reported for a cancelled job that was never started
+CANCELLED_BEFORE_START_RETURNCODE = -int(signal.SIGTERM)
+
+class DrainMode(enum.Enum):
 	'''
-	Represent one command job to be performed
+	How a CommandExecutor drains the stdout/stderr of its running jobs
 	'''
+	THREADS  = enum.auto() # Two threads per running job (SelfDrainingPopen)
+	SELECTOR = enum.auto() # All jobs' pipes multiplexed in the thread waiting on the executor (SelectorDrainingPopen)
 
-	# The command to be performed
-	command: List[str]
-
-	# The directory in which the command should be performed
-	run_dir: Path = Path('/')
 
-	# Data associated with the command that will be passed in the post-completion callback
-	associated_data: Any = None
+# Either of the Popen-like types that a CommandExecutor may use to run a job
+DrainingPopen = Union[SelfDrainingPopen, SelectorDrainingPopen]
 
 
 def _do_nothing(*args, **kwargs):
 	pass
 
 
+def _cancel_every_job(_job: CommandJob) -> bool:
+	return True
+
+
+@contextlib.contextmanager
+def _signals_blocked(signals: Collection[int]):
+	'''
+	A context-manager that blocks the specified signals in the calling thread (and in any threads it starts meanwhile,
+	which inherit its signal mask), so that their handlers only run once it exits
+
+	:param signals : The signals to block (if none, this does nothing)
+	'''
+	if not signals:
+		yield
+		return
+	prev_mask = signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+	try:
+		yield
+	finally:
+		signal.pthread_sigmask(signal.SIG_SETMASK, prev_mask)
+
+
+def _stamped_with_enqueue_time(jobs: Iterable[CommandJob], enqueue_time: float) -> Iterator[CommandJob]:
+	for job in jobs:
+		job.enqueue_time = enqueue_time
+		yield job
+
+
 class CommandExecutor:
-	def __init__(self, *, num_parallel_jobs: int, callback: Callable = _do_nothing):
+	def __init__(self,
+	             *,
+	             num_parallel_jobs: int,
+	             callback: Callable = _do_nothing,
+	             drain_mode: DrainMode = DrainMode.THREADS,
+	             max_output_bytes_in_memory: Optional[int] = None,
+	             scheduler: Optional[JobScheduler] = None,
+	             admission_controller: Optional[AdmissionController] = None,
+	             fail_fast_after: Optional[int] = None,
+	             kill_process_groups: bool = False,
+	             cancel_grace_period: float = 5.0,
+	             ):
 		'''
 		Construct
 
+		With DrainMode.SELECTOR, the jobs' output is only drained whilst waiting in wait_for_completion()
+		(eg via finish_all()), so the executor should be waited on rather than only update()d.
+
 		:param num_parallel_jobs : The maximum number of commands to execute simultaneously
 		:param callback          : A callback to call once after job completes with the details
+		:param drain_mode        : How to drain the running jobs' stdout/stderr (default: DrainMode.THREADS)
+		:param max_output_bytes_in_memory : (optional) The maximum number of bytes of each job's stdout and of each
+		                                    job's stderr to keep in memory, beyond which the middle is elided
+		                                    (or None for no limit); see DrainedByteStream
+		:param scheduler         : (optional) The JobScheduler that holds the queued jobs and determines the order
+		                           in which they're started (default: a new FifoScheduler)
+		:param admission_controller : (optional) An AdmissionController that may hold back the next queued job
+		                              (whilst other jobs are running) to keep within resource limits
+		:param fail_fast_after   : (optional) The number of failed jobs after which to stop starting jobs and
+		                           cancel all the others via terminate_all_and_wipe_queue() (or None to never do so)
+		:param kill_process_groups : Whether to start each job in its own session and signal its whole process group
+		                             when cancelling it (so that eg compiler subprocesses are also killed).
+		                             This also stops a terminal's Ctrl-C from reaching the jobs directly,
+		                             so use terminate_on_signals() alongside it.
+		:param cancel_grace_period : The default number of seconds to wait after SIGTERM before SIGKILL when cancelling
 		'''
 
 		# Stash the callback
 		self.callback: Callable = callback
 
+		# Stash the drain mode and the per-stream output memory limit
+		self._drain_mode: DrainMode = drain_mode
+		self._max_output_bytes_in_memory: Optional[int] = max_output_bytes_in_memory
+
 		# Create a list of slots in which to perform the jobs
 		self._running_jobs: List[
-			Optional[Tuple[SelfDrainingPopen, CommandJob]]
+			Optional[Tuple[DrainingPopen, CommandJob]]
 		] = [None] * num_parallel_jobs
 
+		# Create a stack of the indices of the free slots (ordered so that lower slots are used first)
+		self._free_slots: List[int] = list(reversed(range(num_parallel_jobs)))
+
+		# Create a queue of the indices of slots whose jobs have signalled completion but haven't yet been processed
+		# (appended from the drainer threads in DrainMode.THREADS, which is safe for a deque)
+		self._completed_slots: Deque[int] = collections.deque()
+
 		# Create a queue of jobs that have not yet been started
-		self._queue: List[CommandJob] = []
+		self._queue: JobScheduler = FifoScheduler() if scheduler is None else scheduler
 
+		# Stash the admission controller
+		self._admission_controller: Optional[AdmissionController] = admission_controller
 
-	# def terminate_all_and_wipe_queue();
-	# 	# TODO: later, can add optional callback predicate determining whether a specific job should be wiped
+		# Stash the cancellation settings
+		self._fail_fast_after: Optional[int] = fail_fast_after
+		self._kill_process_groups: bool = kill_process_groups
+		self._cancel_grace_period: float = cancel_grace_period
 
+		# The number of jobs that have failed (not including cancelled jobs)
+		self._num_failed: int = 0
 
-	def update(self) -> None:
+		# The indices of the slots whose jobs have been cancelled
+		self._cancelled_slots: Set[int] = set()
+
+		# The signals whose handlers (eg from terminate_on_signals()) must not run between a job being taken off the
+		# queue and it being recorded in its slot, which would leave it running untracked
+		self._signals_blocked_whilst_starting_jobs: Set[int] = set()
+
+		# Create a selector that running jobs will wake when they complete
+		self._wakeup_selector = WakeupSelector()
+
+	def close(self) -> None:
 		'''
-		Update all computation slots, processing any completed jobs and
-		starting any queued jobs in any free slots
+		Release the resources used to wait for job completion
+
+		This doesn't affect any running jobs.
 		'''
+		self._wakeup_selector.close()
 
-		# Loop over the running jobs
-		for index, popen_slot in enumerate(self._running_jobs):
 
-			# If this job is complete, grab it and free up the slot
-			retrieved_job = None
-			if popen_slot is not None:
-				return_code_if_complete = popen_slot[0].poll()
-				if return_code_if_complete is not None:
-					retrieved_job = popen_slot
-					self._running_jobs[index] = None
+	def terminate_all_and_wipe_queue(self,
+	                                 *,
+	                                 should_cancel: Callable[[CommandJob], bool] = _cancel_every_job,
+	                                 grace_period: Optional[float] = None,
+	                                 report: bool = True,
+	                                 ) -> None:
+		'''
+		Cancel the queued and running jobs: remove queued jobs from the queue and terminate running jobs
+		(with SIGTERM and then, for any still running after the grace period, SIGKILL)
 
-			# If this slot is free and there are jobs in the queue,
-			# pop the first one off and start it running
-			if self._running_jobs[index] is None:
-				if len(self._queue):
-					command_job = self._queue.pop(0)
-					self._running_jobs[index] = (
-						SelfDrainingPopen(
-							command_job.command,
-							cwd=command_job.run_dir,
-						),
-						command_job,
-					)
+		If report is true, this then calls the callback for each cancelled job with a result whose cancelled is true
+		(and, for jobs that were never started, whose returncode is CANCELLED_BEFORE_START_RETURNCODE).
+		If report is false (eg when called from a signal handler), the callback isn't called.
 
-			# If a completed job was grabbed, post-process it
-			if retrieved_job is not None:
-				completed_popen: SelfDrainingPopen
-				job_details: CommandJob
-				completed_popen, job_details = retrieved_job
+		:param should_cancel : (optional) A predicate determining whether a specific job should be cancelled (default: all)
+		:param grace_period  : (optional) The number of seconds to wait after SIGTERM before SIGKILL
+		                       (default: the executor's cancel_grace_period)
+		:param report        : Whether to update the executor, calling the callback for the cancelled jobs
+		'''
+		grace_period = self._cancel_grace_period if grace_period is None else grace_period
+
+		# Wipe the (matching) queued jobs, retaining the others in their original order
+		cancelled_queued_jobs: List[CommandJob] = []
+		retained_queued_jobs: List[CommandJob] = []
+		while len(self._queue):
+			queued_job = self._queue.pop()
+			(cancelled_queued_jobs if should_cancel(queued_job) else retained_queued_jobs).append(queued_job)
+		self._queue.extend(retained_queued_jobs)
+
+		# Terminate the (matching) running jobs, escalating to SIGKILL if they haven't completed within the grace period
+		cancelled_slots = [
+			index
+			for index, popen_slot in enumerate(self._running_jobs)
+			if popen_slot is not None and should_cancel(popen_slot[1])
+		]
+		self._cancelled_slots.update(cancelled_slots)
+		for sig in (signal.SIGTERM, signal.SIGKILL):
+			for index in cancelled_slots:
+				popen_slot = self._running_jobs[index]
+				assert popen_slot is not None
+				popen_slot[0].send_signal(sig, to_process_group=self._kill_process_groups)
+			if self._wait_for_slots_to_complete(cancelled_slots, grace_period):
+				break
+
+		if report:
+			for queued_job in cancelled_queued_jobs:
 				self.callback(
 					result=CommandResult(
-						returncode=completed_popen.returncode,
-						stdout=completed_popen.stdout_bytes,
-						stderr=completed_popen.stderr_bytes,
-						command=job_details.command,
-						run_dir=job_details.run_dir,
-						associated_data=job_details.associated_data,
+						returncode=CANCELLED_BEFORE_START_RETURNCODE,
+						command=queued_job.command,
+						run_dir=queued_job.run_dir,
+						associated_data=queued_job.associated_data,
+						enqueue_time=queued_job.enqueue_time,
+						cancelled=True,
 					),
 					num_remaining_commands=num_remaining(self),
 				)
+			self.update()
+
+	def _wait_for_slots_to_complete(self, slot_indices: List[int], timeout: float) -> bool:
+		'''
+		Wait until the jobs in the specified slots have all signalled completion or until the timeout expires
+
+		Return whether they have all signalled completion.
+
+		:param slot_indices : The indices of the slots to wait for
+		:param timeout      : The maximum number of seconds to wait
+		'''
+		deadline = time.monotonic() + timeout
+		while True:
+			completed_slots = set(self._completed_slots)
+			if all(self._running_jobs[index] is None or index in completed_slots for index in slot_indices):
+				return True
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				return False
+			self.wait_for_completion(remaining)
+
+	def _handle_completion(self, slot_index: int) -> None:
+		'''
+		Record that the job in the specified slot has completed and wake any waiter
+
+		This may be called from any thread.
+
+		:param slot_index : The index of the slot whose job has completed
+		'''
+		self._completed_slots.append(slot_index)
+		self._wakeup_selector.notify()
+
+	def _start_job(self, command_job: CommandJob, slot_index: int) -> DrainingPopen:
+		'''
+		Start the specified job running according to the drain mode and return the resulting Popen-like object
+
+		:param command_job : The job to start
+		:param slot_index  : The index of the slot in which the job is being run
+		'''
+		on_complete = functools.partial(self._handle_completion, slot_index)
+		if self._drain_mode == DrainMode.SELECTOR:
+			return SelectorDrainingPopen(
+				command_job.command,
+				cwd=command_job.run_dir,
+				wakeup_selector=self._wakeup_selector,
+				on_complete=on_complete,
+				max_bytes_in_memory=self._max_output_bytes_in_memory,
+				start_new_session=self._kill_process_groups,
+			)
+		return SelfDrainingPopen(
+			command_job.command,
+			cwd=command_job.run_dir,
+			on_complete=on_complete,
+			max_bytes_in_memory=self._max_output_bytes_in_memory,
+			start_new_session=self._kill_process_groups,
+		)
+
+	def update(self) -> None:
+		'''
+		Update all computation slots, processing any completed jobs and
+		starting any queued jobs in any free slots
+
+		This only visits the slots whose jobs have signalled completion, so its cost is proportional to the
+		number of jobs completed and started, rather than to the number of slots or the length of the queue.
+		'''
+
+		# Grab each of the completed jobs and free up its slot
+		retrieved_jobs: List[Tuple[int, DrainingPopen, CommandJob, bool]] = []
+		while self._completed_slots:
+			index = self._completed_slots.popleft()
+			popen_slot = self._running_jobs[index]
+			assert popen_slot is not None
+			return_code = popen_slot[0].poll()
+			assert return_code is not None
+			was_cancelled = index in self._cancelled_slots
+			self._cancelled_slots.discard(index)
+			if return_code != 0 and not was_cancelled:
+				self._num_failed += 1
+			retrieved_jobs.append((index, popen_slot[0], popen_slot[1], was_cancelled))
+			self._running_jobs[index] = None
+			self._free_slots.append(index)
+			if self._admission_controller is not None:
+				self._admission_controller.release(popen_slot[1])
+
+		# While there are free slots and jobs in the queue (and not failing fast),
+		# pop the next job off (as chosen by the scheduler) and start it running
+		# (unless the admission controller holds it back whilst other jobs are running).
+		# If a job can't be started (eg its executable doesn't exist), it's dropped, its slot and admission are
+		# given back and the exception is raised once the completed jobs have been post-processed.
+		start_exception: Optional[Exception] = None
+		failing_fast = self._fail_fast_after is not None and self._num_failed >= self._fail_fast_after
+		if self._admission_controller is not None and self._free_slots and self._queue:
+			self._admission_controller.refresh()
+		while self._free_slots and self._queue and not failing_fast:
+			if self._admission_controller is not None:
+				if self.num_running() > 0 and not self._admission_controller.can_admit(self._queue.peek()):
+					break
+				self._admission_controller.admit(self._queue.peek())
+			with _signals_blocked(self._signals_blocked_whilst_starting_jobs):
+				index = self._free_slots.pop()
+				command_job = self._queue.pop()
+				try:
+					self._running_jobs[index] = (
+						self._start_job(command_job, index),
+						command_job,
+					)
+				except Exception as exception: # pylint: disable=broad-except
+					self._free_slots.append(index)
+					if self._admission_controller is not None:
+						self._admission_controller.release(command_job)
+					start_exception = exception
+					break
+
+		# Post-process each of the completed jobs
+		slot_index: int
+		completed_popen: DrainingPopen
+		job_details: CommandJob
+		was_cancelled: bool
+		for slot_index, completed_popen, job_details, was_cancelled in retrieved_jobs:
+			rusage = completed_popen.rusage
+			drained_bytes = completed_popen.drained_bytes
+			self.callback(
+				result=CommandResult(
+					returncode=completed_popen.returncode,
+					stdout=completed_popen.stdout_bytes,
+					stderr=completed_popen.stderr_bytes,
+					command=job_details.command,
+					run_dir=job_details.run_dir,
+					associated_data=job_details.associated_data,
+					enqueue_time=job_details.enqueue_time,
+					start_time=completed_popen.start_time,
+					end_time=completed_popen.end_time,
+					user_cpu_time=None if rusage is None else rusage.ru_utime,
+					system_cpu_time=None if rusage is None else rusage.ru_stime,
+					max_rss_kib=None if rusage is None else rusage.ru_maxrss,
+					stdout_num_bytes=drained_bytes.stdout_stream.num_bytes,
+					stderr_num_bytes=drained_bytes.stderr_stream.num_bytes,
+					slot_index=slot_index,
+					cancelled=was_cancelled,
+				),
+				num_remaining_commands=num_remaining(self),
+			)
+
+		# If failing fast, cancel everything else
+		if failing_fast and (self._queue or self.num_running() > len(self._cancelled_slots)):
+			self.terminate_all_and_wipe_queue()
+
+		if start_exception is not None:
+			raise start_exception
+
+	def wait_for_completion(self, timeout: Optional[float] = None) -> bool:
+		'''
+		Block until at least one running job has completed since the previous wait (or until the timeout expires)
+
+		This doesn't update the slots, so call update() afterwards to process the completed jobs.
+		Return whether any job completion has been signalled.
+
+		:param timeout : The maximum number of seconds to wait (or None to wait indefinitely)
+		'''
+		return self._wakeup_selector.wait(timeout)
 
 	def extend_queue(self, jobs: Iterable[CommandJob]) -> None:
 		'''
-		Extend the queue with the specified CommandJobs and update
+		Extend the queue with the specified CommandJobs (stamping each with the same enqueue_time) and update
 
 		:param jobs: The jobs to add
 		'''
-		self._queue.extend(jobs)
+		self._queue.extend(_stamped_with_enqueue_time(jobs, time.monotonic()))
 		self.update()
 
 	def num_running(self) -> int:
@@ -116,7 +387,7 @@ class CommandExecutor:
 
 		This doesn't update jobs.
 		'''
-		return sum(1 if x is not None else 0 for x in self._running_jobs)
+		return len(self._running_jobs) - len(self._free_slots)
 
 	def num_in_queue(self) -> int:
 		'''
@@ -125,6 +396,49 @@ class CommandExecutor:
 		return len(self._queue)
 
 
+def chain_callbacks(*callbacks: Callable) -> Callable:
+	'''
+	Make a CommandExecutor callback that calls each of the specified callbacks in turn
+	(eg a ProgressPrinter's and a JobHistory's record_command_result)
+
+	:param callbacks : The callbacks to call
+	'''
+	def call_all(*, result: CommandResult, num_remaining_commands: int) -> None:
+		for callback in callbacks:
+			callback(result=result, num_remaining_commands=num_remaining_commands)
+	return call_all
+
+
+@contextlib.contextmanager
+def terminate_on_signals(executor: CommandExecutor,
+                         *,
+                         signals: Optional[List[signal.Signals]] = None, # pylint: disable=no-member
+                         grace_period: float = 1.0,
+                         ):
+	'''
+	A context-manager that tears down all the executor's jobs (without calling the callback)
+	if/when any of the specified signals (default: SIGTERM, SIGINT) are handled, before re-raising the signal
+
+	Whilst this is active, the executor blocks the signals whilst starting each job (until the job is recorded in
+	its slot), so that a job can't be started without being torn down.
+
+	:param executor     : The CommandExecutor whose jobs should be torn down
+	:param signals      : (optional; default [ signal.SIGTERM, signal.SIGINT ]) The signals to handle
+	:param grace_period : The number of seconds to wait after SIGTERM before SIGKILL
+	'''
+	signals_or_default = [ signal.SIGTERM, signal.SIGINT ] if signals is None else signals
+	newly_blocked_signals = set(signals_or_default) - executor._signals_blocked_whilst_starting_jobs # pylint: disable=protected-access
+	executor._signals_blocked_whilst_starting_jobs.update(newly_blocked_signals) # pylint: disable=protected-access
+	try:
+		with execute_on_signals(
+			lambda: executor.terminate_all_and_wipe_queue(grace_period=grace_period, report=False),
+			signals=signals_or_default,
+		):
+			yield
+	finally:
+		executor._signals_blocked_whilst_starting_jobs.difference_update(newly_blocked_signals) # pylint: disable=protected-access
+
+
 def num_remaining(command_executor: CommandExecutor) -> int:
 	'''
 	The number of jobs currently running or queued to run
@@ -143,13 +457,13 @@ def finish_all(executor: CommandExecutor):
 	'''
 	Wait until the specified CommandExecutor has finished all its work
 
-	This could avoid polling (though then it might )
+	This blocks until jobs complete (rather than polling) and then updates the executor,
+	which runs the callback for each completed job and starts queued jobs in the freed slots.
 
 	:param executor : The CommandExecutor to wait for
 	'''
+	executor.update()
 	while not all_are_finished(executor):
-		time.sleep(
-			datetime.timedelta(microseconds=100) /
-			datetime.timedelta(seconds=1)
-		)
+		if executor.num_running() > 0:
+			executor.wait_for_completion()
 		executor.update()
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional
+
+
+@dataclass
+class CommandJob:
+	'''
+	Represent one command job to be performed
+	'''
+
+	# The command to be performed
+	command: List[str]
+
+	# The directory in which the command should be performed
+	run_dir: Path = Path('/')
+
+	# Data associated with the command that will be passed in the post-completion callback
+	associated_data: Any = None
+
+	# The priority of the job, used by a PriorityScheduler (higher priorities are started first)
+	priority: float = 0.0
+
+	# The estimated cost of the job (eg the expected wall time in seconds), used by a
+	# LongestProcessingTimeFirstScheduler, or None if unknown
+	estimated_cost: Optional[float] = None
+
+	# The estimated peak memory use of the job in bytes, used by an AdmissionController
+	memory_estimate: int = 0
+
+	# The number of CPUs the job is expected to keep busy, used by an AdmissionController
+	cpu_weight: float = 1.0
+
+	# The time.monotonic() time at which the job was queued (set by CommandExecutor.extend_queue()),
+	# or None if it hasn't been queued
+	enqueue_time: Optional[float] = None
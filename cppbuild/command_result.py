@@ -27,3 +27,62 @@ class CommandResult:
 
 	# Any data that was stored along with the command when it was added to the command_executor
 	associated_data: Any = None
+
+	# The time.monotonic() time at which the command was queued (or None if unknown)
+	enqueue_time: Optional[float] = None
+
+	# The time.monotonic() time at which the command was started (or None if unknown)
+	start_time: Optional[float] = None
+
+	# The time.monotonic() time at which the command's completion was observed (or None if unknown)
+	end_time: Optional[float] = None
+
+	# The user CPU time in seconds used by the command and its waited-for descendants (or None if unknown)
+	user_cpu_time: Optional[float] = None
+
+	# The system CPU time in seconds used by the command and its waited-for descendants (or None if unknown)
+	system_cpu_time: Optional[float] = None
+
+	# The peak resident set size of the command or of its largest waited-for descendant
+	# (in KiB, as reported by wait4() on Linux) (or None if unknown)
+	max_rss_kib: Optional[int] = None
+
+	# The total number of bytes the command wrote to stdout, including any elided from stdout (or None if unknown)
+	stdout_num_bytes: Optional[int] = None
+
+	# The total number of bytes the command wrote to stderr, including any elided from stderr (or None if unknown)
+	stderr_num_bytes: Optional[int] = None
+
+	# The index of the executor slot in which the command was run (or None if unknown or never started)
+	slot_index: Optional[int] = None
+
+	# Whether the command was cancelled (eg by CommandExecutor.terminate_all_and_wipe_queue())
+	# rather than being left to complete
+	cancelled: bool = False
+
+	@property
+	def wall_time(self) -> Optional[float]:
+		'''
+		The wall-clock time in seconds taken by the command (or None if unknown)
+		'''
+		if self.start_time is None or self.end_time is None:
+			return None
+		return self.end_time - self.start_time
+
+	@property
+	def queue_latency(self) -> Optional[float]:
+		'''
+		The time in seconds for which the command waited in the queue before being started (or None if unknown)
+		'''
+		if self.enqueue_time is None or self.start_time is None:
+			return None
+		return self.start_time - self.enqueue_time
+
+	@property
+	def cpu_time(self) -> Optional[float]:
+		'''
+		The total (user + system) CPU time in seconds used by the command (or None if unknown)
+		'''
+		if self.user_cpu_time is None or self.system_cpu_time is None:
+			return None
+		return self.user_cpu_time + self.system_cpu_time
@@ -0,0 +1,174 @@
+import bisect
+import fnmatch
+import os
+import re
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from cppbuild.columnar_compdb import ColumnarCompDB
+from cppbuild.dir_tools import absolute_path_str
+from cppbuild.ninja_call import NinjaCompDBRecord, project_dir_of_compdb
+
+# The characters that make a glob pattern match more than a literal string
+_GLOB_SPECIAL_CHARS_RE = re.compile(r'[*?\[]')
+
+
+class CompDB:
+	'''
+	A compdb with indexes for finding its records by file, output or directory, and for prefix/glob queries over files
+
+	The files are indexed by their normalized, absolute paths (ie the record's file relative to its directory).
+	Each index is built on its first use, after which a lookup costs O(1) (or O(log n + k) for a prefix/glob query
+	that returns k records).
+	'''
+
+	def __init__(self, records: Sequence[NinjaCompDBRecord]):
+		'''
+		Ctor
+
+		:param records : The records of the compdb (eg a list of NinjaCompDBRecords or a ColumnarCompDB),
+		                 which shouldn't be modified afterwards
+		'''
+		self._records = records
+		self._indices_of_file: Optional[Dict[str, List[int]]] = None
+		self._indices_of_output: Optional[Dict[str, List[int]]] = None
+		self._indices_of_directory: Optional[Dict[str, List[int]]] = None
+		self._sorted_files: Optional[List[Tuple[str, int]]] = None
+
+	def __len__(self) -> int:
+		return len(self._records)
+
+	def __getitem__(self, index: int) -> NinjaCompDBRecord:
+		return self._records[index]
+
+	def __iter__(self) -> Iterator[NinjaCompDBRecord]:
+		return iter(self._records)
+
+	def _records_at(self, indices: List[int]) -> List[NinjaCompDBRecord]:
+		return [self._records[x] for x in indices]
+
+	def _iter_indexed_fields(self) -> Iterator[Tuple[str, str, str]]:
+		'''
+		Yield the ( directory, file, output ) strings of each record, in order
+
+		Over a ColumnarCompDB, these are read straight from its columns (without building each record's command).
+		'''
+		records = self._records
+		if isinstance(records, ColumnarCompDB):
+			return (
+				(records.directory_str(index), records.file_str(index), records.output(index))
+				for index in range(len(records))
+			)
+		return ((str(x.directory), str(x.file), x.output) for x in records)
+
+	def _file_index(self) -> Dict[str, List[int]]:
+		if self._indices_of_file is None:
+			self._indices_of_file = {}
+			for index, (directory, file, _output) in enumerate(self._iter_indexed_fields()):
+				self._indices_of_file.setdefault(absolute_path_str(file, directory), []).append(index)
+		return self._indices_of_file
+
+	def _output_index(self) -> Dict[str, List[int]]:
+		if self._indices_of_output is None:
+			self._indices_of_output = {}
+			for index, (_directory, _file, output) in enumerate(self._iter_indexed_fields()):
+				self._indices_of_output.setdefault(output, []).append(index)
+		return self._indices_of_output
+
+	def _directory_index(self) -> Dict[str, List[int]]:
+		if self._indices_of_directory is None:
+			self._indices_of_directory = {}
+			for index, (directory, _file, _output) in enumerate(self._iter_indexed_fields()):
+				self._indices_of_directory.setdefault(os.path.normpath(directory), []).append(index)
+		return self._indices_of_directory
+
+	def _sorted_file_index(self) -> List[Tuple[str, int]]:
+		if self._sorted_files is None:
+			self._sorted_files = sorted(
+				(file, index)
+				for file, indices in self._file_index().items()
+				for index in indices
+			)
+		return self._sorted_files
+
+	def records_for_file(self, file: Path, *, base_dir: Optional[Path] = None) -> List[NinjaCompDBRecord]:
+		'''
+		The records whose primary input is the specified file (eg to find the compile command for a source)
+
+		:param file     : The file
+		:param base_dir : (optional) The directory relative to which a relative file is interpreted (default: the cwd)
+		'''
+		return self._records_at(self._file_index().get(absolute_path_str(file, base_dir), []))
+
+	def records_with_output(self, output: str) -> List[NinjaCompDBRecord]:
+		'''
+		The records with the specified output (as named in the compdb)
+
+		:param output : The output
+		'''
+		return self._records_at(self._output_index().get(output, []))
+
+	def records_in_directory(self, directory: Path) -> List[NinjaCompDBRecord]:
+		'''
+		The records whose commands are run in the specified directory
+
+		:param directory : The directory
+		'''
+		return self._records_at(self._directory_index().get(os.path.normpath(directory), []))
+
+	def records_under(self, directory: Path, *, base_dir: Optional[Path] = None) -> List[NinjaCompDBRecord]:
+		'''
+		The records whose primary input is anywhere under the specified directory, sorted by file
+
+		:param directory : The directory
+		:param base_dir  : (optional) The directory relative to which a relative directory is interpreted
+		                   (default: the cwd)
+		'''
+		prefix = os.path.join(absolute_path_str(directory, base_dir), '')
+		return self._records_at([index for _file, index in self._iter_sorted_files_with_prefix(prefix)])
+
+	def records_matching(self, pattern: str, *, base_dir: Optional[Path] = None) -> List[NinjaCompDBRecord]:
+		'''
+		The records whose primary input matches the specified glob pattern (as for fnmatch, so * also matches
+		across directories), sorted by file
+
+		Only the files that share the pattern's literal prefix are tested against the pattern.
+
+		:param pattern  : The glob pattern (eg 'source/foo/*.cpp')
+		:param base_dir : (optional) The directory relative to which a relative pattern is interpreted
+		                  (default: the cwd)
+		'''
+		absolute_pattern = os.path.join(os.getcwd() if base_dir is None else str(base_dir), pattern)
+		special_char_match = _GLOB_SPECIAL_CHARS_RE.search(absolute_pattern)
+		if special_char_match is None:
+			return self.records_for_file(Path(absolute_pattern))
+		literal_prefix = absolute_pattern[:special_char_match.start()]
+
+		# Only normalize the pattern's directories that precede the first special character
+		literal_dir, literal_partial_name = os.path.split(literal_prefix)
+		normalized_dir = os.path.join(os.path.normpath(literal_dir), '')
+		absolute_pattern = normalized_dir + literal_partial_name + absolute_pattern[special_char_match.start():]
+		return self._records_at([
+			index
+			for file, index in self._iter_sorted_files_with_prefix(normalized_dir + literal_partial_name)
+			if fnmatch.fnmatchcase(file, absolute_pattern)
+		])
+
+	def _iter_sorted_files_with_prefix(self, prefix: str) -> Iterator[Tuple[str, int]]:
+		'''
+		Yield the ( file, index ) of each record whose absolute file starts with the specified prefix, in file order
+
+		:param prefix : The prefix
+		'''
+		sorted_files = self._sorted_file_index()
+		position = bisect.bisect_left(sorted_files, (prefix, -1))
+		while position < len(sorted_files) and sorted_files[position][0].startswith(prefix):
+			yield sorted_files[position]
+			position += 1
+
+	def project_dir(self) -> Path:
+		'''
+		Extract the project directory from the compdb (as project_dir_of_compdb() but via the output index)
+		'''
+		return project_dir_of_compdb(self.records_with_output('build.ninja'))
@@ -0,0 +1,56 @@
+from typing import AbstractSet, Iterable, List
+
+# Flags that direct a GCC/Clang-style compiler's output or dependency output and take a value,
+# either as the next argument or attached (eg -o foo.o or -ofoo.o)
+OUTPUT_FLAGS_WITH_VALUES = frozenset(('-o', '-MF', '-MT', '-MQ'))
+
+# Flags that direct a GCC/Clang-style compiler's dependency output and take no value
+OUTPUT_FLAGS = frozenset(('-MD', '-MMD', '-MP'))
+
+# The prefixes of (Clang) options that begin with -o but aren't -o with an attached output path (eg -objcmt-migrate-all)
+_OPTION_PREFIXES_STARTING_WITH_O = ('-obj',)
+
+
+def _is_attached_output_flag(part: str) -> bool:
+	'''
+	Whether the specified command part is one of the OUTPUT_FLAGS_WITH_VALUES with its value attached
+
+	:param part : The command part
+	'''
+	if part.startswith('-o'):
+		return len(part) > 2 and not part.startswith(_OPTION_PREFIXES_STARTING_WITH_O)
+	return part[:3] in OUTPUT_FLAGS_WITH_VALUES and len(part) > 3
+
+
+def without_output_flags(parts: Iterable[str],
+                         *,
+                         dropped_flags: AbstractSet[str] = frozenset(),
+                         keep_output_path: bool = False,
+                         ) -> List[str]:
+	'''
+	The specified compile command parts without the flags that direct the compiler's output or dependency output
+	(along with their values), and without any of the specified other flags
+
+	:param parts            : The parts of the compile command
+	:param dropped_flags    : Any other flags (that take no value) to drop
+	:param keep_output_path : Whether to keep the -o flag (and its value), ie to drop only the dependency output flags
+	'''
+	kept_parts: List[str] = []
+	skip_next = False
+	keep_next = False
+	for part in parts:
+		if skip_next:
+			skip_next = False
+		elif keep_next:
+			keep_next = False
+			kept_parts.append(part)
+		elif keep_output_path and part.startswith('-o'):
+			keep_next = part == '-o'
+			kept_parts.append(part)
+		elif part in OUTPUT_FLAGS_WITH_VALUES:
+			skip_next = True
+		elif part in OUTPUT_FLAGS or part in dropped_flags or _is_attached_output_flag(part):
+			pass
+		else:
+			kept_parts.append(part)
+	return kept_parts
@@ -0,0 +1,389 @@
+import collections
+import itertools
+import os
+import struct
+import sys
+import tempfile
+
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from cppbuild.raw_dep_record import RawDepRecord
+
+# The magic bytes and version at the start of a saved DepGraph file
+_DEP_GRAPH_FILE_MAGIC = b'CPPBDEPG'
+_DEP_GRAPH_FILE_VERSION = 1
+
+# The layout of the header of a saved DepGraph file:
+# magic, version, byte order (0 little, 1 big), array('I') itemsize, num targets, num headers, num dependencies
+_DEP_GRAPH_FILE_HEADER = struct.Struct('<8sIBBQQQ')
+
+
+class PathInterner:
+	'''
+	Map path strings to dense integer IDs (0, 1, 2, ...) and back
+	'''
+
+	def __init__(self, paths: Iterable[str] = ()):
+		'''
+		Ctor
+
+		:param paths : (optional) Unique paths to intern immediately, in order
+		'''
+		self._paths: List[str] = list(paths)
+		self._id_of_path: Dict[str, int] = { path: path_id for path_id, path in enumerate(self._paths) }
+		if len(self._id_of_path) != len(self._paths):
+			raise ValueError('PathInterner initial paths must be unique')
+
+	def intern(self, path: str) -> int:
+		'''
+		Return the ID of the specified path, allocating the next ID if it hasn't been seen before
+
+		:param path : The path to intern
+		'''
+		path_id = self._id_of_path.get(path)
+		if path_id is None:
+			path_id = len(self._paths)
+			self._id_of_path[path] = path_id
+			self._paths.append(path)
+		return path_id
+
+	def id_of(self, path: str) -> Optional[int]:
+		'''
+		The ID of the specified path (or None if it hasn't been interned)
+
+		:param path : The path to look up
+		'''
+		return self._id_of_path.get(path)
+
+	def path_of(self, path_id: int) -> str:
+		'''
+		The path with the specified ID
+
+		:param path_id : The ID to look up
+		'''
+		return self._paths[path_id]
+
+	@property
+	def paths(self) -> List[str]:
+		'''
+		Readonly access to the paths in ID order
+		'''
+		return self._paths
+
+	def __len__(self) -> int:
+		return len(self._paths)
+
+
+def _csr_transpose(offsets: Sequence[int], indices: Sequence[int], num_columns: int):
+	'''
+	Transpose the specified compressed sparse row (CSR) matrix, returning the ( offsets, indices ) of the result
+	(in which each row's indices are in ascending order)
+
+	:param offsets     : The offsets of each row's indices (with a final entry for the total)
+	:param indices     : The column indices of each row, concatenated
+	:param num_columns : The number of columns (ie the number of rows of the result)
+	'''
+	# Append each row's index to the rows of each of its columns
+	# (via map() so that there's no Python code per entry, which matters with millions of entries)
+	rows_of_column = [array('I') for _ in range(num_columns)]
+	consume = collections.deque(maxlen=0).extend
+	indices_view = memoryview(indices) if isinstance(indices, array) else indices
+	for row in range(len(offsets) - 1):
+		consume(map(
+			array.append,
+			map(rows_of_column.__getitem__, indices_view[offsets[row]:offsets[row + 1]]),
+			itertools.repeat(row),
+		))
+
+	transposed_offsets = array('I', [0])
+	transposed_offsets.extend(itertools.accumulate(map(len, rows_of_column)))
+	transposed_indices = array('I')
+	for rows in rows_of_column:
+		transposed_indices.extend(rows)
+	return transposed_offsets, transposed_indices
+
+
+class DepGraph:
+	'''
+	A compact dependency graph between targets (roughly, the cpp files) and headers, with both keyed on interned IDs
+
+	The dependencies of target t are header_ids[header_offsets[t]:header_offsets[t + 1]] and the targets that
+	depend on header h are target_ids[target_offsets[h]:target_offsets[h + 1]], ie both directions are stored
+	in compressed sparse row (CSR) form in array('I') buffers. So a lookup costs time proportional to its result.
+	'''
+
+	def __init__(self,
+	             *,
+	             targets: PathInterner,
+	             headers: PathInterner,
+	             target_is_valid: array,
+	             header_offsets: array,
+	             header_ids: array,
+	             target_offsets: Optional[array] = None,
+	             target_ids: Optional[array] = None,
+	             ):
+		'''
+		Ctor from the forward CSR data (from which the reverse index is built unless it's specified)
+
+		:param targets         : The interned targets
+		:param headers         : The interned headers (ie dependencies)
+		:param target_is_valid : The is_valid of each target (as 0/1 in an array('B'))
+		:param header_offsets  : The offsets of each target's dependencies in header_ids (with a final entry for the total)
+		:param header_ids      : The header IDs of each target's dependencies, concatenated
+		:param target_offsets  : (optional) The offsets of each header's targets in target_ids
+		:param target_ids      : (optional) The target IDs of each header's dependent targets, concatenated
+		'''
+		if len(header_offsets) != len(targets) + 1 or len(target_is_valid) != len(targets):
+			raise ValueError('DepGraph requires one header offset (plus one) and one is_valid per target')
+		self._targets = targets
+		self._headers = headers
+		self._target_is_valid = target_is_valid
+		self._header_offsets = header_offsets
+		self._header_ids = header_ids
+		if target_offsets is None or target_ids is None:
+			target_offsets, target_ids = _csr_transpose(header_offsets, header_ids, len(headers))
+		elif len(target_offsets) != len(headers) + 1 or len(target_ids) != len(header_ids):
+			raise ValueError('DepGraph reverse index does not match the headers and dependencies')
+		self._target_offsets = target_offsets
+		self._target_ids = target_ids
+
+	@property
+	def targets(self) -> PathInterner:
+		'''
+		Readonly access to the interned targets
+		'''
+		return self._targets
+
+	@property
+	def headers(self) -> PathInterner:
+		'''
+		Readonly access to the interned headers
+		'''
+		return self._headers
+
+	@property
+	def header_offsets(self) -> array:
+		'''
+		Readonly access to the offsets of each target's dependencies in header_ids (with a final entry for the total)
+		'''
+		return self._header_offsets
+
+	@property
+	def header_ids(self) -> array:
+		'''
+		Readonly access to the header IDs of each target's dependencies, concatenated
+		'''
+		return self._header_ids
+
+	@property
+	def target_offsets(self) -> array:
+		'''
+		Readonly access to the offsets of each header's targets in target_ids (with a final entry for the total)
+		'''
+		return self._target_offsets
+
+	@property
+	def target_ids(self) -> array:
+		'''
+		Readonly access to the target IDs of each header's dependent targets, concatenated
+		'''
+		return self._target_ids
+
+	def num_targets(self) -> int:
+		'''
+		The number of targets
+		'''
+		return len(self._targets)
+
+	def num_headers(self) -> int:
+		'''
+		The number of headers
+		'''
+		return len(self._headers)
+
+	def is_valid(self, target_id: int) -> bool:
+		'''
+		Whether the specified target's dependencies were reported as VALID
+
+		:param target_id : The ID of the target
+		'''
+		return bool(self._target_is_valid[target_id])
+
+	def header_ids_of_target(self, target_id: int) -> array:
+		'''
+		The IDs of the headers on which the specified target depends
+
+		:param target_id : The ID of the target
+		'''
+		return self._header_ids[self._header_offsets[target_id]:self._header_offsets[target_id + 1]]
+
+	def target_ids_including(self, header_id: int) -> array:
+		'''
+		The IDs of the targets that depend on the specified header (in ascending order)
+
+		:param header_id : The ID of the header
+		'''
+		return self._target_ids[self._target_offsets[header_id]:self._target_offsets[header_id + 1]]
+
+	def deps_of_target(self, target: str) -> List[str]:
+		'''
+		The headers on which the specified target depends (or an empty list if the target is unknown)
+
+		:param target : The target
+		'''
+		target_id = self._targets.id_of(target)
+		if target_id is None:
+			return []
+		return [self._headers.path_of(x) for x in self.header_ids_of_target(target_id)]
+
+	def targets_including(self, header: str) -> List[str]:
+		'''
+		The targets that depend on the specified header (or an empty list if the header is unknown)
+
+		:param header : The header
+		'''
+		header_id = self._headers.id_of(header)
+		if header_id is None:
+			return []
+		return [self._targets.path_of(x) for x in self.target_ids_including(header_id)]
+
+	@property
+	def target_is_valid(self) -> array:
+		'''
+		Readonly access to the is_valid of each target (as 0/1 in an array('B'))
+		'''
+		return self._target_is_valid
+
+
+def dep_graph_of_raw_dep_records(records: Iterable[RawDepRecord],
+                                 *,
+                                 key_of_dep: Callable[[Path], str] = str,
+                                 ) -> DepGraph:
+	'''
+	Make a DepGraph from the specified RawDepRecords (eg as streamed by iter_ninja_deps_for_dir())
+
+	Only the interned strings and the ID arrays are retained, so the records may be streamed.
+
+	:param records    : The records from which to build the graph (with no target repeated)
+	:param key_of_dep : (optional) The function with which to convert each dependency to the string to intern
+	                    (eg to make it absolute); default: str
+	'''
+	targets = PathInterner()
+	headers = PathInterner()
+	target_is_valid = array('B')
+	header_offsets = array('I', [0])
+	header_ids = array('I')
+	for record in records:
+		target = str(record.target)
+		if targets.id_of(target) is not None:
+			raise ValueError(f'Cannot make a DepGraph with a repeated target: {target}')
+		targets.intern(target)
+		target_is_valid.append(1 if record.is_valid else 0)
+		header_ids.extend(headers.intern(key_of_dep(x)) for x in record.deps)
+		header_offsets.append(len(header_ids))
+	return DepGraph(
+		targets=targets,
+		headers=headers,
+		target_is_valid=target_is_valid,
+		header_offsets=header_offsets,
+		header_ids=header_ids,
+	)
+
+
+def _bytes_of_paths(paths: List[str]) -> bytes:
+	return '\0'.join(paths).encode('utf-8', 'surrogateescape')
+
+
+def _paths_of_bytes(paths_bytes: bytes, num_paths: int) -> List[str]:
+	if num_paths == 0:
+		return []
+	paths = paths_bytes.decode('utf-8', 'surrogateescape').split('\0')
+	if len(paths) != num_paths:
+		raise ValueError(f'Expected {num_paths} paths in saved DepGraph but found {len(paths)}')
+	return paths
+
+
+def save_dep_graph(graph: DepGraph, path: Path) -> None:
+	'''
+	Save the specified DepGraph (including its reverse index) to the specified file, replacing it atomically
+
+	The ID arrays are written in native byte order, so the file is only intended to be loaded on a similar machine.
+
+	:param graph : The graph to save
+	:param path  : The file to which to save it
+	'''
+	targets_bytes = _bytes_of_paths(graph.targets.paths)
+	headers_bytes = _bytes_of_paths(graph.headers.paths)
+	temp_fd, temp_name = tempfile.mkstemp(prefix='.' + path.name + '.', dir=str(path.parent))
+	try:
+		with os.fdopen(temp_fd, 'wb') as graph_fh:
+			graph_fh.write(_DEP_GRAPH_FILE_HEADER.pack(
+				_DEP_GRAPH_FILE_MAGIC,
+				_DEP_GRAPH_FILE_VERSION,
+				0 if sys.byteorder == 'little' else 1,
+				graph.header_ids.itemsize,
+				graph.num_targets(),
+				graph.num_headers(),
+				len(graph.header_ids),
+			))
+			graph_fh.write(struct.pack('<QQ', len(targets_bytes), len(headers_bytes)))
+			graph_fh.write(targets_bytes)
+			graph_fh.write(headers_bytes)
+			graph.target_is_valid.tofile(graph_fh)
+			for id_array in (graph.header_offsets, graph.header_ids, graph.target_offsets, graph.target_ids):
+				id_array.tofile(graph_fh)
+		os.replace(temp_name, path)
+	except BaseException:
+		os.unlink(temp_name)
+		raise
+
+
+def load_dep_graph(path: Path) -> DepGraph:
+	'''
+	Load a DepGraph as saved by save_dep_graph(), raising ValueError if the file isn't a compatible saved DepGraph
+
+	:param path : The file from which to load the graph
+	'''
+	graph_bytes = path.read_bytes()
+	try:
+		magic, version, byte_order, itemsize, num_targets, num_headers, num_deps = _DEP_GRAPH_FILE_HEADER.unpack_from(
+			graph_bytes
+		)
+	except struct.error as err:
+		raise ValueError(f'{path} is too short to be a saved DepGraph') from err
+	if magic != _DEP_GRAPH_FILE_MAGIC or version != _DEP_GRAPH_FILE_VERSION:
+		raise ValueError(f'{path} is not a saved DepGraph of version {_DEP_GRAPH_FILE_VERSION}')
+	if byte_order != (0 if sys.byteorder == 'little' else 1) or itemsize != array('I').itemsize:
+		raise ValueError(f'{path} was saved on an incompatible machine')
+
+	offset = _DEP_GRAPH_FILE_HEADER.size
+	num_targets_bytes, num_headers_bytes = struct.unpack_from('<QQ', graph_bytes, offset)
+	offset += 16
+	targets = _paths_of_bytes(graph_bytes[offset:offset + num_targets_bytes], num_targets)
+	offset += num_targets_bytes
+	headers = _paths_of_bytes(graph_bytes[offset:offset + num_headers_bytes], num_headers)
+	offset += num_headers_bytes
+
+	target_is_valid = array('B', graph_bytes[offset:offset + num_targets])
+	offset += num_targets
+	id_arrays: List[array] = []
+	for num_ids in (num_targets + 1, num_deps, num_headers + 1, num_deps):
+		id_array = array('I')
+		id_array.frombytes(graph_bytes[offset:offset + num_ids * itemsize])
+		if len(id_array) != num_ids:
+			raise ValueError(f'{path} is truncated')
+		id_arrays.append(id_array)
+		offset += num_ids * itemsize
+	header_offsets, header_ids, target_offsets, target_ids = id_arrays
+
+	return DepGraph(
+		targets=PathInterner(targets),
+		headers=PathInterner(headers),
+		target_is_valid=target_is_valid,
+		header_offsets=header_offsets,
+		header_ids=header_ids,
+		target_offsets=target_offsets,
+		target_ids=target_ids,
+	)
@@ -0,0 +1,140 @@
+import collections
+import dataclasses
+import logging
+import os
+import shlex
+import tempfile
+
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+from cppbuild.command_executor import CommandExecutor, all_are_finished
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+from cppbuild.compile_flags import without_output_flags
+from cppbuild.ninja_call import NinjaCompDBRecord, get_ninja_compdb_for_dir, iter_ninja_deps_for_dir
+from cppbuild.raw_dep_record import RawDepRecord, read_compiler_deps_file
+
+logger = logging.getLogger(__name__)
+
+# Flags (besides the output flags) that would alter the compiler's dependency output or stop it preprocessing only,
+# which are dropped from a dependency-scan command
+_DROPPED_FLAGS = frozenset(('-c', '-M', '-MM', '-MG'))
+
+
+def dep_scan_command(record: NinjaCompDBRecord, deps_file: Path) -> Optional[List[str]]:
+	'''
+	Rewrite the command of the specified compdb record into a preprocess-only run that writes the record's
+	dependencies (including system headers, as ninja records them) to the specified file, with the record's
+	output as the target (or return None if the record isn't a GCC/Clang-style compile command)
+
+	:param record    : The compdb record
+	:param deps_file : The file to which the dependencies should be written
+	'''
+	parts = shlex.split(record.command)
+	if '-c' not in parts:
+		return None
+
+	scan_parts = without_output_flags(parts, dropped_flags=_DROPPED_FLAGS)
+	return scan_parts + ['-M', '-MF', str(deps_file), '-MT', record.output]
+
+
+@dataclasses.dataclass
+class _ScanTicket:
+	'''
+	The associated_data of a dependency-scan job
+	'''
+
+	# The output of the compdb record whose dependencies are being scanned
+	output: str
+
+	# The file to which the dependencies are written
+	deps_file: Path
+
+
+def scan_deps(records: Iterable[NinjaCompDBRecord], *, num_parallel_jobs: Optional[int] = None) -> Iterator[RawDepRecord]:
+	'''
+	Scan the dependencies of the specified compdb records' compile commands in parallel via a CommandExecutor,
+	yielding a RawDepRecord (targeting the record's output) for each as it completes
+
+	A scan that fails (eg because a generated header doesn't exist yet) yields a record that isn't valid and
+	has no deps. Records that aren't compile commands are skipped.
+
+	If the iteration is abandoned early, any running scans are killed.
+
+	:param records           : The compdb records to scan
+	:param num_parallel_jobs : (optional) The maximum number of scans to run simultaneously (default: the CPU count)
+	'''
+	with tempfile.TemporaryDirectory(prefix='cppbuild-dep-scan-') as temp_dir:
+		jobs: List[CommandJob] = []
+		for index, record in enumerate(records):
+			deps_file = Path(temp_dir) / f'{index}.d'
+			command = dep_scan_command(record, deps_file)
+			if command is None:
+				continue
+			jobs.append(CommandJob(
+				command=command,
+				run_dir=record.directory,
+				associated_data=_ScanTicket(output=record.output, deps_file=deps_file),
+			))
+
+		completed_results: Deque[CommandResult] = collections.deque()
+
+		def collect_result(*, result: CommandResult, num_remaining_commands: int) -> None:
+			completed_results.append(result)
+
+		executor = CommandExecutor(num_parallel_jobs=num_parallel_jobs or os.cpu_count() or 1, callback=collect_result)
+		try:
+			executor.extend_queue(jobs)
+			while True:
+				while completed_results:
+					yield _raw_dep_record_of_scan_result(completed_results.popleft())
+				if all_are_finished(executor):
+					break
+				if executor.num_running() > 0:
+					executor.wait_for_completion()
+				executor.update()
+		finally:
+			executor.terminate_all_and_wipe_queue(report=False)
+			executor.close()
+
+
+def _raw_dep_record_of_scan_result(result: CommandResult) -> RawDepRecord:
+	'''
+	Make the RawDepRecord of the specified dependency-scan result
+
+	:param result : The result of the scan
+	'''
+	ticket = result.associated_data
+	assert isinstance(ticket, _ScanTicket)
+	target = Path(ticket.output)
+	if result.returncode == 0:
+		try:
+			return read_compiler_deps_file(ticket.deps_file, target=target)
+		except (OSError, ValueError):
+			pass
+	logger.warning(
+		f'Dependency scan for {ticket.output} failed with returncode {result.returncode}:'
+		+ f' {result.stderr.decode(errors="replace") if result.stderr else ""}'
+	)
+	return RawDepRecord(target=target, is_valid=False, deps=[])
+
+
+def iter_fresh_dep_records(ninja_build_dir: Path, *, num_parallel_jobs: Optional[int] = None) -> Iterator[RawDepRecord]:
+	'''
+	Yield a RawDepRecord for every compile target of the specified ninja build directory, taking each valid record
+	from `ninja -t deps` and scanning the dependencies of any that ninja reports as STALE or has never built
+
+	:param ninja_build_dir   : The ninja build directory to process
+	:param num_parallel_jobs : (optional) The maximum number of scans to run simultaneously (default: the CPU count)
+	'''
+	compdb = get_ninja_compdb_for_dir(ninja_build_dir)
+	record_of_output: Dict[str, NinjaCompDBRecord] = { x.output: x for x in compdb }
+
+	for dep_record in iter_ninja_deps_for_dir(ninja_build_dir):
+		if dep_record.is_valid:
+			record_of_output.pop(str(dep_record.target), None)
+			yield dep_record
+
+	logger.info(f'Scanning dependencies of up to {len(record_of_output)} stale or unbuilt targets...')
+	yield from scan_deps(record_of_output.values(), num_parallel_jobs=num_parallel_jobs)
@@ -2,6 +2,19 @@ import os
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+
+def absolute_path_str(path: Union[Path, str], base_dir: Optional[Union[Path, str]] = None) -> str:
+	'''
+	The normalized, absolute form of the specified path (relative to the base_dir if relative) as a string
+
+	This doesn't resolve symlinks so it doesn't touch the filesystem.
+
+	:param path     : The path to convert
+	:param base_dir : (optional) The directory relative to which a relative path is interpreted (default: the cwd)
+	'''
+	return os.path.normpath(os.path.join(os.getcwd() if base_dir is None else base_dir, path))
 
 
 @dataclass
@@ -37,3 +50,83 @@ def from_changed_working_dir(path: Path,
 	return Path(
 		os.path.normpath(str(working_dir_change.prev_working_dir / path))
 	).relative_to(working_dir_change.new_working_dir)
+
+
+class BulkPathRebaser:
+	'''
+	Rebase many string paths according to a WorkingDirChange (as for from_changed_working_dir()) using string
+	operations, with the normalization of each distinct directory computed once and cached
+
+	Each result is the string of the Path that from_changed_working_dir() would return, except that absolute paths
+	are returned exactly as given.
+	'''
+
+	def __init__(self, working_dir_change: WorkingDirChange):
+		'''
+		Ctor
+
+		:param working_dir_change : The change in working directory
+		'''
+		self._working_dir_change = working_dir_change
+		self._prev_working_dir_str = str(working_dir_change.prev_working_dir)
+		self._new_working_dir_str = str(working_dir_change.new_working_dir)
+
+		# The prefix of paths under the new working dir (or None if every relative result is under it, ie it's '.')
+		self._new_working_dir_prefix = (
+			None if self._new_working_dir_str == '.'
+			else os.path.join(self._new_working_dir_str, '')
+		)
+
+		# The normalized prev_working_dir / dirname of each dirname seen so far
+		self._normalized_dir_of_dirname = { '': os.path.normpath(self._prev_working_dir_str) }
+
+	def rebase(self, path: str) -> str:
+		'''
+		Rebase the specified path, raising ValueError if it isn't under the new working dir once rebased
+		(like from_changed_working_dir())
+
+		:param path : The path to rebase
+		'''
+		if path.startswith('/'):
+			return path
+
+		dirname, _separator, basename = path.rpartition('/')
+		if basename in ('', '.', '..'):
+			return str(from_changed_working_dir(Path(path), self._working_dir_change))
+
+		normalized_dir = self._normalized_dir_of_dirname.get(dirname)
+		if normalized_dir is None:
+			normalized_dir = os.path.normpath(os.path.join(self._prev_working_dir_str, dirname))
+			self._normalized_dir_of_dirname[dirname] = normalized_dir
+
+		if normalized_dir == '.':
+			rebased_path = basename
+		else:
+			rebased_path = os.path.join(normalized_dir, basename)
+
+		if self._new_working_dir_prefix is None:
+			return rebased_path
+		if rebased_path.startswith(self._new_working_dir_prefix):
+			return rebased_path[len(self._new_working_dir_prefix):]
+		if rebased_path == self._new_working_dir_str:
+			return '.'
+		raise ValueError(f'{rebased_path!r} is not in the subpath of {self._new_working_dir_str!r}')
+
+	def rebase_all(self, paths: Iterable[str]) -> List[str]:
+		'''
+		Rebase each of the specified paths (see rebase())
+
+		:param paths : The paths to rebase
+		'''
+		return [self.rebase(x) for x in paths]
+
+
+def from_changed_working_dir_bulk(paths: Iterable[str], working_dir_change: WorkingDirChange) -> List[str]:
+	'''
+	Return the specified string paths modified according to a change in the working dir from which they're seen
+	(as for from_changed_working_dir() but much faster for many paths; see BulkPathRebaser)
+
+	:param paths              : The input paths
+	:param working_dir_change : The change in working directory
+	'''
+	return BulkPathRebaser(working_dir_change).rebase_all(paths)
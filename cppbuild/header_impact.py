@@ -0,0 +1,165 @@
+'''
+Rank the dependencies (roughly, the headers) of a ninja build by the total compile time of the targets that
+include them, ie by the cost of the rebuild that an edit to each would trigger
+
+Run on a ninja build directory (which reads .ninja_deps and .ninja_log directly, without running ninja):
+
+    python -m cppbuild.header_impact path/to/build --top 50 --json header_impact.json
+'''
+
+import argparse
+import json
+import os
+import sys
+
+from array import array
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, List, Mapping, Optional, TextIO
+
+from cppbuild.dep_graph import DepGraph
+from cppbuild.ninja_logs import NinjaLogEntry, dep_graph_of_ninja_deps_log, read_ninja_deps_log, read_ninja_log
+
+# The extensions of the dependencies that are considered headers by default
+HEADER_EXTENSIONS = frozenset(('', '.h', '.hh', '.hpp', '.hxx', '.h++', '.inl', '.ipp', '.tcc', '.tpp'))
+
+
+@dataclass
+class HeaderImpact:
+	'''
+	The rebuild cost of one header
+	'''
+
+	# The header
+	header: str
+
+	# The number of targets that include it
+	num_targets: int
+
+	# The total compile time (in seconds) of the targets that include it
+	total_cost: float
+
+
+def is_header(dep: str) -> bool:
+	'''
+	Whether the specified dependency looks like a header (by its extension)
+
+	:param dep : The dependency
+	'''
+	return os.path.splitext(dep)[1].lower() in HEADER_EXTENSIONS
+
+
+def target_costs_of_durations(graph: DepGraph, duration_of_target: Mapping[str, float]) -> array:
+	'''
+	The cost of each target of the specified graph (indexed by target ID in an array('d')),
+	taken from the specified durations (or 0.0 for any target without one)
+
+	:param graph              : The dependency graph
+	:param duration_of_target : The duration (eg the wall time in seconds) of each target
+	'''
+	return array('d', (duration_of_target.get(x, 0.0) for x in graph.targets.paths))
+
+
+def target_costs_of_ninja_log(graph: DepGraph, entry_of_output: Mapping[str, NinjaLogEntry]) -> array:
+	'''
+	The cost of each target of the specified graph (as for target_costs_of_durations()), taken from the
+	durations in the specified .ninja_log entries (as from read_ninja_log())
+
+	:param graph           : The dependency graph
+	:param entry_of_output : The .ninja_log entry of each output
+	'''
+	return target_costs_of_durations(graph, { output: x.duration for output, x in entry_of_output.items() })
+
+
+def rank_header_impacts(graph: DepGraph,
+                        target_costs: array,
+                        *,
+                        should_include: Callable[[str], bool] = is_header,
+                        ) -> List[HeaderImpact]:
+	'''
+	The HeaderImpact of every (matching) dependency of the specified graph, most costly first
+
+	This sums the target costs over each header's slice of the graph's reverse index with C-level map()/sum()
+	over memoryviews, so it costs one pass over the graph's dependencies without any per-dependency Python code.
+
+	:param graph          : The dependency graph
+	:param target_costs   : The cost of each target, indexed by target ID (eg from target_costs_of_ninja_log())
+	:param should_include : (optional) Whether to include each dependency (default: is_header)
+	'''
+	if len(target_costs) != graph.num_targets():
+		raise ValueError(f'Expected {graph.num_targets()} target costs but got {len(target_costs)}')
+	cost_of_target_id = target_costs.__getitem__
+	target_offsets = graph.target_offsets
+	target_ids = memoryview(graph.target_ids)
+
+	impacts: List[HeaderImpact] = []
+	for header_id, header in enumerate(graph.headers.paths):
+		if not should_include(header):
+			continue
+		start, end = target_offsets[header_id], target_offsets[header_id + 1]
+		impacts.append(HeaderImpact(
+			header=header,
+			num_targets=end - start,
+			total_cost=sum(map(cost_of_target_id, target_ids[start:end])),
+		))
+	impacts.sort(key=lambda x: (-x.total_cost, -x.num_targets, x.header))
+	return impacts
+
+
+def write_header_impact_report(impacts: List[HeaderImpact], out_fh: TextIO, *, limit: Optional[int] = None) -> None:
+	'''
+	Write a ranked, human-readable report of the specified impacts
+
+	:param impacts : The impacts, most costly first
+	:param out_fh  : The stream to which to write the report
+	:param limit   : (optional) The maximum number of headers to report
+	'''
+	out_fh.write(f'{"rank":>5} {"total_cost_s":>12} {"num_targets":>11}  header\n')
+	for rank, impact in enumerate(impacts[:limit], start=1):
+		out_fh.write(f'{rank:>5} {impact.total_cost:>12.1f} {impact.num_targets:>11}  {impact.header}\n')
+
+
+def write_header_impact_json(impacts: List[HeaderImpact], out_fh: TextIO) -> None:
+	'''
+	Write the specified impacts as a JSON array of objects (in the given order)
+
+	:param impacts : The impacts
+	:param out_fh  : The stream to which to write the JSON
+	'''
+	json.dump([asdict(x) for x in impacts], out_fh, indent='\t')
+	out_fh.write('\n')
+
+
+def main(args: Optional[List[str]] = None) -> int:
+	'''
+	Run the command-line interface (see the module docstring)
+
+	:param args : (optional) The command-line arguments (default: sys.argv[1:])
+	'''
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('ninja_build_dir', type=Path, help='The ninja build directory to analyse')
+	parser.add_argument('--top', type=int, default=50, help='The number of headers to report (default: 50)')
+	parser.add_argument('--json', type=Path, default=None, help='A file to which to dump every header\'s impact as JSON')
+	parser.add_argument('--all-deps', action='store_true', help='Rank every dependency, not just headers')
+	parsed_args = parser.parse_args(args)
+
+	graph = dep_graph_of_ninja_deps_log(read_ninja_deps_log(parsed_args.ninja_build_dir / '.ninja_deps'))
+	entry_of_output = read_ninja_log(parsed_args.ninja_build_dir / '.ninja_log')
+	num_untimed_targets = sum(1 for x in graph.targets.paths if x not in entry_of_output)
+	if num_untimed_targets:
+		print(f'{num_untimed_targets} of {graph.num_targets()} targets have no .ninja_log duration', file=sys.stderr)
+
+	impacts = rank_header_impacts(
+		graph,
+		target_costs_of_ninja_log(graph, entry_of_output),
+		should_include=(lambda _dep: True) if parsed_args.all_deps else is_header,
+	)
+	write_header_impact_report(impacts, sys.stdout, limit=parsed_args.top)
+	if parsed_args.json is not None:
+		with open(parsed_args.json, 'w') as json_fh:
+			write_header_impact_json(impacts, json_fh)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,287 @@
+'''
+Analyse the header set of every target (ie translation unit) of a build as bitsets: the headers common to most
+targets (ie the precompiled-header candidates) and the targets whose header sets contain those of others
+
+Run on a ninja build directory (which reads .ninja_deps directly, without running ninja):
+
+    python -m cppbuild.include_sets path/to/build --min-fraction 0.8 --json include_sets.json
+'''
+
+import argparse
+import json
+import sys
+
+from collections import deque
+from dataclasses import asdict, dataclass
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from cppbuild.dep_graph import DepGraph
+from cppbuild.header_impact import is_header
+from cppbuild.ninja_logs import dep_graph_of_ninja_deps_log, read_ninja_deps_log
+
+
+def _popcount_via_bin(bits: int) -> int:
+	return bin(bits).count('1')
+
+
+# The number of set bits in a bitset (int.bit_count() is only available from Python 3.10)
+popcount = getattr(int, 'bit_count', _popcount_via_bin)
+
+
+# The translation of a byte per bit (0 or 1) to the binary digit of the bit
+_BINARY_DIGIT_OF_BYTE = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def _bitset_of_ids(ids: Iterable[int], num_bits: int) -> int:
+	'''
+	The bitset (as an int) with the bit of each of the specified IDs set
+
+	This marks the IDs in a byte-per-bit buffer with C-level map() and parses its binary digits in one go, which
+	(unlike ORing in one bit at a time) costs time linear in the number of bits.
+
+	:param ids      : The IDs
+	:param num_bits : The number of bits (ie one more than the greatest possible ID)
+	'''
+	byte_of_bit = bytearray(num_bits + 1)
+	deque(map(byte_of_bit.__setitem__, ids, repeat(1)), maxlen=0)
+	return int(byte_of_bit[::-1].translate(_BINARY_DIGIT_OF_BYTE), 2)
+
+
+def _ids_of_bitset(bits: int) -> List[int]:
+	'''
+	The IDs of the set bits of the specified bitset, in ascending order
+
+	:param bits : The bitset
+	'''
+	ids: List[int] = []
+	while bits:
+		lowest_bit = bits & -bits
+		ids.append(lowest_bit.bit_length() - 1)
+		bits ^= lowest_bit
+	return ids
+
+
+@dataclass
+class HeaderCoverage:
+	'''
+	How many of the targets include a header
+	'''
+
+	# The header
+	header: str
+
+	# The number of targets that include it
+	num_targets: int
+
+	# The fraction of all the targets that include it
+	fraction: float
+
+
+class IncludeSets:
+	'''
+	The header set of each target (ie translation unit) of a DepGraph as a bitset (a Python int with one bit per
+	header ID) alongside the transposed target set of each header (with one bit per target ID)
+
+	Since compiler/ninja deps already list every header a target includes (directly or not), each header set is
+	the transitive closure of the target's includes.
+
+	Set operations on whole header sets are then single big-int operations, eg the headers shared by two
+	targets are `a & b`, and the targets that include all of a set of headers are the AND of those headers'
+	target sets, which is how supersets are found without comparing every pair of targets.
+	'''
+
+	def __init__(self, graph: DepGraph):
+		'''
+		Ctor
+
+		:param graph : The dependency graph from which to take the header sets
+		'''
+		self._graph = graph
+		self._header_bits_of_target: List[int] = [
+			_bitset_of_ids(graph.header_ids_of_target(x), graph.num_headers())
+			for x in range(graph.num_targets())
+		]
+		self._target_bits_of_header: List[int] = [
+			_bitset_of_ids(graph.target_ids_including(x), graph.num_targets())
+			for x in range(graph.num_headers())
+		]
+		self._num_targets_of_header: List[int] = [popcount(x) for x in self._target_bits_of_header]
+
+	@property
+	def graph(self) -> DepGraph:
+		'''
+		Readonly access to the dependency graph
+		'''
+		return self._graph
+
+	def header_bits(self, target: str) -> int:
+		'''
+		The header set of the specified target as a bitset of header IDs (or 0 if the target is unknown)
+
+		:param target : The target
+		'''
+		target_id = self._graph.targets.id_of(target)
+		return 0 if target_id is None else self._header_bits_of_target[target_id]
+
+	def headers_of_bits(self, header_bits: int) -> List[str]:
+		'''
+		The headers in the specified bitset of header IDs
+
+		:param header_bits : The bitset
+		'''
+		return [self._graph.headers.path_of(x) for x in _ids_of_bitset(header_bits)]
+
+	def targets_of_bits(self, target_bits: int) -> List[str]:
+		'''
+		The targets in the specified bitset of target IDs
+
+		:param target_bits : The bitset
+		'''
+		return [self._graph.targets.path_of(x) for x in _ids_of_bitset(target_bits)]
+
+	def num_shared_headers(self, target_a: str, target_b: str) -> int:
+		'''
+		The number of headers that both the specified targets include
+
+		:param target_a : One target
+		:param target_b : The other target
+		'''
+		return popcount(self.header_bits(target_a) & self.header_bits(target_b))
+
+	def similarity(self, target_a: str, target_b: str) -> float:
+		'''
+		The Jaccard similarity of the header sets of the specified targets
+		(ie the number of shared headers over the number of headers in either)
+
+		:param target_a : One target
+		:param target_b : The other target
+		'''
+		bits_a = self.header_bits(target_a)
+		bits_b = self.header_bits(target_b)
+		num_in_either = popcount(bits_a | bits_b)
+		return 0.0 if num_in_either == 0 else popcount(bits_a & bits_b) / num_in_either
+
+	def common_headers(self, *, min_fraction: float = 0.5) -> List[HeaderCoverage]:
+		'''
+		The headers included by at least the specified fraction of the targets (eg as precompiled-header candidates),
+		most common first
+
+		:param min_fraction : The minimum fraction of the targets that must include a header
+		'''
+		num_targets = self._graph.num_targets()
+		if num_targets == 0:
+			return []
+		coverages = [
+			HeaderCoverage(header=header, num_targets=count, fraction=count / num_targets)
+			for header, count in zip(self._graph.headers.paths, self._num_targets_of_header)
+			if count >= min_fraction * num_targets
+		]
+		coverages.sort(key=lambda x: (-x.num_targets, x.header))
+		return coverages
+
+	def targets_including_all(self, headers: Sequence[str]) -> int:
+		'''
+		The bitset of the targets that include every one of the specified headers
+		(or of every target if there are no headers)
+
+		:param headers : The headers
+		'''
+		header_ids = [self._graph.headers.id_of(x) for x in headers]
+		if any(x is None for x in header_ids):
+			return 0
+		return self._targets_including_all_ids(header_ids) # type: ignore[arg-type]
+
+	def _targets_including_all_ids(self, header_ids: Sequence[int]) -> int:
+		'''
+		The bitset of the targets that include every one of the specified headers
+
+		The headers are ANDed rarest first, so the result usually empties (and the loop stops) early.
+
+		:param header_ids : The IDs of the headers
+		'''
+		target_bits = (1 << self._graph.num_targets()) - 1
+		for header_id in sorted(header_ids, key=self._num_targets_of_header.__getitem__):
+			target_bits &= self._target_bits_of_header[header_id]
+			if not target_bits:
+				break
+		return target_bits
+
+	def targets_covered_by(self, headers: Sequence[str]) -> List[str]:
+		'''
+		The targets whose every header is amongst the specified headers
+		(eg the targets that a precompiled header of those headers would fully cover)
+
+		:param headers : The headers
+		'''
+		header_ids = (self._graph.headers.id_of(x) for x in headers)
+		covering_bits = sum(1 << x for x in set(header_ids) if x is not None)
+		return [
+			self._graph.targets.path_of(target_id)
+			for target_id, header_bits in enumerate(self._header_bits_of_target)
+			if header_bits & ~covering_bits == 0
+		]
+
+	def supersets_of(self, target: str) -> List[str]:
+		'''
+		The other targets whose header sets contain every header of the specified target
+
+		:param target : The target
+		'''
+		target_id = self._graph.targets.id_of(target)
+		if target_id is None:
+			return []
+		superset_bits = self._targets_including_all_ids(self._graph.header_ids_of_target(target_id))
+		return self.targets_of_bits(superset_bits & ~(1 << target_id))
+
+	def superset_relations(self) -> Dict[str, List[str]]:
+		'''
+		The other targets whose header sets are supersets of (or equal to) each target's header set,
+		for every target that has any
+		'''
+		superset_relations: Dict[str, List[str]] = {}
+		for target_id, target in enumerate(self._graph.targets.paths):
+			superset_bits = self._targets_including_all_ids(self._graph.header_ids_of_target(target_id))
+			superset_bits &= ~(1 << target_id)
+			if superset_bits:
+				superset_relations[target] = self.targets_of_bits(superset_bits)
+		return superset_relations
+
+
+def main(args: Optional[List[str]] = None) -> int:
+	'''
+	Run the command-line interface (see the module docstring)
+
+	:param args : (optional) The command-line arguments (default: sys.argv[1:])
+	'''
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('ninja_build_dir', type=Path, help='The ninja build directory to analyse')
+	parser.add_argument('--min-fraction', type=float, default=0.8,
+	                    help='The minimum fraction of the targets that must include a common header (default: 0.8)')
+	parser.add_argument('--json', type=Path, default=None,
+	                    help='A file to which to dump the common headers and superset relations as JSON')
+	parsed_args = parser.parse_args(args)
+
+	include_sets = IncludeSets(dep_graph_of_ninja_deps_log(read_ninja_deps_log(parsed_args.ninja_build_dir / '.ninja_deps')))
+	common_headers = [x for x in include_sets.common_headers(min_fraction=parsed_args.min_fraction) if is_header(x.header)]
+	superset_relations = include_sets.superset_relations()
+
+	print(f'{len(common_headers)} headers are included by at least {parsed_args.min_fraction:.0%} of '
+	      f'{include_sets.graph.num_targets()} targets:')
+	for coverage in common_headers:
+		print(f'{coverage.fraction:>7.1%} {coverage.num_targets:>8}  {coverage.header}')
+	print(f'{len(superset_relations)} targets have header sets contained in those of other targets')
+
+	if parsed_args.json is not None:
+		with open(parsed_args.json, 'w') as json_fh:
+			json.dump({
+				'common_headers': [asdict(x) for x in common_headers],
+				'superset_relations': superset_relations,
+			}, json_fh, indent='\t')
+			json_fh.write('\n')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+from cppbuild.compile_flags import without_output_flags
+from cppbuild.shlex_join import shlex_join_shim
+
+# Programs that may prefix a compile command without affecting the work it does
+_COMMAND_LAUNCHERS = frozenset(('ccache', 'sccache', 'distcc', 'icecc'))
+
+# The number of records to write before committing them to the database
+_RECORDS_PER_COMMIT = 100
+
+
+def normalized_command(command: List[str]) -> str:
+	'''
+	Normalize the specified command for use as part of a history key
+
+	This drops any leading compiler launchers (eg ccache) and any dependency output flags
+	(see without_output_flags()), which don't affect the cost of the command.
+
+	:param command : The command to normalize
+	'''
+	parts = list(command)
+	while parts and os.path.basename(parts[0]) in _COMMAND_LAUNCHERS:
+		parts.pop(0)
+
+	return shlex_join_shim(without_output_flags(parts, keep_output_path=True))
+
+
+def history_key(command: List[str], file: Optional[Path] = None) -> str:
+	'''
+	The key under which to record the history of the specified command (and compdb file)
+
+	:param command : The command
+	:param file    : (optional) The compdb file (ie the primary input) of the command
+	'''
+	key_str = normalized_command(command) + '\0' + ('' if file is None else str(file))
+	return hashlib.sha1(key_str.encode()).hexdigest()
+
+
+def _no_file(_associated_data: Any) -> Optional[Path]:
+	return None
+
+
+class JobHistory:
+	'''
+	A persistent, sqlite-backed record of the wall time, CPU time and peak RSS of each executed command
+
+	The records are keyed on history_key() of the command and its compdb file, and can be queried for
+	the expected cost of a command (eg for a LongestProcessingTimeFirstScheduler or an ETA display).
+
+	Use record_command_result() as (or from) a CommandExecutor callback.
+	'''
+
+	def __init__(self,
+	             db_path: Path,
+	             *,
+	             file_of_associated_data: Callable[[Any], Optional[Path]] = _no_file,
+	             num_recent_runs: int = 5,
+	             ):
+		'''
+		Ctor
+
+		:param db_path                 : The sqlite database file in which to store the history (created if necessary)
+		:param file_of_associated_data : A function that returns the compdb file of a job from its associated_data
+		                                 (default: always None)
+		:param num_recent_runs         : The number of most recent successful runs to average for the expected cost
+		'''
+		self._file_of_associated_data = file_of_associated_data
+		self._num_recent_runs = num_recent_runs
+		self._num_uncommitted_records = 0
+
+		self._connection = sqlite3.connect(str(db_path))
+		self._connection.execute('PRAGMA journal_mode=WAL')
+		self._connection.execute('PRAGMA synchronous=NORMAL')
+		self._connection.execute('''
+			CREATE TABLE IF NOT EXISTS job_runs (
+				key         TEXT    NOT NULL,
+				file        TEXT,
+				returncode  INTEGER NOT NULL,
+				wall_time   REAL    NOT NULL,
+				cpu_time    REAL,
+				max_rss_kib INTEGER,
+				recorded_at REAL    NOT NULL
+			)
+		''')
+		self._connection.execute('CREATE INDEX IF NOT EXISTS job_runs_by_key ON job_runs (key, recorded_at)')
+		self._connection.commit()
+
+	def close(self) -> None:
+		'''
+		Commit any outstanding records and close the database
+		'''
+		self._connection.commit()
+		self._connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_args):
+		self.close()
+
+	def record(self, result: CommandResult) -> None:
+		'''
+		Record the specified result (if its wall time is known)
+
+		:param result : The result to record
+		'''
+		wall_time = result.wall_time
+		if wall_time is None:
+			return
+		file = self._file_of_associated_data(result.associated_data)
+		self._connection.execute(
+			'INSERT INTO job_runs VALUES (?, ?, ?, ?, ?, ?, ?)',
+			(
+				history_key(result.command, file),
+				None if file is None else str(file),
+				result.returncode,
+				wall_time,
+				result.cpu_time,
+				result.max_rss_kib,
+				time.time(),
+			)
+		)
+		self._num_uncommitted_records += 1
+		if self._num_uncommitted_records >= _RECORDS_PER_COMMIT:
+			self._connection.commit()
+			self._num_uncommitted_records = 0
+
+	def record_command_result(self,
+	                          *,
+	                          result: CommandResult,
+	                          num_remaining_commands: int,
+	                          ) -> None:
+		'''
+		Record the result of a command having been executed (matching the CommandExecutor callback arguments)
+
+		:param result                 : The result of the command execution
+		:param num_remaining_commands : The number of remaining commands (unused)
+		'''
+		self.record(result)
+
+	def expected_cost(self, key: str) -> Optional[float]:
+		'''
+		The mean wall time of the most recent successful runs recorded under the specified key (or None if there are none)
+
+		:param key : The history_key() to query
+		'''
+		row = self._connection.execute(
+			'''
+			SELECT AVG(wall_time) FROM (
+				SELECT wall_time FROM job_runs WHERE key = ? AND returncode = 0 ORDER BY recorded_at DESC, rowid DESC LIMIT ?
+			)
+			''',
+			(key, self._num_recent_runs),
+		).fetchone()
+		return row[0]
+
+	def expected_cost_of_job(self, job: CommandJob) -> Optional[float]:
+		'''
+		The expected cost of the specified job (or None if unknown)
+
+		This can be passed as the cost_of_job of a LongestProcessingTimeFirstScheduler.
+
+		:param job : The job to query
+		'''
+		return self.expected_cost(history_key(job.command, self._file_of_associated_data(job.associated_data)))
+
+	def expected_costs(self) -> Dict[str, float]:
+		'''
+		The expected cost of every key with a successful run (for callers making many queries)
+		'''
+		expected_cost_of_key: Dict[str, float] = {}
+		wall_times_of_key: Dict[str, List[float]] = {}
+		for key, wall_time in self._connection.execute(
+				'SELECT key, wall_time FROM job_runs WHERE returncode = 0 ORDER BY key, recorded_at DESC, rowid DESC'
+		):
+			wall_times = wall_times_of_key.setdefault(key, [])
+			if len(wall_times) < self._num_recent_runs:
+				wall_times.append(wall_time)
+		for key, wall_times in wall_times_of_key.items():
+			expected_cost_of_key[key] = sum(wall_times) / len(wall_times)
+		return expected_cost_of_key
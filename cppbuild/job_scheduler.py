@@ -0,0 +1,183 @@
+import abc
+import collections
+import heapq
+import itertools
+import math
+
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+from cppbuild.command_job import CommandJob
+
+
+class JobScheduler(abc.ABC):
+	'''
+	A queue of CommandJobs waiting to be started, which determines the order in which they're started
+	'''
+
+	@abc.abstractmethod
+	def push(self, job: CommandJob) -> None:
+		'''
+		Add the specified job to the queue
+
+		:param job : The job to add
+		'''
+
+	@abc.abstractmethod
+	def pop(self) -> CommandJob:
+		'''
+		Remove and return the job that should be started next (raising IndexError if the queue is empty)
+		'''
+
+	@abc.abstractmethod
+	def peek(self) -> CommandJob:
+		'''
+		Return (without removing) the job that should be started next (raising IndexError if the queue is empty)
+		'''
+
+	@abc.abstractmethod
+	def __len__(self) -> int:
+		'''
+		The number of jobs in the queue
+		'''
+
+	def extend(self, jobs: Iterable[CommandJob]) -> None:
+		'''
+		Add the specified jobs to the queue
+
+		:param jobs : The jobs to add
+		'''
+		for job in jobs:
+			self.push(job)
+
+
+class FifoScheduler(JobScheduler):
+	'''
+	Start jobs in the order in which they were added
+	'''
+
+	def __init__(self):
+		'''
+		Ctor
+		'''
+		self._queue: Deque[CommandJob] = collections.deque()
+
+	def push(self, job: CommandJob) -> None:
+		self._queue.append(job)
+
+	def extend(self, jobs: Iterable[CommandJob]) -> None:
+		self._queue.extend(jobs)
+
+	def pop(self) -> CommandJob:
+		return self._queue.popleft()
+
+	def peek(self) -> CommandJob:
+		return self._queue[0]
+
+	def __len__(self) -> int:
+		return len(self._queue)
+
+
+class _HeapScheduler(JobScheduler):
+	'''
+	Start jobs in ascending order of a sort key, breaking ties in the order in which they were added
+	'''
+
+	def __init__(self, sort_key_of_job: Callable[[CommandJob], float]):
+		'''
+		Ctor
+
+		:param sort_key_of_job : A function returning the key of a job (lower keys are started first)
+		'''
+		self._sort_key_of_job = sort_key_of_job
+		self._heap: List[Tuple[float, int, CommandJob]] = []
+		self._counter = itertools.count()
+
+	def push(self, job: CommandJob) -> None:
+		heapq.heappush(self._heap, (self._sort_key_of_job(job), next(self._counter), job))
+
+	def pop(self) -> CommandJob:
+		return heapq.heappop(self._heap)[2]
+
+	def peek(self) -> CommandJob:
+		return self._heap[0][2]
+
+	def __len__(self) -> int:
+		return len(self._heap)
+
+
+class PriorityScheduler(_HeapScheduler):
+	'''
+	Start jobs in descending order of CommandJob.priority (and in the order in which they were added for equal priorities)
+	'''
+
+	def __init__(self):
+		'''
+		Ctor
+		'''
+		super().__init__(lambda job: -job.priority)
+
+
+def _estimated_cost_of_job(job: CommandJob) -> Optional[float]:
+	'''
+	The CommandJob's estimated_cost
+
+	:param job : The job to query
+	'''
+	return job.estimated_cost
+
+
+class LongestProcessingTimeFirstScheduler(_HeapScheduler):
+	'''
+	Start jobs in descending order of estimated cost (the LPT rule), which reduces the long tail
+	where one expensive job starts last whilst the other slots sit idle
+	'''
+
+	def __init__(self,
+	             *,
+	             cost_of_job: Callable[[CommandJob], Optional[float]] = _estimated_cost_of_job,
+	             unknown_cost: float = math.inf,
+	             ):
+		'''
+		Ctor
+
+		:param cost_of_job  : A function returning the estimated cost of a job, or None if unknown
+		                      (default: the job's estimated_cost)
+		:param unknown_cost : The cost to assume for jobs of unknown cost (default: infinity, ie start them first)
+		'''
+		def sort_key_of_job(job: CommandJob) -> float:
+			cost = cost_of_job(job)
+			return -(unknown_cost if cost is None else cost)
+
+		super().__init__(sort_key_of_job)
+
+
+def simulate_makespan(jobs: Iterable[CommandJob],
+                      *,
+                      num_parallel_jobs: int,
+                      scheduler: JobScheduler,
+                      actual_cost_of_job: Callable[[CommandJob], Optional[float]] = _estimated_cost_of_job,
+                      ) -> float:
+	'''
+	Deterministically simulate running the specified jobs with the specified scheduler
+	and return the makespan (the time at which the last job finishes)
+
+	Each job is started in the first slot to become free and runs for its actual cost.
+
+	:param jobs               : The jobs to simulate
+	:param num_parallel_jobs  : The number of slots in which to run jobs
+	:param scheduler          : The (empty) scheduler that determines the order in which the jobs are started
+	:param actual_cost_of_job : A function returning the actual cost of a job (default: the job's estimated_cost)
+	'''
+	scheduler.extend(jobs)
+	slot_free_times = [0.0] * num_parallel_jobs
+	makespan = 0.0
+	while len(scheduler):
+		job = scheduler.pop()
+		cost = actual_cost_of_job(job)
+		if cost is None:
+			raise ValueError(f'Unable to simulate a job with no actual cost: {job}')
+		start_time = heapq.heappop(slot_free_times)
+		finish_time = start_time + cost
+		makespan = max(makespan, finish_time)
+		heapq.heappush(slot_free_times, finish_time)
+	return makespan
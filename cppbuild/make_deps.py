@@ -0,0 +1,151 @@
+import concurrent.futures
+import re
+import sys
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# A token in a line of a Make-style dependency file: a run of characters other than unescaped whitespace
+# (ie a backslash escapes any following character, including a space)
+_TOKEN_RE = re.compile(r'(?:[^\s\\#]+|\\.|\\$)+|#')
+
+# The escapes within a token: a run of backslashes before a space, hash or colon, or a doubled dollar
+_ESCAPE_RE = re.compile(r'(\\+)([ #:])|\$\$')
+
+# The line continuations (which are treated as whitespace)
+_LINE_CONTINUATIONS = ('\\\r\n', '\\\n')
+
+
+def _unescape_match(match) -> str:
+	'''
+	The unescaped form of the specified _ESCAPE_RE match
+
+	As for ninja's depfile parser, 2N+1 backslashes before a space, hash or colon become N backslashes before it
+	(and 2N backslashes are left alone).
+	'''
+	backslashes = match.group(1)
+	if backslashes is None:
+		return '$'
+	if len(backslashes) % 2 == 0:
+		return match.group(0)
+	return '\\' * (len(backslashes) // 2) + match.group(2)
+
+
+def _unescape(token: str) -> str:
+	'''
+	The unescaped form of the specified token
+
+	:param token : The token as it appears in the dependency file
+	'''
+	if '\\' not in token and '$' not in token:
+		return token
+	return _ESCAPE_RE.sub(_unescape_match, token)
+
+
+def _is_rule_separator(token: str) -> bool:
+	'''
+	Whether the specified token ends with the (unescaped) colon that separates a rule's targets from its prerequisites
+	'''
+	return token.endswith(':') and not token.endswith('\\:')
+
+
+def parse_make_deps(deps_str: str, *, first_target: Optional[str] = None) -> Dict[str, List[str]]:
+	'''
+	Parse a Make-style dependency file (eg as written by a compiler's -MD/-MF) in a single pass and return
+	the prerequisites of each target, in order of appearance and without duplicates
+
+	This handles line continuations, comments, multiple targets per rule, multiple rules per target and the
+	escapes written by GCC/Clang (`\\ `, `\\#`, `\\:` and `$$`). Rules without prerequisites (eg the phony targets
+	written by -MP) are dropped. The prerequisite strings are interned, so those shared between files share memory.
+
+	:param deps_str     : The content of the dependency file
+	:param first_target : (optional) The target of the first rule, which must then match the start of the content
+	                      exactly (to disambiguate targets that contain unescaped colons or spaces)
+	'''
+	if first_target is not None:
+		if not deps_str.startswith(first_target + ':'):
+			raise ValueError(f'Dependency file does not start with the expected target {first_target!r}')
+		deps_str = deps_str[len(first_target) + 1:]
+
+	for line_continuation in _LINE_CONTINUATIONS:
+		if line_continuation in deps_str:
+			deps_str = deps_str.replace(line_continuation, ' ')
+
+	prereqs_of_target: Dict[str, Dict[str, None]] = {}
+	for line_index, line in enumerate(deps_str.split('\n')):
+		tokens = _TOKEN_RE.findall(line)
+		if '#' in tokens:
+			tokens = tokens[:tokens.index('#')]
+		if not tokens:
+			continue
+
+		if line_index == 0 and first_target is not None:
+			targets = [first_target]
+			prereq_tokens = tokens
+		else:
+			separator_index = next((index for index, token in enumerate(tokens) if _is_rule_separator(token)), None)
+			if separator_index is None:
+				raise ValueError(f'Found a dependency line without a rule separator: {line!r}')
+			targets = [_unescape(x) for x in tokens[:separator_index]]
+			if len(tokens[separator_index]) > 1:
+				targets.append(_unescape(tokens[separator_index][:-1]))
+			if not targets:
+				raise ValueError(f'Found a dependency rule without any targets: {line!r}')
+			prereq_tokens = tokens[separator_index + 1:]
+
+		prereqs = [sys.intern(_unescape(x)) for x in prereq_tokens]
+		for target in targets:
+			target_prereqs = prereqs_of_target.setdefault(target, {})
+			for prereq in prereqs:
+				target_prereqs[prereq] = None
+
+	return {
+		target: list(prereqs)
+		for target, prereqs in prereqs_of_target.items()
+		if prereqs
+	}
+
+
+def _read_and_parse_make_deps_file(deps_file: Path) -> Dict[str, List[str]]:
+	with open(deps_file, 'r', errors='surrogateescape') as deps_fh:
+		return parse_make_deps(deps_fh.read())
+
+
+def parse_make_deps_files(deps_files: Iterable[Path],
+                          *,
+                          max_workers: Optional[int] = None,
+                          chunksize: int = 64,
+                          ) -> Dict[Path, Dict[str, List[str]]]:
+	'''
+	Parse the specified Make-style dependency files in parallel with a process pool
+	(as for parse_make_deps(), with the prerequisite strings interned across all the files)
+
+	:param deps_files  : The dependency files to parse
+	:param max_workers : (optional) The number of worker processes (default: the CPU count)
+	:param chunksize   : The number of files to send to a worker at a time
+	'''
+	deps_files = list(deps_files)
+	with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+		parsed_deps = executor.map(_read_and_parse_make_deps_file, deps_files, chunksize=chunksize)
+		return {
+			deps_file: {
+				target: [sys.intern(x) for x in prereqs]
+				for target, prereqs in prereqs_of_target.items()
+			}
+			for deps_file, prereqs_of_target in zip(deps_files, parsed_deps)
+		}
+
+
+def parse_make_deps_dir(deps_dir: Path,
+                        *,
+                        pattern: str = '**/*.d',
+                        max_workers: Optional[int] = None,
+                        ) -> Dict[Path, Dict[str, List[str]]]:
+	'''
+	Parse every Make-style dependency file under the specified directory in parallel (see parse_make_deps_files())
+
+	:param deps_dir    : The directory to search
+	:param pattern     : The glob pattern of the dependency files, relative to the directory (default: '**/*.d')
+	:param max_workers : (optional) The number of worker processes (default: the CPU count)
+	'''
+	return parse_make_deps_files(sorted(deps_dir.glob(pattern)), max_workers=max_workers)
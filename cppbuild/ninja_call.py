@@ -2,10 +2,13 @@ import subprocess
 import json
 import logging
 import os
+import tempfile
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Iterator, List
+
+from cppbuild.raw_dep_record import RawDepRecord, parse_ninja_deps
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +51,54 @@ def get_ninja_deps_str_for_dir(ninja_build_dir: Path) -> str:
 	return ninja_deps_result.stdout
 
 
+def _iter_checked_ninja_run_lines(command: List[str], **kwargs) -> Iterator[str]:
+	'''
+	Run the specified ninja command, yielding the lines of its stdout as they're produced and then
+	raising a descriptive ChildProcessError if it fails
+
+	If the iteration is abandoned early, the command is killed.
+
+	:param command : The command to execute
+	:param kwargs  : Any other arguments to pass to Popen()
+	'''
+	with tempfile.TemporaryFile() as stderr_fh:
+		popen = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_fh, text=True, **kwargs)
+		try:
+			assert popen.stdout is not None
+			yield from popen.stdout
+			popen.stdout.close()
+			returncode = popen.wait()
+		finally:
+			if popen.returncode is None:
+				popen.kill()
+				popen.wait()
+			if popen.stdout is not None:
+				popen.stdout.close()
+		if returncode != 0:
+			stderr_fh.seek(0)
+			raise ChildProcessError(
+				f'Execution of ninja command "{ " ".join(command) }" failed with returncode {returncode}.'
+				+ f' stderr was { stderr_fh.read().decode(errors="replace") }'
+			)
+
+
+def iter_ninja_deps_for_dir(ninja_build_dir: Path) -> Iterator[RawDepRecord]:
+	'''
+	Call ninja to query the deps and yield a RawDepRecord for each target as it's read from the output
+
+	Unlike get_ninja_deps_str_for_dir(), this never holds the whole output in memory.
+
+	:param ninja_build_dir: The ninja build directory to process
+	'''
+	logger.info( f'Calling ninja on directory {ninja_build_dir} to stream deps...' )
+
+	return parse_ninja_deps(_iter_checked_ninja_run_lines([
+		'ninja',
+		'-C', str(ninja_build_dir),
+		'-t', 'deps',
+	]))
+
+
 
 @dataclass
 class NinjaCompDBRecord:
@@ -55,8 +106,13 @@ class NinjaCompDBRecord:
 	Represent one entry in a ninja compdb, using names matching those used by ninja
 
 	This describes one command
+
+	This uses __slots__ because a compdb may hold a great many records
+	(see also ColumnarCompDB for a far more compact representation)
 	'''
 
+	__slots__ = ('directory', 'command', 'file', 'output')
+
 	# The directory in which the command is run
 	directory: Path
 
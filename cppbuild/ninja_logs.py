@@ -0,0 +1,265 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cppbuild.dep_graph import DepGraph, PathInterner
+from cppbuild.raw_dep_record import RawDepRecord
+
+logger = logging.getLogger(__name__)
+
+# The signature at the start of a .ninja_deps file and the versions of the format that can be read
+NINJA_DEPS_SIGNATURE = b'# ninjadeps\n'
+_NINJA_DEPS_VERSIONS = (3, 4)
+
+# The bit of a .ninja_deps record's size that marks it as a deps record (rather than a path record)
+_DEPS_RECORD_FLAG = 0x80000000
+
+# The signature at the start of a .ninja_log file and the versions of the format that can be read
+_NINJA_LOG_SIGNATURE_PREFIX = '# ninja log v'
+_NINJA_LOG_VERSIONS = (5, 6)
+
+_UINT32 = struct.Struct('<I')
+
+
+@dataclass
+class NinjaDepsEntry:
+	'''
+	The latest deps recorded for one output in a .ninja_deps file
+	'''
+
+	# The mtime of the output when its deps were recorded (in ninja's units, ie nanoseconds for version 4)
+	mtime: int
+
+	# The path IDs of the dependencies
+	dep_ids: array
+
+
+class NinjaDepsLog:
+	'''
+	The content of a .ninja_deps file, ie the interned paths and the latest deps recorded for each output
+	'''
+
+	def __init__(self, *, version: int, paths: List[str], entry_of_output_id: Dict[int, NinjaDepsEntry]):
+		'''
+		Ctor
+
+		:param version            : The version of the .ninja_deps format
+		:param paths              : The paths, indexed by path ID
+		:param entry_of_output_id : The latest deps entry of each output, keyed on the output's path ID
+		'''
+		self.version = version
+		self.paths = paths
+		self.entry_of_output_id = entry_of_output_id
+
+	def iter_raw_dep_records(self, *, ninja_build_dir: Optional[Path] = None) -> Iterator[RawDepRecord]:
+		'''
+		Yield a RawDepRecord for each output with recorded deps, in the order in which the outputs were first seen
+
+		Like `ninja -t deps`, the deps are VALID if the output exists and isn't newer than when they were recorded.
+		Unlike `ninja -t deps`, outputs that are no longer built with deps by build.ninja aren't filtered out.
+
+		:param ninja_build_dir : (optional) The build directory relative to which the outputs are checked for validity
+		                         (or None to skip the check and report every record as VALID)
+		'''
+		for output_id, entry in self.entry_of_output_id.items():
+			target = self.paths[output_id]
+			yield RawDepRecord(
+				target=Path(target),
+				is_valid=True if ninja_build_dir is None else self._is_valid(ninja_build_dir / target, entry),
+				deps=[Path(self.paths[x]) for x in entry.dep_ids],
+			)
+
+	def _is_valid(self, output_path: Path, entry: NinjaDepsEntry) -> bool:
+		'''
+		Whether the specified output exists and isn't newer than the specified deps entry (as decided by ninja)
+
+		:param output_path : The path of the output
+		:param entry       : The deps entry of the output
+		'''
+		try:
+			stat_result = os.stat(output_path)
+		except FileNotFoundError:
+			return False
+		# Version 3 recorded whole seconds
+		output_mtime = stat_result.st_mtime_ns if self.version >= 4 else int(stat_result.st_mtime)
+		return output_mtime <= entry.mtime
+
+
+def dep_graph_of_ninja_deps_log(deps_log: NinjaDepsLog) -> DepGraph:
+	'''
+	Make a DepGraph straight from the path IDs of the specified NinjaDepsLog (without making any Paths)
+
+	Every target is marked as valid (see NinjaDepsLog.iter_raw_dep_records() for validity checking).
+
+	:param deps_log : The deps log from which to make the graph
+	'''
+	targets = PathInterner()
+	headers = PathInterner()
+	header_id_of_path_id: Dict[int, int] = {}
+	header_offsets = array('I', [0])
+	header_ids = array('I')
+	for output_id, entry in deps_log.entry_of_output_id.items():
+		targets.intern(deps_log.paths[output_id])
+		for dep_id in entry.dep_ids:
+			header_id = header_id_of_path_id.get(dep_id)
+			if header_id is None:
+				header_id = headers.intern(deps_log.paths[dep_id])
+				header_id_of_path_id[dep_id] = header_id
+			header_ids.append(header_id)
+		header_offsets.append(len(header_ids))
+	return DepGraph(
+		targets=targets,
+		headers=headers,
+		target_is_valid=array('B', bytes([1]) * len(targets)),
+		header_offsets=header_offsets,
+		header_ids=header_ids,
+	)
+
+
+def _parse_ninja_deps_records(buffer, version: int, path: Path) -> Tuple[List[str], Dict[int, NinjaDepsEntry]]:
+	'''
+	Parse the records of a .ninja_deps file, stopping (as ninja does) at the first truncated or invalid record
+
+	:param buffer  : The content of the file (eg an mmap)
+	:param version : The version of the file, from its header
+	:param path    : The path of the file (for logging)
+	'''
+	paths: List[str] = []
+	entry_of_output_id: Dict[int, NinjaDepsEntry] = {}
+	num_deps_header_words = 3 if version >= 4 else 2
+	offset = len(NINJA_DEPS_SIGNATURE) + 4
+	end = len(buffer)
+	while offset + 4 <= end:
+		(size,) = _UINT32.unpack_from(buffer, offset)
+		is_deps_record = bool(size & _DEPS_RECORD_FLAG)
+		size &= ~_DEPS_RECORD_FLAG
+		record_start = offset + 4
+		if size % 4 != 0 or record_start + size > end:
+			logger.warning(f'Ignoring the truncated or invalid tail of {path} from offset {offset}')
+			break
+
+		if is_deps_record:
+			num_words = size // 4
+			if num_words < num_deps_header_words:
+				logger.warning(f'Ignoring the invalid tail of {path} from offset {offset}')
+				break
+			(output_id,) = _UINT32.unpack_from(buffer, record_start)
+			# Version 4 records a 64-bit mtime (in nanoseconds) and version 3 a 32-bit one (in seconds)
+			(mtime,) = struct.unpack_from('<q' if version >= 4 else '<i', buffer, record_start + 4)
+			dep_ids = array('I')
+			dep_ids.frombytes(buffer[record_start + 4 * num_deps_header_words:record_start + size])
+			if sys.byteorder != 'little':
+				dep_ids.byteswap()
+			if output_id >= len(paths) or (len(dep_ids) and max(dep_ids) >= len(paths)):
+				logger.warning(f'Ignoring the tail of {path} from offset {offset}, which refers to unknown paths')
+				break
+			entry_of_output_id[output_id] = NinjaDepsEntry(mtime=mtime, dep_ids=dep_ids)
+		else:
+			if size < 4:
+				logger.warning(f'Ignoring the invalid tail of {path} from offset {offset}')
+				break
+			(checksum,) = _UINT32.unpack_from(buffer, record_start + size - 4)
+			if checksum != (~len(paths) & 0xFFFFFFFF):
+				logger.warning(f'Ignoring the tail of {path} from offset {offset}, which has a bad path checksum')
+				break
+			path_bytes = bytes(buffer[record_start:record_start + size - 4]).rstrip(b'\0')
+			paths.append(path_bytes.decode('utf-8', 'surrogateescape'))
+
+		offset = record_start + size
+	return paths, entry_of_output_id
+
+
+def read_ninja_deps_log(path: Path) -> NinjaDepsLog:
+	'''
+	Read the specified .ninja_deps file (via mmap) without running ninja
+
+	Raise ValueError if it isn't a .ninja_deps file of a supported version.
+
+	:param path : The .ninja_deps file to read (eg build_dir / '.ninja_deps')
+	'''
+	with open(path, 'rb') as deps_fh:
+		file_size = os.fstat(deps_fh.fileno()).st_size
+		header_size = len(NINJA_DEPS_SIGNATURE) + 4
+		if file_size < header_size:
+			raise ValueError(f'{path} is too short to be a .ninja_deps file')
+		with mmap.mmap(deps_fh.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+			if buffer[:len(NINJA_DEPS_SIGNATURE)] != NINJA_DEPS_SIGNATURE:
+				raise ValueError(f'{path} is not a .ninja_deps file')
+			(version,) = struct.unpack_from('<i', buffer, len(NINJA_DEPS_SIGNATURE))
+			if version not in _NINJA_DEPS_VERSIONS:
+				raise ValueError(f'{path} has unsupported .ninja_deps version {version} (supported: {_NINJA_DEPS_VERSIONS})')
+			paths, entry_of_output_id = _parse_ninja_deps_records(buffer, version, path)
+	return NinjaDepsLog(version=version, paths=paths, entry_of_output_id=entry_of_output_id)
+
+
+@dataclass
+class NinjaLogEntry:
+	'''
+	One entry in a .ninja_log file, describing the latest run of the command that produced an output
+	'''
+
+	# The times (in milliseconds since the start of the ninja run) at which the command started and ended
+	start_time_ms: int
+	end_time_ms: int
+
+	# The mtime of the output as recorded by ninja (or 0 if it wasn't recorded)
+	mtime: int
+
+	# The output
+	output: str
+
+	# The hash of the command (in hex)
+	command_hash: str
+
+	@property
+	def duration(self) -> float:
+		'''
+		The wall time of the command in seconds
+		'''
+		return (self.end_time_ms - self.start_time_ms) / 1000.0
+
+
+def read_ninja_log(path: Path) -> Dict[str, NinjaLogEntry]:
+	'''
+	Read the specified .ninja_log file and return the latest entry for each output
+
+	Raise ValueError if it isn't a .ninja_log file of a supported version.
+
+	:param path : The .ninja_log file to read (eg build_dir / '.ninja_log')
+	'''
+	entry_of_output: Dict[str, NinjaLogEntry] = {}
+	with open(path, encoding='utf-8', errors='surrogateescape') as log_fh:
+		header = log_fh.readline()
+		if not header.startswith(_NINJA_LOG_SIGNATURE_PREFIX):
+			raise ValueError(f'{path} is not a .ninja_log file')
+		try:
+			version = int(header[len(_NINJA_LOG_SIGNATURE_PREFIX):])
+		except ValueError as err:
+			raise ValueError(f'{path} has an invalid .ninja_log header: {header!r}') from err
+		if version not in _NINJA_LOG_VERSIONS:
+			raise ValueError(f'{path} has unsupported .ninja_log version {version} (supported: {_NINJA_LOG_VERSIONS})')
+
+		for line in log_fh:
+			fields = line.rstrip('\n').split('\t')
+			if len(fields) != 5:
+				# Skip partially-written lines (eg from an interrupted build), as ninja does
+				continue
+			start_time_ms, end_time_ms, mtime, output, command_hash = fields
+			try:
+				entry_of_output[output] = NinjaLogEntry(
+					start_time_ms=int(start_time_ms),
+					end_time_ms=int(end_time_ms),
+					mtime=int(mtime),
+					output=output,
+					command_hash=command_hash,
+				)
+			except ValueError:
+				continue
+	return entry_of_output
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import marshal
+import os
+import tempfile
+
+from pathlib import Path
+from typing import List, Tuple
+
+from cppbuild.dep_graph import DepGraph, dep_graph_of_raw_dep_records, load_dep_graph, save_dep_graph
+from cppbuild.ninja_call import (
+	NinjaCompDBRecord,
+	compdb_of_compdb_str,
+	get_ninja_compdb_str_for_dir,
+	iter_ninja_deps_for_dir,
+)
+
+logger = logging.getLogger(__name__)
+
+# The files in the ninja build directory whose stat signatures determine whether the cached query results are current
+_SIGNATURE_FILENAMES = ('build.ninja', '.ninja_log', '.ninja_deps')
+
+# The directory (within the ninja build directory) in which the cached query results are stored
+CACHE_DIRNAME = '.cppbuild-cache'
+
+# The version of the cache file formats (to be bumped whenever they change)
+_CACHE_FORMAT_VERSION = 1
+
+
+def _stat_signature(ninja_build_dir: Path) -> str:
+	'''
+	A digest of the stat signatures (mtime, size and inode) of the files that determine the ninja query results
+
+	:param ninja_build_dir : The ninja build directory
+	'''
+	hasher = hashlib.sha1(f'{_CACHE_FORMAT_VERSION}:{marshal.version}'.encode())
+	for filename in _SIGNATURE_FILENAMES:
+		try:
+			stat_result = os.stat(ninja_build_dir / filename)
+			hasher.update(f'\0{filename}:{stat_result.st_mtime_ns}:{stat_result.st_size}:{stat_result.st_ino}'.encode())
+		except FileNotFoundError:
+			hasher.update(f'\0{filename}:missing'.encode())
+	return hasher.hexdigest()
+
+
+def _cache_path(ninja_build_dir: Path, query_name: str, signature: str) -> Path:
+	return ninja_build_dir / CACHE_DIRNAME / f'{query_name}-{signature}'
+
+
+def _replace_cache_file(cache_path: Path, cache_bytes: bytes) -> None:
+	'''
+	Atomically write the specified cache file and remove any stale cache files for the same query
+
+	:param cache_path  : The cache file to write
+	:param cache_bytes : The content to write
+	'''
+	cache_path.parent.mkdir(exist_ok=True)
+	temp_fd, temp_name = tempfile.mkstemp(prefix='.' + cache_path.name + '.', dir=str(cache_path.parent))
+	try:
+		with os.fdopen(temp_fd, 'wb') as cache_fh:
+			cache_fh.write(cache_bytes)
+		os.replace(temp_name, cache_path)
+	except BaseException:
+		os.unlink(temp_name)
+		raise
+	_remove_stale_cache_files(cache_path)
+
+
+def _remove_stale_cache_files(cache_path: Path) -> None:
+	'''
+	Remove any cache files for the same query as the specified cache file but with other signatures
+
+	:param cache_path : The current cache file
+	'''
+	query_name = cache_path.name.rsplit('-', 1)[0]
+	for stale_path in cache_path.parent.glob(f'{query_name}-*'):
+		if stale_path != cache_path:
+			try:
+				stale_path.unlink()
+			except FileNotFoundError:
+				pass
+
+
+def get_cached_ninja_compdb_for_dir(ninja_build_dir: Path) -> List[NinjaCompDBRecord]:
+	'''
+	Like get_ninja_compdb_for_dir() but reuse the result cached in the build directory if build.ninja,
+	.ninja_log and .ninja_deps are unchanged since it was cached (or cache it otherwise)
+
+	A cache hit skips both the ninja subprocess and the JSON parse.
+
+	:param ninja_build_dir: The ninja build directory to process
+	'''
+	signature = _stat_signature(ninja_build_dir)
+	cache_path = _cache_path(ninja_build_dir, 'compdb', signature)
+	try:
+		cached_tuples: List[Tuple[str, str, str, str]] = marshal.loads(cache_path.read_bytes())
+		return [
+			NinjaCompDBRecord(directory=Path(directory), command=command, file=Path(file), output=output)
+			for directory, command, file, output in cached_tuples
+		]
+	except (OSError, EOFError, ValueError, TypeError):
+		pass
+
+	compdb = compdb_of_compdb_str(get_ninja_compdb_str_for_dir(ninja_build_dir))
+	if _stat_signature(ninja_build_dir) == signature:
+		_replace_cache_file(cache_path, marshal.dumps([
+			(str(x.directory), x.command, str(x.file), x.output)
+			for x in compdb
+		]))
+	else:
+		logger.info(f'Not caching compdb of {ninja_build_dir} because it changed while being queried')
+	return compdb
+
+
+def get_cached_dep_graph_for_dir(ninja_build_dir: Path) -> DepGraph:
+	'''
+	Make a DepGraph of the `ninja -t deps` output for the specified build directory, reusing the graph cached in the
+	build directory if build.ninja, .ninja_log and .ninja_deps are unchanged since it was cached (or caching it otherwise)
+
+	The dependencies are as named by ninja (ie usually relative to the build directory).
+
+	:param ninja_build_dir: The ninja build directory to process
+	'''
+	signature = _stat_signature(ninja_build_dir)
+	cache_path = _cache_path(ninja_build_dir, 'deps', signature)
+	try:
+		return load_dep_graph(cache_path)
+	except (OSError, ValueError):
+		pass
+
+	graph = dep_graph_of_raw_dep_records(iter_ninja_deps_for_dir(ninja_build_dir))
+	if _stat_signature(ninja_build_dir) == signature:
+		cache_path.parent.mkdir(exist_ok=True)
+		save_dep_graph(graph, cache_path)
+		_remove_stale_cache_files(cache_path)
+	else:
+		logger.info(f'Not caching deps of {ninja_build_dir} because they changed while being queried')
+	return graph
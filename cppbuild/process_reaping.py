@@ -0,0 +1,73 @@
+import os
+import resource
+import subprocess
+
+from typing import Optional, Tuple
+
+
+def wait_for_exit_without_reaping(popen: subprocess.Popen) -> None:
+	'''
+	Block until the specified process has exited, leaving it to be reaped by a later reap_if_exited()
+
+	:param popen : The process to wait for
+	'''
+	try:
+		os.waitid(os.P_PID, popen.pid, os.WEXITED | os.WNOWAIT)
+	except ChildProcessError:
+		# The process has already been reaped
+		pass
+
+
+def _returncode_of_wait_status(status: int) -> int:
+	'''
+	The returncode (as Popen would report it) of the specified wait status
+
+	:param status : The status as returned by os.wait4()
+	'''
+	if os.WIFSIGNALED(status):
+		return -os.WTERMSIG(status)
+	return os.WEXITSTATUS(status)
+
+
+def reap_if_exited(popen: subprocess.Popen) -> Tuple[Optional[int], Optional[resource.struct_rusage]]:
+	'''
+	Like Popen.poll() but reap via os.wait4() so that the process's resource usage is also returned
+
+	Return ( returncode, rusage ), where the returncode is None if the process hasn't exited and
+	the rusage is None if the process hasn't exited or if it had already been reaped elsewhere.
+
+	This sets the Popen's returncode if the process is reaped.
+
+	:param popen : The process to reap
+	'''
+	if popen.returncode is not None:
+		return popen.returncode, None
+	try:
+		pid, status, rusage = os.wait4(popen.pid, os.WNOHANG)
+	except ChildProcessError:
+		# The process has already been reaped (eg by Popen's own clean-up) so fall back to Popen
+		return popen.poll(), None
+	if pid == 0:
+		return None, None
+	popen.returncode = _returncode_of_wait_status(status)
+	return popen.returncode, rusage
+
+
+def send_signal(popen: subprocess.Popen, sig: int, *, to_process_group: bool = False) -> None:
+	'''
+	Send the specified signal to the specified process (or to its process group) if it hasn't yet been reaped
+
+	:param popen            : The process to signal
+	:param sig              : The signal to send
+	:param to_process_group : Whether to signal the process group, which requires that the process was started
+	                          with start_new_session=True (so that its process group ID is its PID)
+	'''
+	if popen.returncode is not None:
+		return
+	try:
+		if to_process_group:
+			os.killpg(popen.pid, sig)
+		else:
+			os.kill(popen.pid, sig)
+	except ProcessLookupError:
+		pass
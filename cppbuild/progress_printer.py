@@ -106,8 +106,11 @@ class ProgressPrinter:
 		:param result                 : The result of the command execution
 		:param num_remaining_commands : The number of remaining commands
 		'''
-		if result.returncode == 0:
+		if result.returncode == 0 and not result.cancelled:
 			self._num_succeeded = self._num_succeeded + 1
+		elif result.cancelled:
+			# Count cancelled commands as failures but don't print their (unhelpful) details
+			self._num_failed = self._num_failed + 1
 		else:
 			self._num_failed = self._num_failed + 1
 
@@ -1,8 +1,8 @@
-import shlex
-
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional
+
+from cppbuild.make_deps import parse_make_deps
 
 
 @dataclass
@@ -29,6 +29,7 @@ class RawDepRecord:
 	#
 	# TODO: Consider migrating these to strings to avoid the need to
 	#       convert to Paths when they'll only then be used as lookups for an ID anyway
+	#       (as in DepGraph, which interns them as strings)
 	deps: List[Path]
 
 
@@ -39,17 +40,16 @@ def parse_compiler_deps(compiler_deps_str: str, *, target: Path) -> RawDepRecord
 	The target must be specified to disambiguate the initial line
 	(eg does `fred.cpp: mary.cpp:` refer to two files (`fred.cpp`,  `mary.cpp:`) or one (`fred.cpp: mary.cpp`:))
 
+	Raise ValueError if the string doesn't start with the target or can't be parsed (see parse_make_deps()).
+
 	:param compiler_deps_str : The string from which to parse the dependencies
 	:param target            : The target being compiled (must exactly match the initial deps entry)
 	'''
-	assert compiler_deps_str.startswith( f'{target}: ' )
-	deps_str = compiler_deps_str[len(str(target))+1:]
-	deps_str = deps_str.replace('\\\n', '')
-	deps = shlex.split(deps_str)
+	prereqs_of_target = parse_make_deps(compiler_deps_str, first_target=str(target))
 	return RawDepRecord(
 		target=target,
 		is_valid=True,
-		deps=[Path(x) for x in deps],
+		deps=[Path(x) for x in prereqs_of_target.get(str(target), [])],
 	)
 
 
@@ -65,3 +65,53 @@ def read_compiler_deps_file(compiler_deps_file: Path, *, target: Path) -> RawDep
 			compiler_deps_str=compiler_deps_fh.read(),
 			target=target,
 		)
+
+
+# The separator between the target and the summary in the header line of each `ninja -t deps` record
+_NINJA_DEPS_HEADER_SEPARATOR = ': #deps '
+
+# The indent of each dependency line in a `ninja -t deps` record
+_NINJA_DEPS_INDENT = '    '
+
+
+def parse_ninja_deps(lines: Iterable[str]) -> Iterator[RawDepRecord]:
+	'''
+	Parse the specified lines of `ninja -t deps` output, yielding one RawDepRecord per target as soon as it's complete
+
+	This only holds one record at a time, so memory use is bounded by the largest record
+	(if the lines are also streamed, eg from a file or pipe).
+
+	The output looks like:
+
+	~~~
+	source/a.o: #deps 2, deps mtime 1600000000000000000 (VALID)
+	    ../source/a.cpp
+	    ../source/a.hpp
+
+	~~~
+
+	:param lines : The lines of output (with or without their trailing newlines)
+	'''
+	current_record: Optional[RawDepRecord] = None
+	for line in lines:
+		line = line.rstrip('\r\n')
+		if line.startswith(_NINJA_DEPS_INDENT):
+			if current_record is None:
+				raise ValueError(f'Found ninja deps dependency line before any target line: "{ line }"')
+			current_record.deps.append(Path(line[len(_NINJA_DEPS_INDENT):]))
+		elif line:
+			if current_record is not None:
+				yield current_record
+			target, separator, summary = line.rpartition(_NINJA_DEPS_HEADER_SEPARATOR)
+			if not separator:
+				raise ValueError(f'Unable to parse ninja deps target line: "{ line }"')
+			current_record = RawDepRecord(
+				target=Path(target),
+				is_valid=summary.endswith('(VALID)'),
+				deps=[],
+			)
+		elif current_record is not None:
+			yield current_record
+			current_record = None
+	if current_record is not None:
+		yield current_record
@@ -0,0 +1,261 @@
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cppbuild.command_executor import CommandExecutor, num_remaining
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+
+# The name of the file in each cache entry that holds the result's metadata
+_RESULT_FILENAME = 'result.json'
+
+# The size of the blocks in which files are read for hashing
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclasses.dataclass
+class CacheableCommandJob:
+	'''
+	A CommandJob along with the input files that determine its result and the output files that it produces
+	'''
+
+	# The job to be performed
+	job: CommandJob
+
+	# The input files on which the result depends (eg the RawDepRecord.deps), relative to the job's run_dir if relative
+	inputs: List[Path]
+
+	# The files that the job produces (eg the object file), relative to the job's run_dir if relative
+	outputs: List[Path]
+
+
+@dataclasses.dataclass
+class _CacheTicket:
+	'''
+	The associated_data with which a cache miss is run, so the result can be stored when it completes
+	'''
+
+	# The cache key under which to store the result
+	key: str
+
+	# The files that the job produces
+	outputs: List[Path]
+
+	# The job's original associated_data
+	associated_data: Any
+
+
+class ResultCache:
+	'''
+	A local, content-addressed cache of the results (returncode, stdout, stderr and output files) of successful commands
+
+	Each result is keyed on the command, its run_dir and the content hashes of its inputs.
+	'''
+
+	def __init__(self, cache_dir: Path):
+		'''
+		Ctor
+
+		:param cache_dir : The directory in which to store the cache entries (created if necessary)
+		'''
+		self._cache_dir = cache_dir
+		self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+		# The content hashes of files that have already been hashed, keyed on the path and the stat signature
+		self._hash_of_file: Dict[Tuple[str, int, int], str] = {}
+
+	def _file_hash(self, path: Path) -> str:
+		'''
+		The SHA-256 of the content of the specified file (memoized on the path, mtime and size)
+
+		:param path : The file to hash
+		'''
+		stat_result = path.stat()
+		memo_key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+		file_hash = self._hash_of_file.get(memo_key)
+		if file_hash is None:
+			hasher = hashlib.sha256()
+			with open(path, 'rb') as file_fh:
+				for block in iter(lambda: file_fh.read(_HASH_BLOCK_SIZE), b''):
+					hasher.update(block)
+			file_hash = hasher.hexdigest()
+			self._hash_of_file[memo_key] = file_hash
+		return file_hash
+
+	def key_of(self, cacheable_job: CacheableCommandJob) -> Optional[str]:
+		'''
+		The cache key of the specified job (or None if the job can't be cached because an input is missing)
+
+		:param cacheable_job : The job to key
+		'''
+		hasher = hashlib.sha256()
+		for part in cacheable_job.job.command:
+			hasher.update(part.encode() + b'\0')
+		hasher.update(b'\0' + str(cacheable_job.job.run_dir).encode() + b'\0')
+		for input_path in sorted({ str(x) for x in cacheable_job.inputs }):
+			try:
+				input_hash = self._file_hash(cacheable_job.job.run_dir / input_path)
+			except OSError:
+				return None
+			hasher.update(input_path.encode() + b'\0' + input_hash.encode() + b'\0')
+		return hasher.hexdigest()
+
+	def _entry_dir(self, key: str) -> Path:
+		'''
+		The directory of the cache entry for the specified key
+
+		:param key : The cache key
+		'''
+		return self._cache_dir / key[:2] / key
+
+	def lookup(self, key: str, cacheable_job: CacheableCommandJob) -> Optional[CommandResult]:
+		'''
+		If there's a cache entry for the specified key, restore its output files and return the stored result
+		(or return None otherwise)
+
+		:param key           : The cache key
+		:param cacheable_job : The job whose outputs should be restored
+		'''
+		entry_dir = self._entry_dir(key)
+		try:
+			with open(entry_dir / _RESULT_FILENAME) as result_fh:
+				stored_result = json.load(result_fh)
+			stdout = (entry_dir / 'stdout').read_bytes()
+			stderr = (entry_dir / 'stderr').read_bytes()
+		except (OSError, ValueError):
+			return None
+		if stored_result['num_outputs'] != len(cacheable_job.outputs):
+			return None
+
+		for index, output in enumerate(cacheable_job.outputs):
+			_copy_file_atomically(entry_dir / 'outputs' / str(index), cacheable_job.job.run_dir / output)
+
+		job = cacheable_job.job
+		return CommandResult(
+			returncode=stored_result['returncode'],
+			stdout=stdout,
+			stderr=stderr,
+			command=job.command,
+			run_dir=job.run_dir,
+			associated_data=job.associated_data,
+		)
+
+	def store(self, key: str, result: CommandResult, outputs: List[Path]) -> None:
+		'''
+		Store the specified result and output files under the specified key (if all the outputs exist)
+
+		:param key     : The cache key
+		:param result  : The result to store
+		:param outputs : The files that the command produced, relative to the result's run_dir if relative
+		'''
+		entry_dir = self._entry_dir(key)
+		if entry_dir.exists():
+			return
+		entry_dir.parent.mkdir(exist_ok=True)
+		staging_dir = Path(tempfile.mkdtemp(prefix='.staging-', dir=str(entry_dir.parent)))
+		try:
+			(staging_dir / 'outputs').mkdir()
+			for index, output in enumerate(outputs):
+				shutil.copyfile(result.run_dir / output, staging_dir / 'outputs' / str(index))
+			(staging_dir / 'stdout').write_bytes(result.stdout or b'')
+			(staging_dir / 'stderr').write_bytes(result.stderr or b'')
+			with open(staging_dir / _RESULT_FILENAME, 'w') as result_fh:
+				json.dump({ 'returncode': result.returncode, 'num_outputs': len(outputs) }, result_fh)
+			os.rename(staging_dir, entry_dir)
+		except OSError:
+			# Either an output is missing or another process has stored the same entry first
+			shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _copy_file_atomically(source: Path, destination: Path) -> None:
+	'''
+	Copy the specified file to the destination (so that it gets a fresh mtime), replacing any existing file atomically
+
+	:param source      : The file to copy
+	:param destination : The path to which it should be copied
+	'''
+	destination.parent.mkdir(parents=True, exist_ok=True)
+	temp_fd, temp_name = tempfile.mkstemp(prefix='.' + destination.name + '.', dir=str(destination.parent))
+	os.close(temp_fd)
+	try:
+		shutil.copyfile(source, temp_name)
+		os.replace(temp_name, destination)
+	except BaseException:
+		os.unlink(temp_name)
+		raise
+
+
+class CachingCommandRunner:
+	'''
+	Run CacheableCommandJobs through a CommandExecutor, skipping any whose results are in a ResultCache
+
+	On a cache hit, the outputs are restored and the stored result is passed straight to the executor's callback.
+	On a miss, the job is queued on the executor and, if it succeeds, its result is stored in the cache.
+
+	This takes over the executor's callback (and calls the original callback for every result).
+	'''
+
+	def __init__(self, *, executor: CommandExecutor, cache: ResultCache):
+		'''
+		Ctor
+
+		:param executor : The executor on which to run the cache misses
+		:param cache    : The cache to use
+		'''
+		self._executor = executor
+		self._cache = cache
+		self._callback = executor.callback
+		executor.callback = self._handle_result
+
+		# The number of jobs that were cache hits and misses
+		self.num_hits: int = 0
+		self.num_misses: int = 0
+
+	def extend_queue(self, cacheable_jobs: Iterable[CacheableCommandJob]) -> None:
+		'''
+		Report the cache hits amongst the specified jobs and queue the rest on the executor
+
+		:param cacheable_jobs : The jobs to run
+		'''
+		jobs_to_run: List[CommandJob] = []
+		for cacheable_job in cacheable_jobs:
+			key = self._cache.key_of(cacheable_job)
+			cached_result = None if key is None else self._cache.lookup(key, cacheable_job)
+			if cached_result is not None:
+				self.num_hits += 1
+				self._callback(result=cached_result, num_remaining_commands=num_remaining(self._executor))
+				continue
+
+			self.num_misses += 1
+			if key is None:
+				jobs_to_run.append(cacheable_job.job)
+			else:
+				jobs_to_run.append(dataclasses.replace(
+					cacheable_job.job,
+					associated_data=_CacheTicket(
+						key=key,
+						outputs=cacheable_job.outputs,
+						associated_data=cacheable_job.job.associated_data,
+					),
+				))
+		self._executor.extend_queue(jobs_to_run)
+
+	def _handle_result(self, *, result: CommandResult, num_remaining_commands: int) -> None:
+		'''
+		Store the result of a cache miss (if successful) and pass it on to the original callback
+
+		:param result                 : The result of the command execution
+		:param num_remaining_commands : The number of remaining commands
+		'''
+		ticket = result.associated_data
+		if isinstance(ticket, _CacheTicket):
+			result.associated_data = ticket.associated_data
+			if result.returncode == 0 and not result.cancelled:
+				self._cache.store(ticket.key, result, ticket.outputs)
+		self._callback(result=result, num_remaining_commands=num_remaining_commands)
@@ -0,0 +1,211 @@
+import os
+import resource
+import subprocess
+import time
+
+from typing import Callable, Optional
+
+from cppbuild.process_reaping import reap_if_exited, send_signal, wait_for_exit_without_reaping
+from cppbuild.self_draining_popen import DrainedByteStreams
+from cppbuild.wakeup_selector import WakeupSelector
+
+# The maximum number of bytes to read from a pipe each time it's ready
+_READ_CHUNK_SIZE = 65536
+
+
+class SelectorDrainingPopen:
+	'''
+	Do like SelfDrainingPopen but drain the stdout/stderr streams via a (shared) WakeupSelector rather than threads
+
+	The streams are only drained while the WakeupSelector is being waited on, so all the jobs registered with
+	one WakeupSelector are drained by whichever single thread calls its wait().
+
+	Where os.pidfd_open() is available, the process's exit is also observed via the selector.
+	'''
+
+	def __init__(self,
+	             *args,
+	             wakeup_selector: WakeupSelector,
+	             on_complete: Optional[Callable[[], None]] = None,
+	             max_bytes_in_memory: Optional[int] = None,
+	             **kwargs):
+		'''
+		Construct with arguments as for Popen(), except stderr/stdout may not be specified because
+		this specifies them as subprocess.PIPE and then registers them with the wakeup_selector to drain them.
+
+		:param wakeup_selector : The WakeupSelector via which the streams should be drained
+		:param on_complete     : (optional) A function to call (from the WakeupSelector's wait()) once both streams
+		                         have been drained and the process has exited, ie once poll() will return the returncode.
+		                         The process isn't reaped before this is called.
+		:param max_bytes_in_memory : (optional) The maximum number of bytes of each stream to keep in memory
+		                             (or None for no limit); see DrainedByteStream
+		'''
+		if 'stderr' in kwargs or 'stdout' in kwargs:
+			raise ValueError('stderr/stdout should not be specified to SelectorDrainingPopen constructor')
+		self._popen = subprocess.Popen(
+			*args,
+			**kwargs,
+			stderr=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+		) # type: ignore[call-overload]
+
+		# The time.monotonic() times at which the process was started and at which its completion was observed
+		self._start_time: float = time.monotonic()
+		self._end_time: Optional[float] = None
+
+		# The resource usage of the process, once it has been reaped
+		self._rusage: Optional[resource.struct_rusage] = None
+
+		self._wakeup_selector = wakeup_selector
+		self._on_complete = on_complete
+
+		# Create DrainedByteStreams to which the Popen stderr/stdout can be drained
+		self._drained_bytes = DrainedByteStreams(max_bytes_in_memory=max_bytes_in_memory)
+
+		# The number of streams still being drained
+		self._num_undrained_streams: int = 2
+
+		# Register each of ( stderr, stdout ) to be drained when it is ready
+		for stream, append_bytes_fn in (
+				(self._popen.stderr, DrainedByteStreams.append_to_stderr),
+				(self._popen.stdout, DrainedByteStreams.append_to_stdout),
+		):
+			assert stream is not None
+			os.set_blocking(stream.fileno(), False)
+			wakeup_selector.register(stream, self._make_drain_fn(stream, append_bytes_fn))
+
+		# If possible, open a pidfd for the process (which becomes readable when the process exits)
+		# and register it with the selector
+		self._pidfd: Optional[int] = None
+		if hasattr(os, 'pidfd_open'):
+			try:
+				self._pidfd = os.pidfd_open(self._popen.pid) # type: ignore[attr-defined]
+			except OSError:
+				self._pidfd = None
+		if self._pidfd is not None:
+			wakeup_selector.register(self._pidfd, self._handle_exit)
+
+	def _make_drain_fn(self, stream, append_bytes_fn: Callable[[DrainedByteStreams, bytes], None]) -> Callable[[], None]:
+		'''
+		Make a function to drain whatever is currently available from the specified stream,
+		handling the end of the stream if that has been reached
+
+		:param stream          : The stream to drain
+		:param append_bytes_fn : The DrainedByteStreams function with which to store the drained bytes
+		'''
+		def drain_available_output() -> None:
+			try:
+				read_bytes = os.read(stream.fileno(), _READ_CHUNK_SIZE)
+			except BlockingIOError:
+				return
+			if len(read_bytes):
+				append_bytes_fn(self._drained_bytes, read_bytes)
+				return
+
+			self._wakeup_selector.unregister(stream)
+			stream.close()
+			self._num_undrained_streams -= 1
+			if self._num_undrained_streams == 0:
+				if self._pidfd is None:
+					# Without a pidfd, there's no way to be woken on exit so wait here
+					# (the process has closed its streams so it's almost certainly exiting)
+					wait_for_exit_without_reaping(self._popen)
+				self._notify_if_complete()
+
+		return drain_available_output
+
+	def _handle_exit(self) -> None:
+		'''
+		Handle the pidfd becoming readable, which indicates the process has exited
+		'''
+		assert self._pidfd is not None
+		self._wakeup_selector.unregister(self._pidfd)
+		os.close(self._pidfd)
+		self._pidfd = -1
+		self._notify_if_complete()
+
+	def _notify_if_complete(self) -> None:
+		'''
+		Call on_complete if the streams have been drained and the process has exited
+		'''
+		process_has_exited = self._pidfd is None or self._pidfd < 0
+		if self._num_undrained_streams == 0 and process_has_exited:
+			self._end_time = time.monotonic()
+			if self._on_complete is not None:
+				self._on_complete()
+
+	def poll(self):
+		'''
+		Like Popen.poll() but also require that both streams have been fully drained.
+
+		Check if child process has terminated. Set and return returncode attribute. Otherwise, return None.
+		'''
+		if self._num_undrained_streams > 0:
+			return None
+		if self._popen.returncode is None:
+			poll_result, self._rusage = reap_if_exited(self._popen)
+			if poll_result is None:
+				return None
+			if self._end_time is None:
+				self._end_time = time.monotonic()
+		return self._popen.returncode
+
+	def send_signal(self, sig: int, *, to_process_group: bool = False) -> None:
+		'''
+		Send the specified signal to the process (or to its process group) if it hasn't yet been reaped
+
+		:param sig              : The signal to send
+		:param to_process_group : Whether to signal the process group, which requires that the process was started
+		                          with start_new_session=True (so that its process group ID is its PID)
+		'''
+		send_signal(self._popen, sig, to_process_group=to_process_group)
+
+	@property
+	def returncode(self):
+		'''
+		Readonly access to returncode
+		'''
+		return self._popen.returncode
+
+	@property
+	def start_time(self) -> float:
+		'''
+		The time.monotonic() time at which the process was started
+		'''
+		return self._start_time
+
+	@property
+	def end_time(self) -> Optional[float]:
+		'''
+		The time.monotonic() time at which the process's exit was observed (or None if it hasn't been yet)
+		'''
+		return self._end_time
+
+	@property
+	def rusage(self) -> Optional[resource.struct_rusage]:
+		'''
+		The resource usage of the process (and its waited-for descendants) as reported by os.wait4()
+		(or None if the process hasn't been reaped by poll() yet)
+		'''
+		return self._rusage
+
+	@property
+	def stderr_bytes(self) -> bytes:
+		'''
+		Readonly access to stderr_bytes
+		'''
+		return self._drained_bytes.stderr
+
+	@property
+	def stdout_bytes(self) -> bytes:
+		'''
+		Readonly access to stdout_bytes
+		'''
+		return self._drained_bytes.stdout
+
+	@property
+	def drained_bytes(self) -> DrainedByteStreams:
+		'''
+		Readonly access to the DrainedByteStreams (eg to retrieve any spilled output)
+		'''
+		return self._drained_bytes
@@ -1,22 +1,162 @@
 import io
+import shutil
+import resource
 import subprocess
+import tempfile
 import threading
+import time
 
-from dataclasses import dataclass
-from typing import Callable, List
+from typing import IO, Callable, List, Optional
+
+from cppbuild.process_reaping import reap_if_exited, send_signal, wait_for_exit_without_reaping
+
+
+class DrainedByteStream:
+	'''
+	Storage for the bytes being drained from one stream
+
+	The bytes are accumulated as a list of chunks, which are only joined when the value is first requested.
+
+	If max_bytes_in_memory is specified and the stream exceeds it, only the head and tail are kept in memory
+	(max_bytes_in_memory / 2 bytes each) and the middle is spilled to an anonymous temporary file.
+	The value then holds the head and tail separated by a note of the number of bytes elided,
+	and the full output can be retrieved with write_to().
+	'''
+
+	def __init__(self, *, max_bytes_in_memory: Optional[int] = None):
+		'''
+		Ctor
+
+		:param max_bytes_in_memory : (optional) The maximum number of bytes to keep in memory (or None for no limit)
+		'''
+		if max_bytes_in_memory is not None and max_bytes_in_memory < 2:
+			raise ValueError(f'DrainedByteStream max_bytes_in_memory must be at least 2 (got {max_bytes_in_memory})')
+
+		# The maximum number of bytes to keep in memory, or None for no limit
+		self._max_bytes_in_memory: Optional[int] = max_bytes_in_memory
+
+		# The chunks of bytes received so far (or, after spilling has started, the head)
+		self._chunks: List[bytes] = []
+
+		# The total number of bytes received so far
+		self._num_bytes: int = 0
+
+		# The tail bytes and the file to which the middle bytes are spilled (only used after spilling has started)
+		self._tail: bytearray = bytearray()
+		self._spill_file: Optional[IO[bytes]] = None
+		self._num_spilled_bytes: int = 0
+
+	def __del__(self):
+		'''Close any spill file when this is destroyed'''
+		self.close()
+
+	def close(self) -> None:
+		'''
+		Close any spill file (after which write_to() can no longer retrieve the spilled bytes)
+		'''
+		if self._spill_file is not None:
+			self._spill_file.close()
+
+	def append(self, new_bytes: bytes) -> None:
+		'''
+		Append the specified bytes
+
+		:param new_bytes : The bytes to append
+		'''
+		self._num_bytes += len(new_bytes)
+		if self._spill_file is None:
+			self._chunks.append(new_bytes)
+			if self._max_bytes_in_memory is None or self._num_bytes <= self._max_bytes_in_memory:
+				return
+			self._start_spilling()
+		else:
+			self._tail += new_bytes
+		self._spill_excess_tail()
+
+	def _start_spilling(self) -> None:
+		'''
+		Split the chunks received so far into the head and the tail and start spilling to a temporary file
+		'''
+		assert self._max_bytes_in_memory is not None
+		head_size = self._max_bytes_in_memory // 2
+		all_bytes = b''.join(self._chunks)
+		self._chunks = [all_bytes[:head_size]]
+		self._tail = bytearray(all_bytes[head_size:])
+		self._spill_file = tempfile.TemporaryFile(prefix='martha-spilled-output-')
+
+	def _spill_excess_tail(self) -> None:
+		'''
+		Move any bytes beyond the tail's size limit from the front of the tail to the spill file
+		'''
+		assert self._max_bytes_in_memory is not None and self._spill_file is not None
+		tail_size = self._max_bytes_in_memory - self._max_bytes_in_memory // 2
+		num_excess_bytes = len(self._tail) - tail_size
+		if num_excess_bytes > 0:
+			self._spill_file.write(self._tail[:num_excess_bytes])
+			del self._tail[:num_excess_bytes]
+			self._num_spilled_bytes += num_excess_bytes
+
+	@property
+	def num_bytes(self) -> int:
+		'''
+		The total number of bytes received (including any that have been spilled)
+		'''
+		return self._num_bytes
+
+	@property
+	def num_spilled_bytes(self) -> int:
+		'''
+		The number of bytes that have been spilled to the temporary file rather than kept in memory
+		'''
+		return self._num_spilled_bytes
+
+	@property
+	def value(self) -> bytes:
+		'''
+		The bytes received (with the middle elided if spilling has occurred)
+		'''
+		if len(self._chunks) > 1:
+			self._chunks = [b''.join(self._chunks)]
+		head = self._chunks[0] if self._chunks else b''
+		if self._spill_file is None:
+			return head
+		elision_note = f'\n[... {self._num_spilled_bytes} bytes elided ...]\n'.encode()
+		return head + elision_note + bytes(self._tail)
+
+	def write_to(self, out_file: IO[bytes]) -> None:
+		'''
+		Write all the bytes received (including any that have been spilled) to the specified file
+
+		:param out_file : The binary file to which the bytes should be written
+		'''
+		for chunk in self._chunks:
+			out_file.write(chunk)
+		if self._spill_file is not None:
+			self._spill_file.flush()
+			self._spill_file.seek(0)
+			shutil.copyfileobj(self._spill_file, out_file)
+			self._spill_file.seek(0, io.SEEK_END)
+			out_file.write(self._tail)
 
 
-@dataclass
 class DrainedByteStreams:
 	'''
 	Storage for the stderr/stdout bytes being drained in a SelfDrainingPopen
 	'''
 
-	# The stderr bytes
-	stderr: bytes = b''
+	def __init__(self, *, max_bytes_in_memory: Optional[int] = None):
+		'''
+		Ctor
+
+		:param max_bytes_in_memory : (optional) The maximum number of bytes to keep in memory per stream
+		                             (or None for no limit); see DrainedByteStream
+		'''
 
-	# The stdout bytes
-	stdout: bytes = b''
+		# The stderr stream
+		self.stderr_stream = DrainedByteStream(max_bytes_in_memory=max_bytes_in_memory)
+
+		# The stdout stream
+		self.stdout_stream = DrainedByteStream(max_bytes_in_memory=max_bytes_in_memory)
 
 	def append_to_stderr(self, new_bytes: bytes) -> None:
 		'''
@@ -24,15 +164,29 @@ class DrainedByteStreams:
 
 		:param new_bytes: The bytes to append
 		'''
-		self.stderr += new_bytes
+		self.stderr_stream.append(new_bytes)
 
 	def append_to_stdout(self, new_bytes: bytes) -> None:
 		'''
-		Append the specified bytes to the stderr bytes
+		Append the specified bytes to the stdout bytes
 
 		:param new_bytes: The bytes to append
 		'''
-		self.stdout += new_bytes
+		self.stdout_stream.append(new_bytes)
+
+	@property
+	def stderr(self) -> bytes:
+		'''
+		The stderr bytes
+		'''
+		return self.stderr_stream.value
+
+	@property
+	def stdout(self) -> bytes:
+		'''
+		The stdout bytes
+		'''
+		return self.stdout_stream.value
 
 
 class SelfDrainingPopen:
@@ -40,10 +194,20 @@ class SelfDrainingPopen:
 	Do like Popen but use threading.Threads to drain the stdout/stderr streams
 	'''
 
-	def __init__(self, *args, **kwargs):
+	def __init__(self,
+	             *args,
+	             on_complete: Optional[Callable[[], None]] = None,
+	             max_bytes_in_memory: Optional[int] = None,
+	             **kwargs):
 		'''
 		Construct with arguments as for Popen(), except stderr/stdout may not be specified because
 		this specifies them as subprocess.PIPE and then creates threads to drain them.
+
+		:param on_complete : (optional) A function to call (from a draining thread) once both streams have been
+		                     drained and the process has exited, ie once poll() will return the returncode.
+		                     The process isn't reaped before this is called.
+		:param max_bytes_in_memory : (optional) The maximum number of bytes of each stream to keep in memory
+		                             (or None for no limit); see DrainedByteStream
 		'''
 		if 'stderr' in kwargs or 'stdout' in kwargs:
 			raise ValueError('stderr/stdout should not be specified to SelfDrainingPopen constructor')
@@ -54,10 +218,22 @@ class SelfDrainingPopen:
 			stdout=subprocess.PIPE,
 		) # type: ignore[call-overload]
 
+		# The time.monotonic() times at which the process was started and at which its completion was observed
+		self._start_time: float = time.monotonic()
+		self._end_time: Optional[float] = None
+
+		# The resource usage of the process, once it has been reaped
+		self._rusage: Optional[resource.struct_rusage] = None
+
 		# Create DrainedByteStreams to which the Popen stderr/stdout can be drained
-		self._drained_bytes = DrainedByteStreams()
+		self._drained_bytes = DrainedByteStreams(max_bytes_in_memory=max_bytes_in_memory)
+
+		# The number of streams still being drained (guarded by the lock)
+		self._num_undrained_streams: int = 2
+		self._num_undrained_streams_lock = threading.Lock()
 
 		# Create a function to run in a thread to drain a stream
+		# (and, in whichever thread finishes last, to wait for the process to exit and then call on_complete)
 		def drain_output(buffer_stream: io.BufferedReader,
 		                 append_bytes_fn: Callable[[DrainedByteStreams, bytes], None],
 		                 ):
@@ -66,6 +242,14 @@ class SelfDrainingPopen:
 				append_bytes_fn( self._drained_bytes, read_bytes )
 				read_bytes = buffer_stream.read()
 
+			with self._num_undrained_streams_lock:
+				self._num_undrained_streams -= 1
+				is_last_to_finish = self._num_undrained_streams == 0
+			if is_last_to_finish and on_complete is not None:
+				wait_for_exit_without_reaping(self._popen)
+				self._end_time = time.monotonic()
+				on_complete()
+
 		# Create a thread to drain each of ( stderr, stdout )
 		self._drainer_threads: List[threading.Thread] = list(map(
 			lambda x: threading.Thread(target=drain_output, args=x),
@@ -82,16 +266,30 @@ class SelfDrainingPopen:
 
 	def poll(self):
 		'''
-		Like Popen.poll() but also require that draining threads are finished.
+		Like Popen.poll() but also require that both streams have been fully drained.
 
 		Check if child process has terminated. Set and return returncode attribute. Otherwise, return None.
 		'''
-		poll_result = self._popen.poll()
-		if poll_result is None:
-			return None
-		if any(x.is_alive() for x in self._drainer_threads):
-			return None
-		return poll_result
+		if self._popen.returncode is None:
+			poll_result, self._rusage = reap_if_exited(self._popen)
+			if poll_result is None:
+				return None
+			if self._end_time is None:
+				self._end_time = time.monotonic()
+		with self._num_undrained_streams_lock:
+			if self._num_undrained_streams > 0:
+				return None
+		return self._popen.returncode
+
+	def send_signal(self, sig: int, *, to_process_group: bool = False) -> None:
+		'''
+		Send the specified signal to the process (or to its process group) if it hasn't yet been reaped
+
+		:param sig              : The signal to send
+		:param to_process_group : Whether to signal the process group, which requires that the process was started
+		                          with start_new_session=True (so that its process group ID is its PID)
+		'''
+		send_signal(self._popen, sig, to_process_group=to_process_group)
 
 	@property
 	def returncode(self):
@@ -100,6 +298,28 @@ class SelfDrainingPopen:
 		'''
 		return self._popen.returncode
 
+	@property
+	def start_time(self) -> float:
+		'''
+		The time.monotonic() time at which the process was started
+		'''
+		return self._start_time
+
+	@property
+	def end_time(self) -> Optional[float]:
+		'''
+		The time.monotonic() time at which the process's exit was observed (or None if it hasn't been yet)
+		'''
+		return self._end_time
+
+	@property
+	def rusage(self) -> Optional[resource.struct_rusage]:
+		'''
+		The resource usage of the process (and its waited-for descendants) as reported by os.wait4()
+		(or None if the process hasn't been reaped by poll() yet)
+		'''
+		return self._rusage
+
 	@property
 	def stderr_bytes(self) -> bytes:
 		'''
@@ -113,3 +333,10 @@ class SelfDrainingPopen:
 		Readonly access to stdout_bytes
 		'''
 		return self._drained_bytes.stdout
+
+	@property
+	def drained_bytes(self) -> DrainedByteStreams:
+		'''
+		Readonly access to the DrainedByteStreams (eg to retrieve any spilled output)
+		'''
+		return self._drained_bytes
@@ -0,0 +1,285 @@
+'''
+Plan unity (aka jumbo) builds: group the compile commands of a build that share identical flags and most of their
+headers into batches, each compiled as one generated source that #includes the batch's sources, so that the
+shared headers are parsed once per batch rather than once per source
+
+Run on a ninja build directory (which reads the compdb via ninja and .ninja_deps directly):
+
+    python -m cppbuild.unity_build path/to/build path/to/unity-dir --max-batch-size 8 --run
+'''
+
+import argparse
+import os
+import shlex
+import sys
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from cppbuild.command_executor import CommandExecutor, finish_all
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+from cppbuild.compile_flags import without_output_flags
+from cppbuild.include_sets import IncludeSets, popcount
+from cppbuild.ninja_call import NinjaCompDBRecord, get_ninja_compdb_for_dir
+from cppbuild.ninja_logs import dep_graph_of_ninja_deps_log, read_ninja_deps_log
+
+
+@dataclass
+class UnityBatch:
+	'''
+	A group of compile commands to compile together as one unity source
+	'''
+
+	# The directory in which the batch's command is run
+	directory: Path
+
+	# The records of the compile commands in the batch
+	records: List[NinjaCompDBRecord]
+
+	# The compile command for the batch (the original command if the batch has one record)
+	command: List[str]
+
+	# The generated source that #includes the sources of the records (or None if the batch has one record)
+	unity_source: Optional[Path] = None
+
+	# The estimated cost of the batch (the sum of its records' costs), or None if unknown
+	estimated_cost: Optional[float] = None
+
+	def unity_source_content(self) -> str:
+		'''
+		The content of the batch's generated source
+		'''
+		return ''.join(
+			f'#include "{os.path.normpath(self.directory / x.file)}"\n'
+			for x in self.records
+		)
+
+
+def _split_compile_command(record: NinjaCompDBRecord) -> Optional[List[str]]:
+	'''
+	The parts of the specified record's command without its source file or its (dependency) output flags,
+	ie the flags that must match for records to share a batch
+	(or None if the record isn't a GCC/Clang-style compile command of its file)
+
+	:param record : The compdb record
+	'''
+	parts = shlex.split(record.command)
+	if '-c' not in parts:
+		return None
+
+	source = os.path.normpath(record.directory / record.file)
+	flag_parts: List[str] = []
+	found_source = False
+	for part in without_output_flags(parts):
+		if not found_source and not part.startswith('-') and os.path.normpath(record.directory / part) == source:
+			found_source = True
+		else:
+			flag_parts.append(part)
+	return flag_parts if found_source else None
+
+
+def _batch_command(flag_parts: List[str], unity_source: Path) -> List[str]:
+	'''
+	The command with which to compile a batch's generated source (to an object file alongside it)
+
+	:param flag_parts   : The shared flags of the batch's records (see _split_compile_command())
+	:param unity_source : The batch's generated source
+	'''
+	return flag_parts + [str(unity_source), '-o', str(unity_source.with_suffix('.o'))]
+
+
+def plan_unity_batches(compdb: Sequence[NinjaCompDBRecord],
+                       include_sets: IncludeSets,
+                       batch_dir: Path,
+                       *,
+                       max_batch_size: int = 8,
+                       max_batch_cost: Optional[float] = None,
+                       cost_of_output: Optional[Mapping[str, float]] = None,
+                       min_shared_fraction: float = 0.5,
+                       candidate_window: int = 64,
+                       ) -> List[UnityBatch]:
+	'''
+	Group the compile commands of the specified compdb into UnityBatches
+
+	Only records with identical flags, run directory and source extension share a batch (so that, eg, C and C++
+	sources are never mixed), and each batch's generated source takes that extension, from which the compiler
+	infers the language. Within each such group, records are taken in order of their sources (so that neighbouring
+	sources, which tend to share headers, are considered together):
+	each batch is seeded with the first unbatched record and then repeatedly grows by whichever of the next
+	candidate_window unbatched records has the largest fraction of its headers already in the batch, until that
+	fraction falls below min_shared_fraction or the batch reaches a limit. Header overlaps are single big-int
+	operations on the records' bitsets in the IncludeSets (whose targets are the records' outputs).
+
+	Compile records that aren't batched with any other get a batch of their own that runs the original command.
+	Records that aren't compile commands (eg links, phony edges or build-system regeneration) are left out, as they
+	depend on the outputs of others (and would link the original objects rather than the batches'), so the rest
+	of the build is left to ninja.
+
+	:param compdb              : The compdb records
+	:param include_sets        : The header sets of the records' outputs
+	:param batch_dir           : The directory in which to place the generated sources (and their objects)
+	:param max_batch_size      : The maximum number of records in a batch
+	:param max_batch_cost      : (optional) The maximum total cost of the records in a batch (or None for no limit)
+	:param cost_of_output      : (optional) The cost (eg the compile time in seconds) of each record's output
+	                             (a record without one costs 0.0)
+	:param min_shared_fraction : The minimum fraction of a record's headers that must already be in a batch to join it
+	:param candidate_window    : The number of unbatched records considered for each addition to a batch
+	'''
+	def cost_of(record: NinjaCompDBRecord) -> Optional[float]:
+		return None if cost_of_output is None else cost_of_output.get(record.output, 0.0)
+
+	batches: List[UnityBatch] = []
+	records_of_flags: Dict[Tuple[Path, str, Tuple[str, ...]], List[NinjaCompDBRecord]] = {}
+	for record in compdb:
+		flag_parts = _split_compile_command(record)
+		if flag_parts is not None:
+			records_of_flags.setdefault((record.directory, record.file.suffix, tuple(flag_parts)), []).append(record)
+
+	for (directory, source_suffix, flag_parts), records in records_of_flags.items():
+		unbatched = sorted(records, key=lambda x: os.path.normpath(directory / x.file))
+		header_bits = { x.output: include_sets.header_bits(x.output) for x in unbatched }
+		while unbatched:
+			batch_records = [unbatched.pop(0)]
+			batch_bits = header_bits[batch_records[0].output]
+			batch_cost = cost_of(batch_records[0]) or 0.0
+			while len(batch_records) < max_batch_size and unbatched:
+				best_index: Optional[int] = None
+				best_fraction = min_shared_fraction
+				for index, candidate in enumerate(unbatched[:candidate_window]):
+					if max_batch_cost is not None and batch_cost + (cost_of(candidate) or 0.0) > max_batch_cost:
+						continue
+					candidate_bits = header_bits[candidate.output]
+					num_headers = popcount(candidate_bits)
+					fraction = 0.0 if num_headers == 0 else popcount(batch_bits & candidate_bits) / num_headers
+					if fraction >= best_fraction and (best_index is None or fraction > best_fraction):
+						best_index, best_fraction = index, fraction
+				if best_index is None:
+					break
+				batch_records.append(unbatched.pop(best_index))
+				batch_bits |= header_bits[batch_records[-1].output]
+				batch_cost += cost_of(batch_records[-1]) or 0.0
+
+			if len(batch_records) == 1:
+				batches.append(UnityBatch(
+					directory=directory,
+					records=batch_records,
+					command=shlex.split(batch_records[0].command),
+					estimated_cost=cost_of(batch_records[0]),
+				))
+				continue
+			unity_source = (batch_dir / f'unity_{len(batches):05d}{source_suffix}').absolute()
+			batches.append(UnityBatch(
+				directory=directory,
+				records=batch_records,
+				command=_batch_command(list(flag_parts), unity_source),
+				unity_source=unity_source,
+				estimated_cost=None if cost_of_output is None else batch_cost,
+			))
+
+	return batches
+
+
+def write_unity_sources(batches: Sequence[UnityBatch]) -> int:
+	'''
+	Write the generated source of each of the specified batches that has one, leaving any whose content is unchanged
+	untouched (so as not to trigger needless rebuilds), and return the number of sources written
+
+	:param batches : The batches
+	'''
+	num_written = 0
+	for batch in batches:
+		if batch.unity_source is None:
+			continue
+		content = batch.unity_source_content()
+		try:
+			if batch.unity_source.read_text() == content:
+				continue
+		except OSError:
+			pass
+		batch.unity_source.parent.mkdir(parents=True, exist_ok=True)
+		batch.unity_source.write_text(content)
+		num_written += 1
+	return num_written
+
+
+def unity_batch_jobs(batches: Sequence[UnityBatch]) -> List[CommandJob]:
+	'''
+	The CommandJobs (for a CommandExecutor) that compile the specified batches, each with its batch as associated_data
+
+	:param batches : The batches
+	'''
+	return [
+		CommandJob(
+			command=batch.command,
+			run_dir=batch.directory,
+			associated_data=batch,
+			estimated_cost=batch.estimated_cost,
+		)
+		for batch in batches
+	]
+
+
+def plan_unity_batches_for_dir(ninja_build_dir: Path, batch_dir: Path, **kwargs) -> List[UnityBatch]:
+	'''
+	Plan the unity batches of the specified ninja build directory (see plan_unity_batches()), taking the compdb from
+	ninja and the header sets from its .ninja_deps
+
+	:param ninja_build_dir : The ninja build directory to process
+	:param batch_dir       : The directory in which to place the generated sources
+	:param kwargs          : Any further keyword arguments for plan_unity_batches()
+	'''
+	compdb = get_ninja_compdb_for_dir(ninja_build_dir)
+	include_sets = IncludeSets(dep_graph_of_ninja_deps_log(read_ninja_deps_log(ninja_build_dir / '.ninja_deps')))
+	return plan_unity_batches(compdb, include_sets, batch_dir, **kwargs)
+
+
+def main(args: Optional[List[str]] = None) -> int:
+	'''
+	Run the command-line interface (see the module docstring)
+
+	:param args : (optional) The command-line arguments (default: sys.argv[1:])
+	'''
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('ninja_build_dir', type=Path, help='The ninja build directory to plan')
+	parser.add_argument('batch_dir', type=Path, help='The directory in which to write the generated sources')
+	parser.add_argument('--max-batch-size', type=int, default=8, help='The maximum number of sources per batch (default: 8)')
+	parser.add_argument('--min-shared-fraction', type=float, default=0.5,
+	                    help='The minimum fraction of a source\'s headers that must be shared to join a batch (default: 0.5)')
+	parser.add_argument('--run', action='store_true', help='Compile the batches once planned')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='The number of parallel compiles')
+	parsed_args = parser.parse_args(args)
+
+	batches = plan_unity_batches_for_dir(
+		parsed_args.ninja_build_dir,
+		parsed_args.batch_dir,
+		max_batch_size=parsed_args.max_batch_size,
+		min_shared_fraction=parsed_args.min_shared_fraction,
+	)
+	num_records = sum(len(x.records) for x in batches)
+	print(f'Planned {len(batches)} compiles for {num_records} compdb records')
+	print(f'Wrote {write_unity_sources(batches)} unity sources to {parsed_args.batch_dir}')
+	if not parsed_args.run:
+		return 0
+
+	num_failed = 0
+
+	def report_result(*, result: CommandResult, num_remaining_commands: int) -> None:
+		nonlocal num_failed
+		if result.returncode != 0:
+			num_failed += 1
+			sys.stderr.buffer.write(result.stderr or b'')
+
+	executor = CommandExecutor(num_parallel_jobs=parsed_args.jobs, callback=report_result)
+	try:
+		executor.extend_queue(unity_batch_jobs(batches))
+		finish_all(executor)
+	finally:
+		executor.close()
+	print(f'{num_failed} of {len(batches)} compiles failed')
+	return 0 if num_failed == 0 else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
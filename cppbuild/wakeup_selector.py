@@ -0,0 +1,112 @@
+import os
+import selectors
+import time
+
+from typing import Any, Callable, Optional
+
+
+class WakeupSelector:
+	'''
+	Block until woken, using a selectors.DefaultSelector with a self-pipe that any thread may write to
+
+	This lets a CommandExecutor sleep until a job actually completes, rather than polling at a fixed interval.
+
+	Other file objects may also be registered with a callback, which is called from wait() (in the waiting thread)
+	whenever the file object is ready to read. This allows many pipes to be serviced by one thread.
+	'''
+
+	def __init__(self):
+		'''
+		Ctor
+		'''
+
+		# The selector on which to wait
+		self._selector = selectors.DefaultSelector()
+
+		# Create a non-blocking self-pipe and register its read end with the selector
+		self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+		os.set_blocking(self._wakeup_read_fd, False)
+		os.set_blocking(self._wakeup_write_fd, False)
+		self._selector.register(self._wakeup_read_fd, selectors.EVENT_READ)
+
+	def __del__(self):
+		'''Close the file descriptors when this is destroyed'''
+		self.close()
+
+	def close(self) -> None:
+		'''
+		Close the selector and the self-pipe (idempotent)
+		'''
+		if self._wakeup_read_fd < 0:
+			return
+		self._selector.close()
+		os.close(self._wakeup_read_fd)
+		os.close(self._wakeup_write_fd)
+		self._wakeup_read_fd = -1
+		self._wakeup_write_fd = -1
+
+	def register(self, fileobj: Any, callback: Callable[[], None]) -> None:
+		'''
+		Register the specified file object so the callback is called from wait() whenever it's ready to read
+
+		:param fileobj  : The file object (or file descriptor) to watch
+		:param callback : The function to call when the file object is ready to read
+		'''
+		self._selector.register(fileobj, selectors.EVENT_READ, callback)
+
+	def unregister(self, fileobj: Any) -> None:
+		'''
+		Stop watching the specified file object (which should be done before closing it)
+
+		:param fileobj : The file object (or file descriptor) to stop watching
+		'''
+		self._selector.unregister(fileobj)
+
+	def notify(self) -> None:
+		'''
+		Wake up any current or subsequent call to wait()
+
+		This is safe to call from any thread.
+		'''
+		try:
+			os.write(self._wakeup_write_fd, b'\0')
+		except BlockingIOError:
+			# The pipe is full of unconsumed wakeups, so the waiter will wake anyway
+			pass
+		except OSError:
+			# The selector has been closed so there's nothing to wake
+			pass
+
+	def wait(self, timeout: Optional[float] = None) -> bool:
+		'''
+		Block until notify() has been called since the previous wait() or until the timeout expires,
+		calling the callbacks of any registered file objects that become ready in the meantime
+
+		Return whether this was woken by a notify()
+
+		:param timeout : The maximum number of seconds to wait (or None to wait indefinitely)
+		'''
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while True:
+			remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+			woken = False
+			for key, _events in self._selector.select(remaining):
+				if key.data is None:
+					woken = True
+				else:
+					key.data()
+			if woken:
+				self._drain_wakeups()
+				return True
+			if deadline is not None and time.monotonic() >= deadline:
+				return False
+
+	def _drain_wakeups(self) -> None:
+		'''
+		Consume all the bytes written to the self-pipe by notify()
+		'''
+		try:
+			while os.read(self._wakeup_read_fd, 4096):
+				pass
+		except BlockingIOError:
+			pass
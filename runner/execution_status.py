@@ -1,5 +1,7 @@
 import enum
 
+from cppbuild.command_result import CommandResult
+
 
 class ExecutionStatus(enum.Enum):
 	'''
@@ -8,3 +10,15 @@ class ExecutionStatus(enum.Enum):
 	RUNNING   = enum.auto() # The command is running
 	SUCCEEDED = enum.auto() # The command has completed and succeeded
 	FAILED    = enum.auto() # The command has completed and failed
+	CANCELLED = enum.auto() # The command was cancelled before it could complete
+
+
+def execution_status_of_result(result: CommandResult) -> ExecutionStatus:
+	'''
+	The status of the command whose (completed or cancelled) result is specified
+
+	:param result : The result of the command
+	'''
+	if result.cancelled:
+		return ExecutionStatus.CANCELLED
+	return ExecutionStatus.SUCCEEDED if result.returncode == 0 else ExecutionStatus.FAILED
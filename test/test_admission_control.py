@@ -0,0 +1,98 @@
+import pytest
+
+from cppbuild.admission_control import AdmissionController, ResourceBudget, available_memory_bytes
+from cppbuild.command_executor import CommandExecutor, finish_all
+from cppbuild.command_job import CommandJob
+
+GIB = 1024 * 1024 * 1024
+
+
+def test_available_memory_bytes(tmp_path):
+	meminfo_file = tmp_path / 'meminfo'
+	meminfo_file.write_text('MemTotal:       16000000 kB\nMemAvailable:    2000000 kB\n')
+	assert available_memory_bytes(meminfo_file) == 2000000 * 1024
+	assert available_memory_bytes(tmp_path / 'does-not-exist') is None
+
+
+def test_static_budget_is_respected():
+	controller = AdmissionController(budget=ResourceBudget(memory_bytes=3 * GIB, cpus=2.0), dynamic=False)
+	heavy_job = CommandJob(command=['true'], memory_estimate=2 * GIB)
+	light_job = CommandJob(command=['true'], memory_estimate=GIB // 2)
+
+	assert controller.can_admit(heavy_job)
+	controller.admit(heavy_job)
+	assert not controller.can_admit(heavy_job)
+	assert controller.can_admit(light_job)
+	controller.admit(light_job)
+	assert not controller.can_admit(light_job)
+	controller.release(heavy_job)
+	assert controller.can_admit(heavy_job)
+
+
+def test_dynamic_throttling_on_available_memory(tmp_path):
+	meminfo_file = tmp_path / 'meminfo'
+	meminfo_file.write_text('MemAvailable:    3145728 kB\n')
+	controller = AdmissionController(memory_reserve_bytes=GIB // 2, max_load=float('inf'), meminfo_path=meminfo_file)
+	controller.refresh()
+
+	job = CommandJob(command=['true'], memory_estimate=2 * GIB)
+	assert controller.can_admit(job)
+	controller.admit(job)
+	assert not controller.can_admit(job)
+
+
+def test_refresh_keeps_admitted_jobs_memory_claimed(tmp_path):
+	meminfo_file = tmp_path / 'meminfo'
+	meminfo_file.write_text('MemAvailable:    3145728 kB\n')
+	controller = AdmissionController(meminfo_path=meminfo_file)
+	controller.refresh()
+
+	# The first job hasn't yet used any memory, so a fresh reading still shows 3 GiB available
+	first_job = CommandJob(command=['true'], memory_estimate=GIB)
+	controller.admit(first_job)
+	controller.refresh()
+	assert not controller.can_admit(CommandJob(command=['true'], memory_estimate=5 * GIB // 2))
+	assert controller.can_admit(CommandJob(command=['true'], memory_estimate=2 * GIB))
+
+	# A reading below the estimate (eg from other processes) still takes precedence
+	meminfo_file.write_text('MemAvailable:    1048576 kB\n')
+	controller.refresh()
+	assert not controller.can_admit(CommandJob(command=['true'], memory_estimate=2 * GIB))
+
+	meminfo_file.write_text('MemAvailable:    3145728 kB\n')
+	controller.release(first_job)
+	controller.refresh()
+	assert controller.can_admit(CommandJob(command=['true'], memory_estimate=5 * GIB // 2))
+
+
+def test_no_load_throttling_by_default(tmp_path):
+	controller = AdmissionController(meminfo_path=tmp_path / 'does-not-exist')
+	controller.refresh()
+	for _ in range(1000):
+		controller.admit(CommandJob(command=['true']))
+	assert controller.can_admit(CommandJob(command=['true']))
+
+
+def test_dynamic_throttling_on_load():
+	controller = AdmissionController(max_load=0.0)
+	controller.refresh()
+	assert not controller.can_admit(CommandJob(command=['true']))
+
+
+def test_command_executor_holds_back_jobs_beyond_budget():
+	results = []
+	command_executor = CommandExecutor(
+		num_parallel_jobs=3,
+		callback=lambda *, result, num_remaining_commands: results.append(result),
+		admission_controller=AdmissionController(budget=ResourceBudget(memory_bytes=3 * GIB), dynamic=False),
+	)
+	command_executor.extend_queue(
+		CommandJob(command=['sleep', '0.05'], memory_estimate=2 * GIB) for _ in range(3)
+	)
+	assert command_executor.num_running() == 1
+	finish_all(command_executor)
+
+	assert len(results) == 3
+	ordered_results = sorted(results, key=lambda x: x.start_time)
+	for earlier, later in zip(ordered_results, ordered_results[1:]):
+		assert earlier.end_time <= later.start_time
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from cppbuild.affected_targets import affected_targets, main
+from cppbuild.dep_graph import dep_graph_of_raw_dep_records, save_dep_graph
+from cppbuild.raw_dep_record import RawDepRecord
+
+PROJECT_DIR = Path('/project')
+BUILD_DIR = PROJECT_DIR / 'build'
+
+EG_RECORDS = [
+	RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('../src/a.cpp'), Path('../src/common.hpp')]),
+	RawDepRecord(target=Path('b.o'), is_valid=True, deps=[Path('../src/b.cpp'), Path('../src/common.hpp')]),
+	RawDepRecord(target=Path('c.o'), is_valid=True, deps=[Path('../src/c.cpp'), Path('/usr/include/vector')]),
+]
+
+
+def _eg_graph():
+	return dep_graph_of_raw_dep_records(
+		EG_RECORDS,
+		key_of_dep=lambda dep: str(Path('/project/src') / dep.name) if dep.parts[0] == '..' else str(dep),
+	)
+
+
+def test_affected_targets():
+	result = affected_targets(
+		_eg_graph(),
+		[Path('src/common.hpp'), Path('src/c.cpp'), Path('README.md')],
+		base_dir=PROJECT_DIR,
+	)
+	assert result.targets == ['a.o', 'b.o', 'c.o']
+	assert result.unknown_files == ['README.md']
+
+
+def test_affected_targets_normalizes_changed_paths():
+	result = affected_targets(_eg_graph(), [Path('../src/./b.cpp')], base_dir=BUILD_DIR)
+	assert result.targets == ['b.o']
+	assert result.unknown_files == []
+
+
+def test_main_query(tmp_path, capsys):
+	save_dep_graph(_eg_graph(), tmp_path / 'deps.index')
+	assert main(['query', '--base-dir', '/', str(tmp_path / 'deps.index'), 'usr/include/vector']) == 0
+	assert capsys.readouterr().out == 'c.o\n'
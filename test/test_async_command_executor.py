@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+
+from pathlib import Path
+from typing import List
+
+from command_helper import BIG_SEQ_VALUE, bytes_of_seq_value
+from cppbuild.async_command_executor import AsyncCommandExecutor, run_all
+from cppbuild.command_executor import CommandJob
+from cppbuild.command_result import CommandResult
+
+
+def test_run_calls_callback_for_each_job():
+	NUM_JOBS = 6
+	stash: List[CommandResult] = []
+	remaining_counts: List[int] = []
+
+	def stash_result(*, result: CommandResult, num_remaining_commands: int):
+		stash.append(result)
+		remaining_counts.append(num_remaining_commands)
+
+	executor = AsyncCommandExecutor(num_parallel_jobs=3, callback=stash_result)
+	asyncio.run(executor.run(
+		CommandJob(command=['ls', str(Path(__file__).resolve().parent)], associated_data=x) for x in range(NUM_JOBS)
+	))
+
+	assert [x.returncode for x in stash] == [0] * NUM_JOBS
+	assert all(__name__ in x.stdout.decode() for x in stash)
+	assert sorted(x.associated_data for x in stash) == list(range(NUM_JOBS))
+	assert remaining_counts[-1] == 0
+	assert executor.num_running() == 0 and executor.num_in_queue() == 0
+
+
+def test_results_are_yielded_in_completion_order():
+	results = asyncio.run(run_all(
+		[
+			CommandJob(command=['sleep', '0.3'], associated_data='slow'),
+			CommandJob(command=['true'],         associated_data='fast'),
+		],
+		num_parallel_jobs=2,
+	))
+	assert [x.associated_data for x in results] == ['fast', 'slow']
+
+
+def test_command_with_lot_of_output_and_failure():
+	results = asyncio.run(run_all(
+		[
+			CommandJob(command=['seq', str(BIG_SEQ_VALUE)]),
+			CommandJob(command=['ls', '/file/that/does/not/exist']),
+		],
+		num_parallel_jobs=1,
+	))
+	assert results[0].stdout == bytes_of_seq_value(BIG_SEQ_VALUE)
+	assert results[1].returncode != 0
+	assert b'/file/that/does/not/exist' in results[1].stderr
+
+
+def test_raises_on_non_positive_num_parallel_jobs():
+	with pytest.raises(ValueError):
+		AsyncCommandExecutor(num_parallel_jobs=0)
+
+
+def test_raises_for_nonexistent_command():
+	async def run_with_timeout():
+		await asyncio.wait_for(
+			run_all(
+				[
+					CommandJob(command=['sleep', '10']),
+					CommandJob(command=['/no/such/binary']),
+				],
+				num_parallel_jobs=2,
+			),
+			timeout=5.0,
+		)
+
+	with pytest.raises(FileNotFoundError):
+		asyncio.run(run_with_timeout())
+
+
+def test_drops_unstarted_jobs_after_failure():
+	executor = AsyncCommandExecutor(num_parallel_jobs=1)
+	with pytest.raises(FileNotFoundError):
+		asyncio.run(executor.run([
+			CommandJob(command=['/no/such/binary']),
+			CommandJob(command=['true'], associated_data='left over'),
+		]))
+	assert executor.num_in_queue() == 0
+
+	results: List[CommandResult] = []
+	executor.callback = lambda *, result, num_remaining_commands: results.append(result)
+	asyncio.run(executor.run([CommandJob(command=['true'], associated_data='next')]))
+	assert [x.associated_data for x in results] == ['next']
+
+
+def test_raises_on_concurrent_runs():
+	executor = AsyncCommandExecutor(num_parallel_jobs=1)
+
+	async def run_whilst_running() -> List[CommandResult]:
+		results = []
+		async for result in executor.iter_results([CommandJob(command=['true'], associated_data=x) for x in range(2)]):
+			with pytest.raises(RuntimeError):
+				await executor.run([CommandJob(command=['true'], associated_data='concurrent')])
+			results.append(result)
+		return results
+
+	assert sorted(x.associated_data for x in asyncio.run(run_whilst_running())) == [0, 1]
+	assert executor.num_running() == 0 and executor.num_in_queue() == 0
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from pathlib import Path
+
+from cppbuild.async_command_executor import AsyncCommandExecutor
+from cppbuild.chrome_trace import ChromeTraceWriter
+from cppbuild.command_executor import CommandExecutor, CommandJob, finish_all
+from cppbuild.command_result import CommandResult
+
+
+def test_chrome_trace_writer_records_each_job_in_its_slot_lane(tmp_path):
+	trace_path = tmp_path / 'trace.json'
+	with ChromeTraceWriter(trace_path, name_of_result=lambda result: f'job {result.associated_data}') as trace_writer:
+		command_executor = CommandExecutor(num_parallel_jobs=2, callback=trace_writer.record_command_result)
+		command_executor.extend_queue([
+			CommandJob(command=['sh', '-c', f'sleep 0.05; exit {x % 2}'], associated_data=x)
+			for x in range(4)
+		])
+		finish_all(command_executor)
+		command_executor.close()
+
+	events = json.loads(trace_path.read_text())
+	job_events = sorted((x for x in events if x['ph'] == 'X'), key=lambda x: x['name'])
+	assert [x['name'] for x in job_events] == ['job 0', 'job 1', 'job 2', 'job 3']
+	assert { x['tid'] for x in job_events } == { 0, 1 }
+	assert [x['args']['returncode'] for x in job_events] == [0, 1, 0, 1]
+	assert [x['cat'] for x in job_events] == ['job', 'job,failed', 'job', 'job,failed']
+	assert job_events[0]['args']['command'] == "sh -c 'sleep 0.05; exit 0'"
+	assert all(x['ts'] >= 0 and x['dur'] >= 50000 for x in job_events)
+
+	# The jobs in each lane don't overlap
+	for tid in (0, 1):
+		lane_events = sorted((x for x in job_events if x['tid'] == tid), key=lambda x: x['ts'])
+		assert all(a['ts'] + a['dur'] <= b['ts'] for a, b in zip(lane_events, lane_events[1:]))
+
+	lane_names = { x['tid']: x['args']['name'] for x in events if x['name'] == 'thread_name' }
+	assert lane_names == { 0: 'slot 0', 1: 'slot 1' }
+
+
+def test_chrome_trace_writer_skips_unstarted_results(tmp_path):
+	trace_path = tmp_path / 'trace.json'
+	trace_writer = ChromeTraceWriter(trace_path, origin_time=10.0)
+	trace_writer.record(CommandResult(command=['c++'], cancelled=True))
+	trace_writer.record(CommandResult(command=['/usr/bin/c++', '-c', 'a.cpp'], start_time=11.0, end_time=11.5))
+	trace_writer.close()
+	trace_writer.close()
+
+	events = json.loads(trace_path.read_text())
+	assert len(events) == trace_writer.num_events
+	job_event, = [x for x in events if x['ph'] == 'X']
+	assert job_event['name'] == 'c++'
+	assert job_event['ts'] == 1e6 and job_event['dur'] == 5e5
+	assert job_event['tid'] == -1
+
+
+def test_chrome_trace_writer_records_async_jobs_in_worker_lanes(tmp_path):
+	trace_path = tmp_path / 'trace.json'
+	with ChromeTraceWriter(trace_path) as trace_writer:
+		executor = AsyncCommandExecutor(num_parallel_jobs=2, callback=trace_writer.record_command_result)
+		asyncio.run(executor.run(CommandJob(command=['sleep', '0.05']) for _ in range(4)))
+
+	job_events = [x for x in json.loads(trace_path.read_text()) if x['ph'] == 'X']
+	assert len(job_events) == 4
+	assert { x['tid'] for x in job_events } == { 0, 1 }
+	for tid in (0, 1):
+		lane_events = sorted((x for x in job_events if x['tid'] == tid), key=lambda x: x['ts'])
+		assert all(a['ts'] + a['dur'] <= b['ts'] for a, b in zip(lane_events, lane_events[1:]))
+
+
+def test_chrome_trace_writer_flushes_each_event(tmp_path):
+	trace_path = tmp_path / 'trace.json'
+	trace_writer = ChromeTraceWriter(trace_path, origin_time=10.0)
+	trace_writer.record(CommandResult(command=['c++'], start_time=11.0, end_time=11.5))
+
+	# An interrupted run leaves the events written so far, lacking only the closing bracket
+	events = json.loads(trace_path.read_text() + ']')
+	assert len(events) == trace_writer.num_events
+	assert [x['name'] for x in events if x['ph'] == 'X'] == ['c++']
+	trace_writer.close()
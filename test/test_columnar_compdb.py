@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from pathlib import Path
+
+from cppbuild.columnar_compdb import columnar_compdb_of_compdb_lines, columnar_compdb_of_compdb_str, iter_compdb_dicts
+from cppbuild.ninja_call import compdb_of_compdb_str, project_dir_of_compdb
+
+EG_COMPDB_DICTS = [
+	{
+		'directory': '/project/build',
+		'command': '/usr/bin/c++ -DA -I../include -O2 -o source/a.o -c ../source/a.cpp',
+		'file': '../source/a.cpp',
+		'output': 'source/a.o',
+	},
+	{
+		'directory': '/project/build',
+		'command': '/usr/bin/c++ -DA -I../include -O2 -o source/b.o -c ../source/b.cpp',
+		'file': '../source/b.cpp',
+		'output': 'source/b.o',
+	},
+	{
+		'directory': '/project/build',
+		'command': '',
+		'file': 'some-exe',
+		'output': 'source/all',
+	},
+	{
+		'directory': '/project/build',
+		'command': '/usr/bin/cmake -S/project -B/project/build',
+		'file': '../CMakeLists.txt',
+		'output': 'build.ninja',
+	},
+]
+
+EG_COMPDB_STR = json.dumps(EG_COMPDB_DICTS, indent='\t')
+
+
+def test_iter_compdb_dicts_streams_lines():
+	assert list(iter_compdb_dicts(EG_COMPDB_STR.splitlines(keepends=True))) == EG_COMPDB_DICTS
+	assert list(iter_compdb_dicts([EG_COMPDB_STR])) == EG_COMPDB_DICTS
+	assert list(iter_compdb_dicts(EG_COMPDB_STR)) == EG_COMPDB_DICTS
+	assert list(iter_compdb_dicts(['[', ']'])) == []
+
+
+@pytest.mark.parametrize('bad_str', ['', '{}', '[{"a": 1}', '[{"a": 1}] x', '[{"a": }]'])
+def test_iter_compdb_dicts_raises_on_bad_json(bad_str):
+	with pytest.raises(ValueError):
+		list(iter_compdb_dicts([bad_str]))
+
+
+def test_columnar_compdb_matches_compdb():
+	columnar_compdb = columnar_compdb_of_compdb_str(EG_COMPDB_STR)
+	assert len(columnar_compdb) == 4
+	assert list(columnar_compdb) == compdb_of_compdb_str(EG_COMPDB_STR)
+	assert columnar_compdb[-1].output == 'build.ninja'
+	assert project_dir_of_compdb(columnar_compdb) == Path('/project')
+
+
+def test_columnar_compdb_shares_directories_and_command_prefixes():
+	columnar_compdb = columnar_compdb_of_compdb_str(EG_COMPDB_STR)
+	assert columnar_compdb.num_distinct_command_prefixes() == 3
+	assert columnar_compdb.directory(0) is columnar_compdb.directory(1)
+	assert columnar_compdb.command(1) == EG_COMPDB_DICTS[1]['command']
+	assert columnar_compdb.file_str(1) == '../source/b.cpp'
+	assert columnar_compdb.directory_str(3) == '/project/build'
+
+
+EG_ESCAPED_COMPDB_DICTS = EG_COMPDB_DICTS + [{
+	'directory': '/project/build',
+	'command': '/usr/bin/c++ -DNAME=\\"a \\\\ b\\": "c" -o source/c.o -c ../source/c.cpp',
+	'file': '../source/c.cpp',
+	'output': 'source/c.o',
+}]
+
+
+@pytest.mark.parametrize('compdb_str', [
+	json.dumps(EG_ESCAPED_COMPDB_DICTS, indent=2),
+	json.dumps(EG_ESCAPED_COMPDB_DICTS),
+	json.dumps(EG_ESCAPED_COMPDB_DICTS, indent=2).replace('"file": "../source/b.cpp",\n', '"file": "../source/b.cpp", '),
+	'\n' + json.dumps(EG_ESCAPED_COMPDB_DICTS, indent='\t') + '\n\n',
+])
+def test_columnar_compdb_of_compdb_lines_matches_json(compdb_str):
+	expected_compdb = compdb_of_compdb_str(compdb_str)
+	assert list(columnar_compdb_of_compdb_lines(compdb_str.splitlines(keepends=True))) == expected_compdb
+	assert list(columnar_compdb_of_compdb_str(compdb_str)) == expected_compdb
+
+
+@pytest.mark.parametrize('bad_str', [
+	'',
+	'[\n',
+	'[\n{\n"directory": "/p",\n',
+	'[\n]\n[\n',
+	'{\n}\n',
+	'[\n{\n"directory": "/p",\n"command": "x",\n"file": "f",\n"output": "o"\n}\n',
+])
+def test_columnar_compdb_of_compdb_lines_raises_on_bad_json(bad_str):
+	with pytest.raises(ValueError):
+		columnar_compdb_of_compdb_lines(bad_str.splitlines(keepends=True))
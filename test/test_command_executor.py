@@ -1,12 +1,16 @@
 import datetime
+import os
 import pytest
+import signal
+import threading
 import time
 
 from pathlib import Path
 from typing import List, Any
 
 from command_helper import BIG_SEQ_VALUE, bytes_of_seq_value
-from cppbuild.command_executor import CommandExecutor, CommandJob, finish_all, all_are_finished
+from cppbuild.admission_control import AdmissionController, ResourceBudget
+from cppbuild.command_executor import CommandExecutor, CommandJob, DrainMode, all_are_finished, finish_all, terminate_on_signals
 from cppbuild.command_result import CommandResult
 
 
@@ -54,6 +58,31 @@ def test_finish_all():
 	assert datetime.datetime.now() - start_time > datetime.timedelta(microseconds=100)
 
 
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_results_carry_queue_latency_and_output_sizes(drain_mode):
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(
+		num_parallel_jobs=1,
+		callback=stasher.post_process_callback,
+		drain_mode=drain_mode,
+		max_output_bytes_in_memory=10,
+	)
+	command_executor.extend_queue([
+		CommandJob(command=['sh', '-c', 'sleep 0.1; seq 1000; echo err >&2'], associated_data=0),
+		CommandJob(command=['true'], associated_data=1),
+	])
+	finish_all(command_executor)
+	command_executor.close()
+
+	result_of_data = { x.associated_data: x for x in stasher.stash }
+	assert result_of_data[0].enqueue_time == result_of_data[1].enqueue_time
+	assert result_of_data[0].queue_latency >= 0.0
+	assert result_of_data[1].queue_latency >= 0.1
+	assert result_of_data[0].stdout_num_bytes == len(b''.join(b'%d\n' % x for x in range(1, 1001)))
+	assert result_of_data[0].stderr_num_bytes == 4
+	assert result_of_data[1].stdout_num_bytes == 0
+
+
 def test_compdb_of_compdb_str():
 	NUM_JOBS = 6
 	stasher = ExeResultStasher()
@@ -86,12 +115,14 @@ def test_compdb_of_compdb_str():
                 for x in stasher.stash]) == list(range(NUM_JOBS))
 
 
-def test_command_with_lot_of_output_does_not_block():
+@pytest.mark.parametrize('drain_mode', (DrainMode.THREADS, DrainMode.SELECTOR))
+def test_command_with_lot_of_output_does_not_block(drain_mode):
 	NUM_JOBS = 6
 	stasher = ExeResultStasher()
 	command_executor = CommandExecutor(
 		num_parallel_jobs=3,
 		callback=stasher.post_process_callback,
+		drain_mode=drain_mode,
 	)
 	command_executor.extend_queue(
 		[CommandJob(command=['seq', str(BIG_SEQ_VALUE)], ) for _ in range(NUM_JOBS)]
@@ -101,3 +132,211 @@ def test_command_with_lot_of_output_does_not_block():
 	assert len(stasher.stash) == NUM_JOBS
 	EXPECTED_OUTPUT = bytes_of_seq_value(BIG_SEQ_VALUE)
 	assert all(x.stdout == EXPECTED_OUTPUT for x in stasher.stash)
+
+
+def test_terminate_all_and_wipe_queue_reports_cancelled_jobs():
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(
+		num_parallel_jobs=2,
+		callback=stasher.post_process_callback,
+	)
+	command_executor.extend_queue(
+		[CommandJob(command=['sleep', '10'], associated_data=x) for x in range(5)]
+	)
+
+	start_time = datetime.datetime.now()
+	command_executor.terminate_all_and_wipe_queue(grace_period=5.0)
+
+	assert all_are_finished(command_executor)
+	assert datetime.datetime.now() - start_time < datetime.timedelta(seconds=5)
+	assert sorted(x.associated_data for x in stasher.stash) == list(range(5))
+	assert all(x.cancelled and x.returncode != 0 for x in stasher.stash)
+
+
+def test_terminate_all_and_wipe_queue_kills_process_group_after_grace_period():
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(
+		num_parallel_jobs=1,
+		callback=stasher.post_process_callback,
+		kill_process_groups=True,
+	)
+	command_executor.extend_queue(
+		[CommandJob(command=['sh', '-c', 'trap "" TERM; sleep 10 & sleep 10; wait'])]
+	)
+	time.sleep(0.1)
+
+	start_time = datetime.datetime.now()
+	command_executor.terminate_all_and_wipe_queue(grace_period=0.2)
+
+	assert all_are_finished(command_executor)
+	assert datetime.datetime.now() - start_time < datetime.timedelta(seconds=5)
+	assert len(stasher.stash) == 1
+	assert stasher.stash[0].cancelled
+
+
+def test_terminate_all_and_wipe_queue_retains_jobs_not_matching_predicate():
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(num_parallel_jobs=1, callback=stasher.post_process_callback)
+	command_executor.extend_queue(
+		[CommandJob(command=['true'], associated_data=x) for x in range(4)]
+	)
+	command_executor.terminate_all_and_wipe_queue(should_cancel=lambda job: job.associated_data % 2 == 1)
+	finish_all(command_executor)
+
+	assert sorted(x.associated_data for x in stasher.stash if x.cancelled) == [1, 3]
+	assert sorted(x.associated_data for x in stasher.stash if not x.cancelled) == [0, 2]
+
+
+def test_fail_fast_after_stops_dequeuing_and_cancels_other_jobs():
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(
+		num_parallel_jobs=2,
+		callback=stasher.post_process_callback,
+		fail_fast_after=1,
+	)
+	command_executor.extend_queue(
+		[CommandJob(command=['false'], associated_data='failure'), CommandJob(command=['sleep', '10'])]
+		+ [CommandJob(command=['true']) for _ in range(4)]
+	)
+
+	start_time = datetime.datetime.now()
+	finish_all(command_executor)
+
+	assert datetime.datetime.now() - start_time < datetime.timedelta(seconds=5)
+	assert len(stasher.stash) == 6
+	assert [x.associated_data for x in stasher.stash if not x.cancelled] == ['failure']
+
+
+def test_terminate_on_signals_tears_down_jobs():
+	handled_signals = []
+	prev_handler = signal.signal(signal.SIGUSR1, lambda signum, _frame: handled_signals.append(signum))
+	try:
+		stasher = ExeResultStasher()
+		command_executor = CommandExecutor(num_parallel_jobs=2, callback=stasher.post_process_callback)
+		with terminate_on_signals(command_executor, signals=[signal.SIGUSR1]):
+			command_executor.extend_queue([CommandJob(command=['sleep', '10']) for _ in range(3)])
+			os.kill(os.getpid(), signal.SIGUSR1)
+
+		assert handled_signals == [signal.SIGUSR1]
+		assert command_executor.num_in_queue() == 0
+		assert stasher.stash == []
+		finish_all(command_executor)
+		assert len(stasher.stash) == 2 and all(x.cancelled for x in stasher.stash)
+	finally:
+		signal.signal(signal.SIGUSR1, prev_handler)
+
+
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_terminate_on_signals_tears_down_job_being_started(drain_mode):
+	handled_signals = []
+	prev_handler = signal.signal(signal.SIGUSR1, lambda signum, _frame: handled_signals.append(signum))
+	try:
+		stasher = ExeResultStasher()
+		command_executor = CommandExecutor(num_parallel_jobs=1, callback=stasher.post_process_callback, drain_mode=drain_mode)
+		start_job = command_executor._start_job
+
+		def start_job_then_signal(*args, **kwargs):
+			popen = start_job(*args, **kwargs)
+			signal.pthread_kill(threading.main_thread().ident, signal.SIGUSR1)
+			return popen
+
+		command_executor._start_job = start_job_then_signal
+		start_time = time.monotonic()
+		with terminate_on_signals(command_executor, signals=[signal.SIGUSR1]):
+			command_executor.extend_queue([CommandJob(command=['sleep', '10'])])
+		finish_all(command_executor)
+
+		assert handled_signals == [signal.SIGUSR1]
+		assert len(stasher.stash) == 1 and stasher.stash[0].cancelled
+		assert time.monotonic() - start_time < 5.0
+	finally:
+		signal.signal(signal.SIGUSR1, prev_handler)
+
+
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_slots_bound_concurrency_and_are_reused(drain_mode):
+	NUM_PARALLEL_JOBS = 3
+	NUM_JOBS = 10
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(num_parallel_jobs=NUM_PARALLEL_JOBS, callback=stasher.post_process_callback, drain_mode=drain_mode)
+	command_executor.extend_queue(
+		CommandJob(command=['sleep', str(0.01 * (x % 4))], associated_data=x) for x in range(NUM_JOBS)
+	)
+	max_num_running = 0
+	while not all_are_finished(command_executor):
+		max_num_running = max(max_num_running, command_executor.num_running())
+		command_executor.wait_for_completion(timeout=0.001)
+		command_executor.update()
+
+	# Each completion is reported exactly once
+	assert sorted(x.associated_data for x in stasher.stash) == list(range(NUM_JOBS))
+
+	# No more than num_parallel_jobs jobs ever run at once
+	assert max_num_running == NUM_PARALLEL_JOBS
+	events = sorted([ (x.start_time, 1) for x in stasher.stash ] + [ (x.end_time, -1) for x in stasher.stash ])
+	num_overlapping = 0
+	for _, delta in events:
+		num_overlapping += delta
+		assert num_overlapping <= NUM_PARALLEL_JOBS
+
+	# The slots are reused once their jobs complete, and never by two jobs at once
+	assert { x.slot_index for x in stasher.stash } == set(range(NUM_PARALLEL_JOBS))
+	for slot_index in range(NUM_PARALLEL_JOBS):
+		slot_results = sorted((x for x in stasher.stash if x.slot_index == slot_index), key=lambda x: x.start_time)
+		for earlier, later in zip(slot_results, slot_results[1:]):
+			assert earlier.end_time <= later.start_time
+
+
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_failed_job_start_frees_its_slot(drain_mode):
+	stasher = ExeResultStasher()
+	admission_controller = AdmissionController(budget=ResourceBudget(cpus=1.0), dynamic=False)
+	command_executor = CommandExecutor(
+		num_parallel_jobs=1,
+		callback=stasher.post_process_callback,
+		drain_mode=drain_mode,
+		admission_controller=admission_controller,
+	)
+	with pytest.raises(FileNotFoundError):
+		command_executor.extend_queue([
+			CommandJob(command=['/no/such/binary'], associated_data='missing'),
+			CommandJob(command=['true'], associated_data='present'),
+		])
+	assert command_executor.num_running() == 0
+	assert admission_controller.can_admit(CommandJob(command=['true']))
+
+	finish_all(command_executor)
+	assert [x.associated_data for x in stasher.stash] == ['present']
+
+
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_wait_for_completion_blocks_until_a_job_completes(drain_mode):
+	command_executor = CommandExecutor(num_parallel_jobs=1, drain_mode=drain_mode)
+	command_executor.extend_queue([CommandJob(command=['sleep', '0.3'])])
+
+	start_time = time.monotonic()
+	assert not command_executor.wait_for_completion(timeout=0.05)
+	assert time.monotonic() - start_time >= 0.05
+	assert command_executor.num_running() == 1
+
+	assert command_executor.wait_for_completion(timeout=5.0)
+	assert time.monotonic() - start_time < 2.0
+	command_executor.update()
+	assert all_are_finished(command_executor)
+	command_executor.close()
+
+
+@pytest.mark.parametrize('drain_mode', [DrainMode.THREADS, DrainMode.SELECTOR])
+def test_finish_all_delivers_every_callback(drain_mode):
+	NUM_JOBS = 8
+	stasher = ExeResultStasher()
+	command_executor = CommandExecutor(num_parallel_jobs=3, callback=stasher.post_process_callback, drain_mode=drain_mode)
+	command_executor.extend_queue(
+		CommandJob(command=['sh', '-c', f'sleep 0.0{x % 3}; echo {x}'], associated_data=x) for x in range(NUM_JOBS)
+	)
+	finish_all(command_executor)
+
+	assert all_are_finished(command_executor)
+	assert sorted(x.associated_data for x in stasher.stash) == list(range(NUM_JOBS))
+	assert all(x.stdout == f'{x.associated_data}\n'.encode() for x in stasher.stash)
+	command_executor.close()
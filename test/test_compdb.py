@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+from cppbuild.columnar_compdb import ColumnarCompDB
+from cppbuild.compdb import CompDB
+from cppbuild.ninja_call import NinjaCompDBRecord
+
+
+def _record(file: str, output: str, directory: str = '/project/build') -> NinjaCompDBRecord:
+	return NinjaCompDBRecord(directory=Path(directory), command=f'c++ -o {output} -c {file}', file=Path(file), output=output)
+
+
+EG_RECORDS = [
+	_record('../src/foo/a.cpp', 'src/foo/a.o'),
+	_record('../src/foo/bar/b.cpp', 'src/foo/bar/b.o'),
+	_record('../src/foobar/c.cpp', 'src/foobar/c.o'),
+	_record('/project/src/d.cpp', 'd.o', directory='/project/other_build'),
+	_record('../CMakeLists.txt', 'build.ninja'),
+]
+
+
+@pytest.fixture(params=['list', 'columnar'])
+def eg_compdb(request):
+	if request.param == 'list':
+		return CompDB(EG_RECORDS)
+	columnar_compdb = ColumnarCompDB()
+	for record in EG_RECORDS:
+		columnar_compdb.append(directory=str(record.directory), command=record.command, file=str(record.file), output=record.output)
+	return CompDB(columnar_compdb)
+
+
+def test_records_for_file(eg_compdb):
+	assert eg_compdb.records_for_file(Path('/project/src/foo/a.cpp')) == [EG_RECORDS[0]]
+	assert eg_compdb.records_for_file(Path('src/d.cpp'), base_dir=Path('/project')) == [EG_RECORDS[3]]
+	assert eg_compdb.records_for_file(Path('/project/src/missing.cpp')) == []
+
+
+def test_records_with_output_and_in_directory(eg_compdb):
+	assert eg_compdb.records_with_output('src/foobar/c.o') == [EG_RECORDS[2]]
+	assert eg_compdb.records_in_directory(Path('/project/other_build/')) == [EG_RECORDS[3]]
+	assert len(eg_compdb.records_in_directory(Path('/project/build'))) == 4
+
+
+def test_records_under(eg_compdb):
+	assert eg_compdb.records_under(Path('/project/src/foo')) == [EG_RECORDS[0], EG_RECORDS[1]]
+	assert eg_compdb.records_under(Path('src/foobar'), base_dir=Path('/project')) == [EG_RECORDS[2]]
+	assert eg_compdb.records_under(Path('/project/nowhere')) == []
+
+
+def test_records_matching(eg_compdb):
+	assert eg_compdb.records_matching('/project/src/foo*/*.cpp') == [EG_RECORDS[0], EG_RECORDS[1], EG_RECORDS[2]]
+	assert eg_compdb.records_matching('src/./foo/?.cpp', base_dir=Path('/project')) == [EG_RECORDS[0]]
+	assert eg_compdb.records_matching('/project/src/d.cpp') == [EG_RECORDS[3]]
+
+
+def test_project_dir(eg_compdb):
+	assert eg_compdb.project_dir() == Path('/project')
+
+
+def test_columnar_indexes_are_built_without_building_records(monkeypatch):
+	columnar_compdb = ColumnarCompDB()
+	for record in EG_RECORDS:
+		columnar_compdb.append(directory=str(record.directory), command=record.command, file=str(record.file), output=record.output)
+	num_commands_built = 0
+	build_command = columnar_compdb.command
+
+	def counting_command(index):
+		nonlocal num_commands_built
+		num_commands_built += 1
+		return build_command(index)
+
+	monkeypatch.setattr(columnar_compdb, 'command', counting_command)
+	compdb = CompDB(columnar_compdb)
+	assert compdb.records_for_file(Path('/project/src/foo/a.cpp')) == [EG_RECORDS[0]]
+	assert compdb.records_in_directory(Path('/project/other_build')) == [EG_RECORDS[3]]
+	assert compdb.records_with_output('src/foobar/c.o') == [EG_RECORDS[2]]
+	assert num_commands_built == 3
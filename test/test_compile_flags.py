@@ -0,0 +1,23 @@
+from cppbuild.compile_flags import without_output_flags
+
+
+def test_without_output_flags_drops_separate_and_attached_values():
+	parts = ['c++', '-DA', '-MD', '-MT', 'a.o', '-MFa.o.d', '-o', 'a.o', '-c', '../a.cpp']
+	assert without_output_flags(parts) == ['c++', '-DA', '-c', '../a.cpp']
+	assert without_output_flags(['c++', '-oa.o', '-MQa.o', '-c', 'a.cpp']) == ['c++', '-c', 'a.cpp']
+
+
+def test_without_output_flags_keeps_other_flags_starting_with_o():
+	parts = ['clang++', '-objcmt-migrate-all', '-O2', '-M', '-c', 'a.mm']
+	assert without_output_flags(parts) == parts
+
+
+def test_without_output_flags_can_keep_output_path():
+	parts = ['c++', '-MD', '-MF', 'a.o.d', '-o', 'a.o', '-c', 'a.cpp']
+	assert without_output_flags(parts, keep_output_path=True) == ['c++', '-o', 'a.o', '-c', 'a.cpp']
+	assert without_output_flags(['c++', '-oa.o', '-MTa.o'], keep_output_path=True) == ['c++', '-oa.o']
+
+
+def test_without_output_flags_drops_specified_flags():
+	parts = ['c++', '-M', '-MMD', '-MP', '-c', 'a.cpp']
+	assert without_output_flags(parts, dropped_flags=frozenset(('-c', '-M'))) == ['c++', 'a.cpp']
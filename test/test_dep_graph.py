@@ -0,0 +1,86 @@
+import pytest
+
+from pathlib import Path
+
+from cppbuild.dep_graph import PathInterner, dep_graph_of_raw_dep_records, load_dep_graph, save_dep_graph
+from cppbuild.raw_dep_record import RawDepRecord, parse_ninja_deps
+
+EG_RECORDS = [
+	RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('a.cpp'), Path('common.hpp'), Path('a.hpp')]),
+	RawDepRecord(target=Path('b.o'), is_valid=False, deps=[Path('b.cpp'), Path('common.hpp')]),
+	RawDepRecord(target=Path('empty.o'), is_valid=True, deps=[]),
+	RawDepRecord(target=Path('c.o'), is_valid=True, deps=[Path('c.cpp'), Path('a.hpp'), Path('common.hpp')]),
+]
+
+
+def test_path_interner():
+	interner = PathInterner(['x', 'y'])
+	assert interner.intern('z') == 2
+	assert interner.intern('x') == 0
+	assert interner.id_of('y') == 1
+	assert interner.id_of('nope') is None
+	assert interner.path_of(2) == 'z'
+	assert len(interner) == 3
+
+
+def test_dep_graph_lookups():
+	graph = dep_graph_of_raw_dep_records(EG_RECORDS)
+	assert graph.num_targets() == 4
+	assert graph.num_headers() == 5
+	assert graph.deps_of_target('a.o') == ['a.cpp', 'common.hpp', 'a.hpp']
+	assert graph.deps_of_target('empty.o') == []
+	assert graph.deps_of_target('unknown.o') == []
+	assert graph.targets_including('common.hpp') == ['a.o', 'b.o', 'c.o']
+	assert graph.targets_including('a.hpp') == ['a.o', 'c.o']
+	assert graph.targets_including('b.cpp') == ['b.o']
+	assert graph.targets_including('unknown.hpp') == []
+	assert graph.is_valid(graph.targets.id_of('a.o'))
+	assert not graph.is_valid(graph.targets.id_of('b.o'))
+
+
+def test_dep_graph_csr_buffers_are_consistent():
+	graph = dep_graph_of_raw_dep_records(EG_RECORDS)
+	assert graph.header_ids.typecode == 'I'
+	assert graph.target_ids.typecode == 'I'
+	assert len(graph.header_ids) == len(graph.target_ids) == 8
+	assert graph.header_offsets[-1] == graph.target_offsets[-1] == 8
+	for target_id in range(graph.num_targets()):
+		for header_id in graph.header_ids_of_target(target_id):
+			assert target_id in graph.target_ids_including(header_id)
+
+
+def test_dep_graph_of_streamed_ninja_deps():
+	lines = [
+		'x.o: #deps 2, deps mtime 1 (VALID)\n',
+		'    ../x.cpp\n',
+		'    ../shared.hpp\n',
+		'\n',
+		'y.o: #deps 1, deps mtime 1 (VALID)\n',
+		'    ../shared.hpp\n',
+		'\n',
+	]
+	graph = dep_graph_of_raw_dep_records(parse_ninja_deps(lines))
+	assert graph.targets_including('../shared.hpp') == ['x.o', 'y.o']
+
+
+def test_dep_graph_rejects_repeated_targets():
+	with pytest.raises(ValueError):
+		dep_graph_of_raw_dep_records(EG_RECORDS + EG_RECORDS[:1])
+
+
+def test_save_and_load_dep_graph(tmp_path):
+	graph = dep_graph_of_raw_dep_records(EG_RECORDS)
+	save_dep_graph(graph, tmp_path / 'deps.index')
+	loaded = load_dep_graph(tmp_path / 'deps.index')
+	assert loaded.targets.paths == graph.targets.paths
+	assert loaded.headers.paths == graph.headers.paths
+	assert loaded.target_is_valid == graph.target_is_valid
+	assert loaded.header_offsets == graph.header_offsets
+	assert loaded.header_ids == graph.header_ids
+	assert loaded.targets_including('common.hpp') == ['a.o', 'b.o', 'c.o']
+
+
+def test_load_dep_graph_rejects_other_files(tmp_path):
+	(tmp_path / 'not.index').write_bytes(b'something else entirely, long enough to hold a header')
+	with pytest.raises(ValueError):
+		load_dep_graph(tmp_path / 'not.index')
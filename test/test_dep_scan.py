@@ -0,0 +1,51 @@
+import shutil
+
+import pytest
+
+from pathlib import Path
+
+from cppbuild.dep_scan import dep_scan_command, scan_deps
+from cppbuild.ninja_call import NinjaCompDBRecord
+
+
+def test_dep_scan_command():
+	record = NinjaCompDBRecord(
+		directory=Path('/project/build'),
+		command='ccache /usr/bin/c++ -DA -I"../my include" -MD -MT a.o -MF a.o.d -o a.o -c ../a.cpp',
+		file=Path('../a.cpp'),
+		output='a.o',
+	)
+	assert dep_scan_command(record, Path('/tmp/a.d')) == [
+		'ccache', '/usr/bin/c++', '-DA', '-I../my include', '../a.cpp', '-M', '-MF', '/tmp/a.d', '-MT', 'a.o',
+	]
+
+
+def test_dep_scan_command_skips_non_compile_commands():
+	record = NinjaCompDBRecord(directory=Path('/p'), command='/usr/bin/cmake -S/p -B/p/b', file=Path('x'), output='build.ninja')
+	assert dep_scan_command(record, Path('/tmp/x.d')) is None
+
+
+@pytest.mark.skipif(shutil.which('c++') is None, reason='requires a C++ compiler')
+def test_scan_deps(tmp_path):
+	(tmp_path / 'include').mkdir()
+	(tmp_path / 'include' / 'a b.hpp').write_text('#pragma once\n')
+	(tmp_path / 'a.cpp').write_text('#include "a b.hpp"\nint main() {}\n')
+	(tmp_path / 'broken.cpp').write_text('#include "missing.hpp"\n')
+	(tmp_path / 'build').mkdir()
+
+	records = [
+		NinjaCompDBRecord(
+			directory=tmp_path / 'build',
+			command=f'c++ -I../include -o {name}.o -c ../{name}.cpp',
+			file=Path(f'../{name}.cpp'),
+			output=f'{name}.o',
+		)
+		for name in ('a', 'broken')
+	]
+	record_of_target = { x.target: x for x in scan_deps(records, num_parallel_jobs=2) }
+	assert set(record_of_target) == { Path('a.o'), Path('broken.o') }
+	assert record_of_target[Path('a.o')].is_valid
+	assert record_of_target[Path('a.o')].deps[0] == Path('../a.cpp')
+	assert Path('../include/a b.hpp') in record_of_target[Path('a.o')].deps
+	assert not record_of_target[Path('broken.o')].is_valid
+	assert record_of_target[Path('broken.o')].deps == []
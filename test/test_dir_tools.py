@@ -1,8 +1,9 @@
+import os
 import pytest
 
 from pathlib import Path
 
-from cppbuild.dir_tools import WorkingDirChange, from_changed_working_dir
+from cppbuild.dir_tools import BulkPathRebaser, WorkingDirChange, absolute_path_str, from_changed_working_dir, from_changed_working_dir_bulk
 
 
 def test_working_dir_change_throws_on_mismatching_absoluteness():
@@ -19,3 +20,44 @@ def test_from_changed_working_dir():
 	assert from_changed_working_dir(Path( '/a/b/c' ), WorkingDirChange( prev_working_dir=Path( '/a' ), new_working_dir=Path( '/a/b' ) ) ) == Path( '/a/b/c' )
 	assert from_changed_working_dir(Path( '/a/b/c' ), WorkingDirChange( prev_working_dir=Path(  'a' ), new_working_dir=Path(  'a/b' ) ) ) == Path( '/a/b/c' )
 
+
+EG_WORKING_DIR_CHANGES = [
+	WorkingDirChange( prev_working_dir=Path( '/p/build' ), new_working_dir=Path( '/p'       ) ),
+	WorkingDirChange( prev_working_dir=Path( '/p/build' ), new_working_dir=Path( '/'        ) ),
+	WorkingDirChange( prev_working_dir=Path( '/'        ), new_working_dir=Path( '/p'       ) ),
+	WorkingDirChange( prev_working_dir=Path( 'p/build'  ), new_working_dir=Path( 'p'        ) ),
+	WorkingDirChange( prev_working_dir=Path( 'p'        ), new_working_dir=Path( '.'        ) ),
+	WorkingDirChange( prev_working_dir=Path( '.'        ), new_working_dir=Path( '.'        ) ),
+	WorkingDirChange( prev_working_dir=Path( '/p'       ), new_working_dir=Path( '/p/build' ) ),
+]
+
+EG_PATHS = [
+	'a.cpp', '../src/a.cpp', '../../p/src/./a.cpp', 'x/../../src//a.cpp', '..', '.', '../', 'build', 'sub/',
+	'../..', '../../..', '/abs/../path', '../build/b.hpp',
+]
+
+
+@pytest.mark.parametrize('working_dir_change', EG_WORKING_DIR_CHANGES)
+def test_from_changed_working_dir_bulk_matches_from_changed_working_dir(working_dir_change):
+	rebaser = BulkPathRebaser(working_dir_change)
+	for path in EG_PATHS * 2:
+		try:
+			expected = str(from_changed_working_dir(Path(path), working_dir_change))
+		except ValueError:
+			with pytest.raises(ValueError):
+				rebaser.rebase(path)
+			continue
+		assert rebaser.rebase(path) == (path if path.startswith('/') else expected)
+
+
+def test_from_changed_working_dir_bulk():
+	assert from_changed_working_dir_bulk(
+		[ 'b/c', '../x/y', '/a/b/c' ],
+		WorkingDirChange( prev_working_dir=Path( '/a' ), new_working_dir=Path( '/' ) ),
+	) == [ 'a/b/c', 'x/y', '/a/b/c' ]
+
+
+def test_absolute_path_str():
+	assert absolute_path_str(Path('../include/a.h'), Path('/project/build')) == '/project/include/a.h'
+	assert absolute_path_str('/usr/include/./stdio.h', Path('/project/build')) == '/usr/include/stdio.h'
+	assert absolute_path_str(Path('a.h')) == os.path.join(os.getcwd(), 'a.h')
@@ -0,0 +1,12 @@
+from cppbuild.command_result import CommandResult
+from runner.execution_status import ExecutionStatus, execution_status_of_result
+
+
+def _result(returncode: int, cancelled: bool = False) -> CommandResult:
+	return CommandResult(returncode=returncode, cancelled=cancelled)
+
+
+def test_execution_status_of_result():
+	assert execution_status_of_result(_result(0)) == ExecutionStatus.SUCCEEDED
+	assert execution_status_of_result(_result(1)) == ExecutionStatus.FAILED
+	assert execution_status_of_result(_result(-15, cancelled=True)) == ExecutionStatus.CANCELLED
@@ -0,0 +1,59 @@
+import io
+import json
+
+import pytest
+
+from pathlib import Path
+
+from cppbuild.dep_graph import dep_graph_of_raw_dep_records
+from cppbuild.header_impact import (
+	HeaderImpact,
+	rank_header_impacts,
+	target_costs_of_durations,
+	target_costs_of_ninja_log,
+	write_header_impact_json,
+	write_header_impact_report,
+)
+from cppbuild.ninja_logs import NinjaLogEntry
+from cppbuild.raw_dep_record import RawDepRecord
+
+EG_GRAPH = dep_graph_of_raw_dep_records([
+	RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('a.cpp'), Path('common.hpp'), Path('vector')]),
+	RawDepRecord(target=Path('b.o'), is_valid=True, deps=[Path('b.cpp'), Path('common.hpp'), Path('b.hpp')]),
+	RawDepRecord(target=Path('c.o'), is_valid=True, deps=[Path('c.cpp'), Path('b.hpp'), Path('vector')]),
+])
+
+
+def test_rank_header_impacts():
+	target_costs = target_costs_of_durations(EG_GRAPH, { 'a.o': 1.0, 'b.o': 10.0, 'c.o': 100.0 })
+	assert rank_header_impacts(EG_GRAPH, target_costs) == [
+		HeaderImpact(header='b.hpp',      num_targets=2, total_cost=110.0),
+		HeaderImpact(header='vector',     num_targets=2, total_cost=101.0),
+		HeaderImpact(header='common.hpp', num_targets=2, total_cost=11.0),
+	]
+	assert len(rank_header_impacts(EG_GRAPH, target_costs, should_include=lambda _dep: True)) == 6
+
+
+def test_target_costs_of_ninja_log():
+	target_costs = target_costs_of_ninja_log(EG_GRAPH, {
+		'a.o': NinjaLogEntry(start_time_ms=0, end_time_ms=1500, mtime=0, output='a.o', command_hash='0'),
+		'other.o': NinjaLogEntry(start_time_ms=0, end_time_ms=9000, mtime=0, output='other.o', command_hash='0'),
+	})
+	assert list(target_costs) == [1.5, 0.0, 0.0]
+
+
+def test_rank_header_impacts_rejects_mismatched_costs():
+	with pytest.raises(ValueError):
+		rank_header_impacts(EG_GRAPH, target_costs_of_durations(EG_GRAPH, {})[:2])
+
+
+def test_write_header_impact_report_and_json():
+	impacts = [HeaderImpact(header='b.hpp', num_targets=2, total_cost=110.0), HeaderImpact(header='x.h', num_targets=1, total_cost=1.0)]
+	report_fh = io.StringIO()
+	write_header_impact_report(impacts, report_fh, limit=1)
+	assert report_fh.getvalue().splitlines()[1].split() == ['1', '110.0', '2', 'b.hpp']
+	assert len(report_fh.getvalue().splitlines()) == 2
+
+	json_fh = io.StringIO()
+	write_header_impact_json(impacts, json_fh)
+	assert json.loads(json_fh.getvalue())[1] == { 'header': 'x.h', 'num_targets': 1, 'total_cost': 1.0 }
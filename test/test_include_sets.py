@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from cppbuild.dep_graph import dep_graph_of_raw_dep_records
+from cppbuild.include_sets import HeaderCoverage, IncludeSets
+from cppbuild.raw_dep_record import RawDepRecord
+
+EG_INCLUDE_SETS = IncludeSets(dep_graph_of_raw_dep_records([
+	RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('a.cpp'), Path('common.hpp'), Path('vector')]),
+	RawDepRecord(target=Path('b.o'), is_valid=True, deps=[Path('b.cpp'), Path('common.hpp'), Path('vector'), Path('b.hpp')]),
+	RawDepRecord(target=Path('c.o'), is_valid=True, deps=[Path('common.hpp'), Path('vector')]),
+	RawDepRecord(target=Path('d.o'), is_valid=True, deps=[Path('common.hpp'), Path('vector')]),
+	RawDepRecord(target=Path('e.o'), is_valid=True, deps=[]),
+]))
+
+
+def test_header_bits():
+	assert EG_INCLUDE_SETS.headers_of_bits(EG_INCLUDE_SETS.header_bits('a.o')) == ['a.cpp', 'common.hpp', 'vector']
+	assert EG_INCLUDE_SETS.header_bits('e.o') == 0
+	assert EG_INCLUDE_SETS.header_bits('unknown.o') == 0
+
+
+def test_pairwise_queries():
+	assert EG_INCLUDE_SETS.num_shared_headers('a.o', 'b.o') == 2
+	assert EG_INCLUDE_SETS.similarity('a.o', 'b.o') == 2 / 5
+	assert EG_INCLUDE_SETS.similarity('c.o', 'd.o') == 1.0
+	assert EG_INCLUDE_SETS.similarity('e.o', 'e.o') == 0.0
+
+
+def test_common_headers():
+	assert EG_INCLUDE_SETS.common_headers(min_fraction=0.8) == [
+		HeaderCoverage(header='common.hpp', num_targets=4, fraction=0.8),
+		HeaderCoverage(header='vector',     num_targets=4, fraction=0.8),
+	]
+	assert len(EG_INCLUDE_SETS.common_headers(min_fraction=0.0)) == 5
+
+
+def test_targets_including_all_and_covered_by():
+	assert EG_INCLUDE_SETS.targets_of_bits(EG_INCLUDE_SETS.targets_including_all(['vector', 'b.hpp'])) == ['b.o']
+	assert EG_INCLUDE_SETS.targets_including_all(['vector', 'unknown.hpp']) == 0
+	assert EG_INCLUDE_SETS.targets_covered_by(['common.hpp', 'vector', 'unknown.hpp']) == ['c.o', 'd.o', 'e.o']
+
+
+def test_supersets():
+	assert EG_INCLUDE_SETS.supersets_of('c.o') == ['a.o', 'b.o', 'd.o']
+	assert EG_INCLUDE_SETS.supersets_of('a.o') == []
+	assert EG_INCLUDE_SETS.superset_relations() == {
+		'c.o': ['a.o', 'b.o', 'd.o'],
+		'd.o': ['a.o', 'b.o', 'c.o'],
+		'e.o': ['a.o', 'b.o', 'c.o', 'd.o'],
+	}
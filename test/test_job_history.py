@@ -0,0 +1,65 @@
+import pytest
+
+from pathlib import Path
+
+from cppbuild.command_executor import CommandExecutor, chain_callbacks, finish_all
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+from cppbuild.job_history import JobHistory, history_key, normalized_command
+
+
+def test_normalized_command_drops_launchers_and_dep_file_flags():
+	assert normalized_command(
+		['ccache', 'g++', '-MD', '-MP', '-MT', 'a.o', '-MF', 'a.o.d', '-MQb.o', '-c', 'a.cpp', '-o', 'a.o']
+	) == 'g++ -c a.cpp -o a.o'
+	assert normalized_command(['g++', '-MMD', '-c', 'a.cpp', '-oa.o']) == 'g++ -c a.cpp -oa.o'
+
+
+def test_history_key_depends_on_file():
+	assert history_key(['g++', 'a.cpp']) == history_key(['ccache', 'g++', 'a.cpp'])
+	assert history_key(['g++', 'a.cpp'], Path('a.cpp')) != history_key(['g++', 'a.cpp'], Path('b.cpp'))
+
+
+def test_job_history_records_and_queries_expected_costs(tmp_path):
+	with JobHistory(tmp_path / 'history.sqlite', file_of_associated_data=lambda x: x, num_recent_runs=2) as history:
+		for wall_time, returncode in ((10.0, 0), (2.0, 0), (4.0, 0), (100.0, 1)):
+			history.record_command_result(
+				result=CommandResult(
+					returncode=returncode,
+					command=['g++', 'a.cpp'],
+					associated_data=Path('a.cpp'),
+					start_time=1.0,
+					end_time=1.0 + wall_time,
+				),
+				num_remaining_commands=0,
+			)
+		history.record(CommandResult(command=['g++', 'b.cpp']))
+
+		job = CommandJob(command=['g++', 'a.cpp'], associated_data=Path('a.cpp'))
+		assert history.expected_cost_of_job(job) == pytest.approx(3.0)
+		assert history.expected_cost_of_job(CommandJob(command=['g++', 'b.cpp'])) is None
+		assert history.expected_costs() == { history_key(job.command, Path('a.cpp')): pytest.approx(3.0) }
+
+	with JobHistory(tmp_path / 'history.sqlite', num_recent_runs=3) as reopened_history:
+		assert reopened_history.expected_cost(history_key(['g++', 'a.cpp'], Path('a.cpp'))) == pytest.approx(16.0 / 3.0)
+
+
+def test_command_executor_results_carry_timing_and_rusage(tmp_path):
+	results = []
+	history = JobHistory(tmp_path / 'history.sqlite')
+	command_executor = CommandExecutor(
+		num_parallel_jobs=1,
+		callback=chain_callbacks(
+			lambda *, result, num_remaining_commands: results.append(result),
+			history.record_command_result,
+		),
+	)
+	command_executor.extend_queue([CommandJob(command=['sleep', '0.1'])])
+	finish_all(command_executor)
+
+	assert history.expected_cost_of_job(CommandJob(command=['sleep', '0.1'])) >= 0.1
+	history.close()
+
+	assert results[0].wall_time >= 0.1
+	assert results[0].cpu_time is not None and results[0].cpu_time >= 0.0
+	assert results[0].max_rss_kib > 0
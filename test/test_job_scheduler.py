@@ -0,0 +1,70 @@
+import pytest
+
+from cppbuild.command_executor import CommandExecutor, finish_all
+from cppbuild.command_job import CommandJob
+from cppbuild.job_scheduler import FifoScheduler, LongestProcessingTimeFirstScheduler, PriorityScheduler, simulate_makespan
+
+
+def names_in_popped_order(scheduler, jobs):
+	'''
+	Push the specified jobs onto the specified scheduler and then return the associated_data of each in popped order
+	'''
+	scheduler.extend(jobs)
+	names = []
+	while len(scheduler):
+		assert scheduler.peek() is not None
+		names.append(scheduler.pop().associated_data)
+	return names
+
+
+def job(name, *, priority=0.0, estimated_cost=None):
+	return CommandJob(command=['true'], associated_data=name, priority=priority, estimated_cost=estimated_cost)
+
+
+def test_fifo_scheduler():
+	assert names_in_popped_order(FifoScheduler(), [job('a'), job('b'), job('c')]) == ['a', 'b', 'c']
+
+
+def test_priority_scheduler_is_stable_within_priorities():
+	assert names_in_popped_order(
+		PriorityScheduler(),
+		[job('a', priority=1), job('b', priority=2), job('c', priority=1), job('d', priority=2)],
+	) == ['b', 'd', 'a', 'c']
+
+
+def test_lpt_scheduler_starts_unknown_and_then_longest_jobs_first():
+	assert names_in_popped_order(
+		LongestProcessingTimeFirstScheduler(),
+		[job('a', estimated_cost=1), job('b'), job('c', estimated_cost=5), job('d', estimated_cost=3)],
+	) == ['b', 'c', 'd', 'a']
+
+	assert names_in_popped_order(
+		LongestProcessingTimeFirstScheduler(unknown_cost=0.0),
+		[job('a', estimated_cost=1), job('b'), job('c', estimated_cost=5)],
+	) == ['c', 'a', 'b']
+
+
+def test_empty_scheduler_raises_index_error():
+	for scheduler in (FifoScheduler(), PriorityScheduler(), LongestProcessingTimeFirstScheduler()):
+		with pytest.raises(IndexError):
+			scheduler.pop()
+		with pytest.raises(IndexError):
+			scheduler.peek()
+
+
+def test_simulate_makespan_lpt_avoids_long_tail():
+	jobs = [job(str(x), estimated_cost=1.0) for x in range(6)] + [job('big', estimated_cost=6.0)]
+	assert simulate_makespan(jobs, num_parallel_jobs=2, scheduler=FifoScheduler()) == 9.0
+	assert simulate_makespan(jobs, num_parallel_jobs=2, scheduler=LongestProcessingTimeFirstScheduler()) == 6.0
+
+
+def test_command_executor_uses_scheduler():
+	started = []
+	command_executor = CommandExecutor(
+		num_parallel_jobs=1,
+		callback=lambda *, result, num_remaining_commands: started.append(result.associated_data),
+		scheduler=PriorityScheduler(),
+	)
+	command_executor.extend_queue([job('a', priority=1), job('b', priority=1), job('c', priority=3)])
+	finish_all(command_executor)
+	assert started == ['c', 'a', 'b']
@@ -0,0 +1,70 @@
+import pytest
+
+from pathlib import Path
+
+from cppbuild.make_deps import parse_make_deps, parse_make_deps_dir
+
+TEST_DATA_DIR = Path(__file__).parent.resolve() / 'test-data'
+
+EXAMPLE_DEPS_FILE = TEST_DATA_DIR / 'example.compiler-deps.txt'
+
+
+def test_parse_make_deps_handles_escapes_and_continuations():
+	deps_str = (
+		'a.o: ../a.cpp ../my\\ dir/b.hpp \\\n'
+		'  ../c\\#.hpp ../d$$.hpp ../e\\:f.hpp \\\r\n'
+		'  C:\\include\\g.hpp ../h\\\\\\ i.hpp\n'
+	)
+	assert parse_make_deps(deps_str) == { 'a.o': [
+		'../a.cpp', '../my dir/b.hpp', '../c#.hpp', '../d$.hpp', '../e:f.hpp', 'C:\\include\\g.hpp', '../h\\ i.hpp',
+	] }
+
+
+def test_parse_make_deps_handles_multiple_targets_rules_and_phony_targets():
+	deps_str = (
+		'# A comment\n'
+		'a.o a.d: ../a.cpp ../common.hpp # trailing comment\n'
+		'a.o: ../extra.hpp ../common.hpp\n'
+		'\n'
+		'../common.hpp:\n'
+		'../extra.hpp:\n'
+	)
+	assert parse_make_deps(deps_str) == {
+		'a.o': ['../a.cpp', '../common.hpp', '../extra.hpp'],
+		'a.d': ['../a.cpp', '../common.hpp'],
+	}
+
+
+def test_parse_make_deps_interns_prereqs():
+	first = parse_make_deps('a.o: ../' + 'shared.hpp')
+	second = parse_make_deps('b.o: ../' + 'shared.hpp')
+	assert first['a.o'][0] is second['b.o'][0]
+
+
+def test_parse_make_deps_with_first_target():
+	deps_str = EXAMPLE_DEPS_FILE.read_text()
+	target = 'source/options/options_block/pdb: input_spec.hpp'
+	prereqs = parse_make_deps(deps_str, first_target=target)[target]
+	assert len(prereqs) == 431
+	assert prereqs[0] == target
+	with pytest.raises(ValueError):
+		parse_make_deps(deps_str, first_target='other.o')
+
+
+@pytest.mark.parametrize('bad_str', ['a.o b.o\n', ': a.cpp\n'])
+def test_parse_make_deps_raises_on_bad_rules(bad_str):
+	with pytest.raises(ValueError):
+		parse_make_deps(bad_str)
+
+
+def test_parse_make_deps_dir(tmp_path):
+	(tmp_path / 'sub').mkdir()
+	(tmp_path / 'a.d').write_text('a.o: ../a.cpp ../common.hpp\n')
+	(tmp_path / 'sub' / 'b.d').write_text('b.o: ../b.cpp ../common.hpp\n')
+	(tmp_path / 'ignored.txt').write_text('not: a deps file\n')
+	parsed = parse_make_deps_dir(tmp_path, max_workers=2)
+	assert parsed == {
+		tmp_path / 'a.d': { 'a.o': ['../a.cpp', '../common.hpp'] },
+		tmp_path / 'sub' / 'b.d': { 'b.o': ['../b.cpp', '../common.hpp'] },
+	}
+	assert parsed[tmp_path / 'a.d']['a.o'][1] is parsed[tmp_path / 'sub' / 'b.d']['b.o'][1]
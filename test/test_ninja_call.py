@@ -1,8 +1,10 @@
+import os
 import pytest
+import time
 
 from pathlib import Path
 
-from cppbuild.ninja_call import NinjaCompDBRecord, compdb_of_compdb_str, get_ninja_deps_str_for_dir, project_dir_of_compdb
+from cppbuild.ninja_call import NinjaCompDBRecord, _iter_checked_ninja_run_lines, compdb_of_compdb_str, get_ninja_deps_str_for_dir, project_dir_of_compdb
 
 
 TEST_DATA_DIR = Path(__file__).parent.resolve() / 'test-data'
@@ -49,3 +51,23 @@ def test_project_dir_of_compdb():
 def test_project_dir_of_compdb_raises_value_error_if_not_found():
 	with pytest.raises(ValueError):
 		project_dir_of_compdb([])
+
+
+def test_iter_checked_ninja_run_lines_streams_lines_then_raises_on_failure():
+	lines = _iter_checked_ninja_run_lines(['sh', '-c', 'echo a; echo b; echo oops >&2; exit 3'])
+	assert next(lines) == 'a\n'
+	assert next(lines) == 'b\n'
+	with pytest.raises(ChildProcessError, match='oops'):
+		next(lines)
+
+
+def test_iter_checked_ninja_run_lines_kills_command_if_abandoned():
+	start_time = time.monotonic()
+	lines = _iter_checked_ninja_run_lines(['sh', '-c', 'echo $$; exec sleep 10'])
+	pid = int(next(lines))
+	lines.close()
+	assert time.monotonic() - start_time < 5.0
+
+	# The command has been killed and reaped (so that not even a zombie is left)
+	with pytest.raises(ProcessLookupError):
+		os.kill(pid, 0)
@@ -0,0 +1,106 @@
+import os
+import struct
+
+import pytest
+
+from pathlib import Path
+
+from cppbuild.ninja_logs import NINJA_DEPS_SIGNATURE, dep_graph_of_ninja_deps_log, read_ninja_deps_log, read_ninja_log
+from cppbuild.raw_dep_record import RawDepRecord
+
+
+def _path_record(path: str, path_id: int) -> bytes:
+	path_bytes = path.encode()
+	path_bytes += b'\0' * (-len(path_bytes) % 4)
+	return struct.pack('<I', len(path_bytes) + 4) + path_bytes + struct.pack('<I', ~path_id & 0xFFFFFFFF)
+
+
+def _deps_record(output_id: int, mtime: int, dep_ids, version: int = 4) -> bytes:
+	mtime_bytes = struct.pack('<q' if version >= 4 else '<i', mtime)
+	body = struct.pack('<I', output_id) + mtime_bytes + struct.pack(f'<{len(dep_ids)}I', *dep_ids)
+	return struct.pack('<I', len(body) | 0x80000000) + body
+
+
+def _eg_deps_log_bytes(version: int = 4) -> bytes:
+	return (
+		NINJA_DEPS_SIGNATURE + struct.pack('<i', version)
+		+ _path_record('a.o', 0)
+		+ _path_record('../a.cpp', 1)
+		+ _path_record('../common.hpp', 2)
+		+ _deps_record(0, 100, [1], version)
+		+ _path_record('b.o', 3)
+		+ _path_record('../b.cpp', 4)
+		+ _deps_record(3, 200, [4, 2], version)
+		# A later record for a.o supersedes the earlier one
+		+ _deps_record(0, 300, [1, 2], version)
+	)
+
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_read_ninja_deps_log(tmp_path, version):
+	(tmp_path / '.ninja_deps').write_bytes(_eg_deps_log_bytes(version))
+	deps_log = read_ninja_deps_log(tmp_path / '.ninja_deps')
+	assert deps_log.version == version
+	assert deps_log.paths == ['a.o', '../a.cpp', '../common.hpp', 'b.o', '../b.cpp']
+	assert list(deps_log.iter_raw_dep_records()) == [
+		RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('../a.cpp'), Path('../common.hpp')]),
+		RawDepRecord(target=Path('b.o'), is_valid=True, deps=[Path('../b.cpp'), Path('../common.hpp')]),
+	]
+	assert deps_log.entry_of_output_id[0].mtime == 300
+
+
+def test_read_ninja_deps_log_checks_validity_against_outputs(tmp_path):
+	(tmp_path / '.ninja_deps').write_bytes(_eg_deps_log_bytes())
+	(tmp_path / 'a.o').write_text('')
+	os.utime(tmp_path / 'a.o', ns=(300, 300))
+	is_valid_of_target = {
+		x.target: x.is_valid
+		for x in read_ninja_deps_log(tmp_path / '.ninja_deps').iter_raw_dep_records(ninja_build_dir=tmp_path)
+	}
+	assert is_valid_of_target == { Path('a.o'): True, Path('b.o'): False }
+
+
+def test_read_ninja_deps_log_ignores_truncated_tail(tmp_path):
+	(tmp_path / '.ninja_deps').write_bytes(_eg_deps_log_bytes()[:-3])
+	deps_log = read_ninja_deps_log(tmp_path / '.ninja_deps')
+	assert deps_log.entry_of_output_id[0].mtime == 100
+	assert list(deps_log.entry_of_output_id[3].dep_ids) == [4, 2]
+
+
+def test_read_ninja_deps_log_rejects_bad_headers(tmp_path):
+	(tmp_path / 'not_deps').write_bytes(b'# ninja log v5\n and more')
+	with pytest.raises(ValueError):
+		read_ninja_deps_log(tmp_path / 'not_deps')
+	(tmp_path / 'future_deps').write_bytes(NINJA_DEPS_SIGNATURE + struct.pack('<i', 99))
+	with pytest.raises(ValueError, match='version'):
+		read_ninja_deps_log(tmp_path / 'future_deps')
+
+
+def test_dep_graph_of_ninja_deps_log(tmp_path):
+	(tmp_path / '.ninja_deps').write_bytes(_eg_deps_log_bytes())
+	graph = dep_graph_of_ninja_deps_log(read_ninja_deps_log(tmp_path / '.ninja_deps'))
+	assert graph.num_targets() == 2
+	assert graph.num_headers() == 3
+	assert graph.targets_including('../common.hpp') == ['a.o', 'b.o']
+	assert graph.deps_of_target('b.o') == ['../b.cpp', '../common.hpp']
+
+
+def test_read_ninja_log(tmp_path):
+	(tmp_path / '.ninja_log').write_text(
+		'# ninja log v5\n'
+		'0\t1500\t100\ta.o\t1a2b\n'
+		'10\t250\t110\tb.o\t3c4d\n'
+		'5\t2000\t200\ta.o\t5e6f\n'
+		'7\t9'
+	)
+	entry_of_output = read_ninja_log(tmp_path / '.ninja_log')
+	assert set(entry_of_output) == { 'a.o', 'b.o' }
+	assert entry_of_output['a.o'].duration == 1.995
+	assert entry_of_output['a.o'].command_hash == '5e6f'
+	assert entry_of_output['b.o'].mtime == 110
+
+
+def test_read_ninja_log_rejects_unsupported_versions(tmp_path):
+	(tmp_path / '.ninja_log').write_text('# ninja log v4\n0\t1\t2\ta.o\tcmd\n')
+	with pytest.raises(ValueError, match='version'):
+		read_ninja_log(tmp_path / '.ninja_log')
@@ -0,0 +1,78 @@
+import os
+
+from pathlib import Path
+
+from cppbuild.ninja_call import get_ninja_compdb_for_dir
+from cppbuild.ninja_query_cache import CACHE_DIRNAME, get_cached_dep_graph_for_dir, get_cached_ninja_compdb_for_dir
+
+EG_COMPDB_STR = '''[
+	{
+		"directory": "/project/build",
+		"command": "c++ -c ../a.cpp -o a.o",
+		"file": "../a.cpp",
+		"output": "a.o"
+	}
+]'''
+
+EG_DEPS_STR = '''a.o: #deps 2, deps mtime 1 (VALID)
+    ../a.cpp
+    ../a.hpp
+
+'''
+
+
+def _install_fake_ninja(tmp_path: Path, monkeypatch) -> Path:
+	'''
+	Put a fake ninja on the PATH that prints canned compdb/deps output and logs each call,
+	returning the path of the log file
+	'''
+	bin_dir = tmp_path / 'bin'
+	bin_dir.mkdir()
+	(tmp_path / 'compdb.json').write_text(EG_COMPDB_STR)
+	(tmp_path / 'deps.txt').write_text(EG_DEPS_STR)
+	call_log = tmp_path / 'calls.log'
+	fake_ninja = bin_dir / 'ninja'
+	fake_ninja.write_text(f'''#!/bin/sh
+echo "$4" >> {call_log}
+if [ "$4" = compdb ]; then cat {tmp_path / 'compdb.json'}; else cat {tmp_path / 'deps.txt'}; fi
+''')
+	fake_ninja.chmod(0o755)
+	monkeypatch.setenv('PATH', str(bin_dir) + os.pathsep + os.environ['PATH'])
+	return call_log
+
+
+def _make_build_dir(tmp_path: Path) -> Path:
+	build_dir = tmp_path / 'build'
+	build_dir.mkdir()
+	for filename in ('build.ninja', '.ninja_log', '.ninja_deps'):
+		(build_dir / filename).write_text('')
+	return build_dir
+
+
+def test_cached_compdb_skips_ninja_until_build_files_change(tmp_path, monkeypatch):
+	call_log = _install_fake_ninja(tmp_path, monkeypatch)
+	build_dir = _make_build_dir(tmp_path)
+
+	expected = get_ninja_compdb_for_dir(build_dir)
+	assert get_cached_ninja_compdb_for_dir(build_dir) == expected
+	assert get_cached_ninja_compdb_for_dir(build_dir) == expected
+	assert call_log.read_text().split() == ['compdb', 'compdb']
+
+	(build_dir / 'build.ninja').write_text('changed')
+	assert get_cached_ninja_compdb_for_dir(build_dir) == expected
+	assert call_log.read_text().split() == ['compdb', 'compdb', 'compdb']
+	assert len(list((build_dir / CACHE_DIRNAME).iterdir())) == 1
+
+
+def test_cached_dep_graph_skips_ninja_until_build_files_change(tmp_path, monkeypatch):
+	call_log = _install_fake_ninja(tmp_path, monkeypatch)
+	build_dir = _make_build_dir(tmp_path)
+
+	assert get_cached_dep_graph_for_dir(build_dir).deps_of_target('a.o') == ['../a.cpp', '../a.hpp']
+	assert get_cached_dep_graph_for_dir(build_dir).targets_including('../a.hpp') == ['a.o']
+	assert call_log.read_text().split() == ['deps']
+
+	(build_dir / '.ninja_deps').write_text('changed')
+	get_cached_dep_graph_for_dir(build_dir)
+	assert call_log.read_text().split() == ['deps', 'deps']
+	assert len(list((build_dir / CACHE_DIRNAME).iterdir())) == 1
@@ -2,7 +2,7 @@ import pytest
 
 from pathlib import Path
 
-from cppbuild.raw_dep_record import read_compiler_deps_file
+from cppbuild.raw_dep_record import RawDepRecord, parse_ninja_deps, read_compiler_deps_file
 
 TEST_DATA_DIR = Path(__file__).parent.resolve() / 'test-data'
 
@@ -22,3 +22,36 @@ def test_read_compiler_deps_file():
 	assert all(isinstance(x, Path) for x in the_deps.deps)
 	assert Path('source/options/options_block/pdb: input_spec.hpp') in the_deps.deps
 	assert Path('source/src common/common/path_type_aliases.hpp') in the_deps.deps
+
+
+EG_NINJA_DEPS_STR = """source/a.o: #deps 2, deps mtime 1600000000000000000 (VALID)
+    ../source/a.cpp
+    ../source/a b.hpp
+
+weird: #deps name.o: #deps 1, deps mtime 0 (STALE)
+    ../source/weird.cpp
+
+empty.o: #deps 0, deps mtime 1 (VALID)
+
+"""
+
+
+def test_parse_ninja_deps():
+	assert list(parse_ninja_deps(EG_NINJA_DEPS_STR.splitlines(keepends=True))) == [
+		RawDepRecord(target=Path('source/a.o'),            is_valid=True,  deps=[Path('../source/a.cpp'), Path('../source/a b.hpp')]),
+		RawDepRecord(target=Path('weird: #deps name.o'),   is_valid=False, deps=[Path('../source/weird.cpp')]),
+		RawDepRecord(target=Path('empty.o'),               is_valid=True,  deps=[]),
+	]
+
+
+def test_parse_ninja_deps_is_lazy_and_handles_missing_final_blank_line():
+	records = parse_ninja_deps(iter(EG_NINJA_DEPS_STR.rstrip('\n').split('\n')))
+	assert next(records).target == Path('source/a.o')
+	assert [x.target for x in records] == [Path('weird: #deps name.o'), Path('empty.o')]
+
+
+def test_parse_ninja_deps_raises_on_malformed_input():
+	with pytest.raises(ValueError):
+		list(parse_ninja_deps(['    orphan.hpp']))
+	with pytest.raises(ValueError):
+		list(parse_ninja_deps(['not a deps line']))
@@ -0,0 +1,72 @@
+import pytest
+
+from pathlib import Path
+from typing import List
+
+from cppbuild.command_executor import CommandExecutor, finish_all
+from cppbuild.command_job import CommandJob
+from cppbuild.command_result import CommandResult
+from cppbuild.result_cache import CacheableCommandJob, CachingCommandRunner, ResultCache
+
+
+def make_cacheable_job(run_dir: Path, associated_data=None) -> CacheableCommandJob:
+	'''
+	Make a job that "compiles" in.txt to out.txt and reports that on stdout
+	'''
+	return CacheableCommandJob(
+		job=CommandJob(
+			command=['sh', '-c', 'cat in.txt > out.txt && echo built'],
+			run_dir=run_dir,
+			associated_data=associated_data,
+		),
+		inputs=[Path('in.txt')],
+		outputs=[Path('out.txt')],
+	)
+
+
+def run_with_cache(cache: ResultCache, cacheable_jobs: List[CacheableCommandJob]):
+	'''
+	Run the specified jobs through a CachingCommandRunner and return the runner and the results
+	'''
+	results: List[CommandResult] = []
+	executor = CommandExecutor(
+		num_parallel_jobs=2,
+		callback=lambda *, result, num_remaining_commands: results.append(result),
+	)
+	runner = CachingCommandRunner(executor=executor, cache=cache)
+	runner.extend_queue(cacheable_jobs)
+	finish_all(executor)
+	return runner, results
+
+
+def test_caching_command_runner_replays_hits_and_reruns_on_input_change(tmp_path):
+	run_dir = tmp_path / 'run'
+	run_dir.mkdir()
+	(run_dir / 'in.txt').write_text('version 1')
+	cache = ResultCache(tmp_path / 'cache')
+
+	runner, results = run_with_cache(cache, [make_cacheable_job(run_dir, 'a')])
+	assert (runner.num_hits, runner.num_misses) == (0, 1)
+	assert [(x.returncode, x.stdout, x.associated_data) for x in results] == [(0, b'built\n', 'a')]
+
+	(run_dir / 'out.txt').unlink()
+	runner, results = run_with_cache(ResultCache(tmp_path / 'cache'), [make_cacheable_job(run_dir, 'b')])
+	assert (runner.num_hits, runner.num_misses) == (1, 0)
+	assert [(x.returncode, x.stdout, x.associated_data) for x in results] == [(0, b'built\n', 'b')]
+	assert (run_dir / 'out.txt').read_text() == 'version 1'
+
+	(run_dir / 'in.txt').write_text('version 22')
+	runner, results = run_with_cache(cache, [make_cacheable_job(run_dir)])
+	assert (runner.num_hits, runner.num_misses) == (0, 1)
+	assert (run_dir / 'out.txt').read_text() == 'version 22'
+
+
+def test_failures_and_missing_inputs_are_not_cached(tmp_path):
+	cache = ResultCache(tmp_path / 'cache')
+	failing_job = CacheableCommandJob(job=CommandJob(command=['false'], run_dir=tmp_path), inputs=[], outputs=[])
+	for _ in range(2):
+		runner, results = run_with_cache(cache, [failing_job])
+		assert (runner.num_hits, runner.num_misses) == (0, 1)
+		assert results[0].returncode != 0
+
+	assert cache.key_of(make_cacheable_job(tmp_path / 'does-not-exist')) is None
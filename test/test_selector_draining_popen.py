@@ -0,0 +1,51 @@
+import pytest
+import subprocess
+
+from cppbuild.selector_draining_popen import SelectorDrainingPopen
+from cppbuild.wakeup_selector import WakeupSelector
+from command_helper import BIG_SEQ_VALUE, bytes_of_seq_value
+
+
+def run_to_completion(command):
+	'''
+	Run the specified command in a SelectorDrainingPopen, waiting on a WakeupSelector until it completes
+
+	:param command : The command to run
+	'''
+	wakeup_selector = WakeupSelector()
+	sdo = SelectorDrainingPopen(command, wakeup_selector=wakeup_selector, on_complete=wakeup_selector.notify)
+	while sdo.poll() is None:
+		wakeup_selector.wait()
+	wakeup_selector.close()
+	return sdo
+
+
+def test_raises_on_attempt_to_specify_stderr_stdout_to_ctor():
+	with pytest.raises(ValueError):
+		sdo = SelectorDrainingPopen(
+			['seq', '2'],
+			wakeup_selector=WakeupSelector(),
+			stderr=subprocess.DEVNULL,
+			stdout=subprocess.DEVNULL,
+		)
+
+
+def test_basic_command():
+	sdo = run_to_completion(['seq', '5'])
+	assert sdo.poll() == 0
+	assert sdo.stderr_bytes == b''
+	assert sdo.stdout_bytes == bytes_of_seq_value(5)
+
+
+def test_command_with_lot_of_output_does_not_block():
+	sdo = run_to_completion(['seq', str(BIG_SEQ_VALUE)])
+	assert sdo.poll() == 0
+	assert sdo.stderr_bytes == b''
+	assert sdo.stdout_bytes == bytes_of_seq_value(BIG_SEQ_VALUE)
+
+
+def test_stderr_output():
+	sdo = run_to_completion(['ls', '/file/that/does/not/exist'])
+	assert sdo.poll() != 0
+	assert sdo.stderr_bytes == b"ls: cannot access '/file/that/does/not/exist': No such file or directory\n"
+	assert sdo.stdout_bytes == b''
@@ -1,8 +1,9 @@
+import io
 import pytest
 import subprocess
 import time
 
-from cppbuild.self_draining_popen import SelfDrainingPopen
+from cppbuild.self_draining_popen import DrainedByteStream, SelfDrainingPopen
 from command_helper import BIG_SEQ_VALUE, bytes_of_seq_value
 
 
@@ -43,3 +44,51 @@ def test_stderr_output():
 	assert sdo.poll() != 0
 	assert sdo.stderr_bytes == b"ls: cannot access '/file/that/does/not/exist': No such file or directory\n"
 	assert sdo.stdout_bytes == b''
+
+
+def test_drained_byte_stream_joins_chunks():
+	stream = DrainedByteStream()
+	for chunk in (b'ab', b'', b'cde', b'f'):
+		stream.append(chunk)
+	assert stream.value == b'abcdef'
+	assert stream.value == b'abcdef'
+	assert stream.num_bytes == 6
+	assert stream.num_spilled_bytes == 0
+
+
+def test_drained_byte_stream_spills_middle_beyond_max_bytes_in_memory():
+	stream = DrainedByteStream(max_bytes_in_memory=6)
+	all_bytes = bytes(range(100))
+	for index in range(0, len(all_bytes), 7):
+		stream.append(all_bytes[index:index + 7])
+
+	assert stream.num_bytes == 100
+	assert stream.num_spilled_bytes == 94
+	assert stream.value == all_bytes[:3] + b'\n[... 94 bytes elided ...]\n' + all_bytes[-3:]
+
+	full_output = io.BytesIO()
+	stream.write_to(full_output)
+	assert full_output.getvalue() == all_bytes
+	stream.close()
+
+
+def test_drained_byte_stream_does_not_spill_at_max_bytes_in_memory():
+	stream = DrainedByteStream(max_bytes_in_memory=4)
+	stream.append(b'abcd')
+	assert stream.value == b'abcd'
+	assert stream.num_spilled_bytes == 0
+
+
+def test_command_with_lot_of_output_limited_in_memory():
+	sdo = SelfDrainingPopen(['seq', str(BIG_SEQ_VALUE)], max_bytes_in_memory=1000)
+	while sdo.poll() is None:
+		time.sleep(0.0001)
+
+	expected_output = bytes_of_seq_value(BIG_SEQ_VALUE)
+	assert sdo.stdout_bytes.startswith(expected_output[:500])
+	assert sdo.stdout_bytes.endswith(expected_output[-500:])
+	assert len(sdo.stdout_bytes) < 1100
+
+	full_output = io.BytesIO()
+	sdo.drained_bytes.stdout_stream.write_to(full_output)
+	assert full_output.getvalue() == expected_output
@@ -0,0 +1,165 @@
+import shutil
+
+import pytest
+
+from pathlib import Path
+
+from cppbuild.command_executor import CommandExecutor, finish_all
+from cppbuild.dep_graph import dep_graph_of_raw_dep_records
+from cppbuild.include_sets import IncludeSets
+from cppbuild.ninja_call import NinjaCompDBRecord
+from cppbuild.raw_dep_record import RawDepRecord
+from cppbuild.unity_build import plan_unity_batches, unity_batch_jobs, write_unity_sources
+
+
+def _record(name: str,
+            flags: str = '-O2',
+            directory: Path = Path('/p/build'),
+            suffix: str = '.cpp',
+            compiler: str = 'c++',
+            ) -> NinjaCompDBRecord:
+	return NinjaCompDBRecord(
+		directory=directory,
+		command=f'{compiler} {flags} -MD -MT {name}.o -MF {name}.o.d -o {name}.o -c ../{name}{suffix}',
+		file=Path(f'../{name}{suffix}'),
+		output=f'{name}.o',
+	)
+
+
+EG_COMPDB = [
+	_record('a'),
+	_record('b'),
+	_record('c'),
+	_record('d', flags='-O0'),
+	_record('e'),
+	NinjaCompDBRecord(directory=Path('/p/build'), command='cmake -S.. -B.', file=Path('../CMakeLists.txt'), output='build.ninja'),
+	NinjaCompDBRecord(directory=Path('/p/build'), command='', file=Path('some-exe'), output='all'),
+]
+
+EG_INCLUDE_SETS = IncludeSets(dep_graph_of_raw_dep_records([
+	RawDepRecord(target=Path('a.o'), is_valid=True, deps=[Path('x.hpp'), Path('y.hpp'), Path('vector')]),
+	RawDepRecord(target=Path('b.o'), is_valid=True, deps=[Path('x.hpp'), Path('y.hpp')]),
+	RawDepRecord(target=Path('c.o'), is_valid=True, deps=[Path('z.hpp')]),
+	RawDepRecord(target=Path('d.o'), is_valid=True, deps=[Path('x.hpp'), Path('y.hpp')]),
+	RawDepRecord(target=Path('e.o'), is_valid=True, deps=[Path('x.hpp'), Path('vector')]),
+]))
+
+
+def _outputs_of_batches(batches):
+	return sorted(tuple(x.output for x in batch.records) for batch in batches)
+
+
+def test_plan_unity_batches(tmp_path):
+	batches = plan_unity_batches(EG_COMPDB, EG_INCLUDE_SETS, tmp_path)
+	assert _outputs_of_batches(batches) == [('a.o', 'b.o', 'e.o'), ('c.o',), ('d.o',)]
+
+	unity_batch = next(x for x in batches if len(x.records) == 3)
+	assert unity_batch.unity_source is not None
+	assert unity_batch.command == [
+		'c++', '-O2', '-c', str(unity_batch.unity_source), '-o', str(unity_batch.unity_source.with_suffix('.o')),
+	]
+	assert unity_batch.unity_source_content() == '#include "/p/a.cpp"\n#include "/p/b.cpp"\n#include "/p/e.cpp"\n'
+
+	single_batch = next(x for x in batches if x.records[0].output == 'c.o')
+	assert single_batch.unity_source is None
+	assert single_batch.command == ['c++', '-O2', '-MD', '-MT', 'c.o', '-MF', 'c.o.d', '-o', 'c.o', '-c', '../c.cpp']
+
+
+def test_plan_unity_batches_limits(tmp_path):
+	assert _outputs_of_batches(plan_unity_batches(EG_COMPDB, EG_INCLUDE_SETS, tmp_path, max_batch_size=2)) == [
+		('a.o', 'b.o'), ('c.o',), ('d.o',), ('e.o',),
+	]
+
+	batches = plan_unity_batches(
+		EG_COMPDB, EG_INCLUDE_SETS, tmp_path,
+		max_batch_cost=5.0,
+		cost_of_output={ 'a.o': 1.0, 'b.o': 4.5, 'e.o': 2.0 },
+	)
+	assert _outputs_of_batches(batches) == [('a.o', 'e.o'), ('b.o',), ('c.o',), ('d.o',)]
+	assert next(x for x in batches if len(x.records) == 2).estimated_cost == 3.0
+
+	assert _outputs_of_batches(plan_unity_batches(EG_COMPDB, EG_INCLUDE_SETS, tmp_path, min_shared_fraction=0.0)) == [
+		('a.o', 'b.o', 'e.o', 'c.o'), ('d.o',),
+	]
+
+
+def test_plan_unity_batches_never_mixes_source_languages(tmp_path):
+	compdb = [_record('a'), _record('b'), _record('x', suffix='.c'), _record('y', suffix='.c')]
+	include_sets = IncludeSets(dep_graph_of_raw_dep_records(
+		RawDepRecord(target=Path(f'{name}.o'), is_valid=True, deps=[Path('common.h')])
+		for name in ('a', 'b', 'x', 'y')
+	))
+	batches = plan_unity_batches(compdb, include_sets, tmp_path)
+	assert _outputs_of_batches(batches) == [('a.o', 'b.o'), ('x.o', 'y.o')]
+	assert sorted(x.unity_source.suffix for x in batches) == ['.c', '.cpp']
+	c_batch = next(x for x in batches if x.unity_source.suffix == '.c')
+	assert c_batch.command[-3] == str(c_batch.unity_source)
+
+
+def test_write_unity_sources(tmp_path):
+	batches = plan_unity_batches(EG_COMPDB, EG_INCLUDE_SETS, tmp_path / 'unity')
+	assert write_unity_sources(batches) == 1
+	assert write_unity_sources(batches) == 0
+	assert [x.name for x in (tmp_path / 'unity').iterdir()] == ['unity_00000.cpp']
+
+	jobs = unity_batch_jobs(batches)
+	assert [x.associated_data for x in jobs] == batches
+
+	# The cmake regeneration and phony records produce no jobs
+	assert not { 'build.ninja', 'all' } & { y.output for x in jobs for y in x.associated_data.records }
+	assert all(x.command for x in jobs)
+	assert all(x.run_dir == Path('/p/build') for x in jobs)
+
+
+@pytest.mark.skipif(shutil.which('c++') is None, reason='requires a C++ compiler')
+def test_unity_batch_jobs_compile(tmp_path):
+	(tmp_path / 'build').mkdir()
+	(tmp_path / 'common.hpp').write_text('#pragma once\ninline int common() { return 1; }\n')
+	for name in ('a', 'b'):
+		(tmp_path / f'{name}.cpp').write_text(f'#include "common.hpp"\nint {name}() {{ return common(); }}\n')
+	compdb = [_record(name, directory=tmp_path / 'build') for name in ('a', 'b')]
+	include_sets = IncludeSets(dep_graph_of_raw_dep_records(
+		RawDepRecord(target=Path(f'{name}.o'), is_valid=True, deps=[tmp_path / 'common.hpp'])
+		for name in ('a', 'b')
+	))
+
+	batches = plan_unity_batches(compdb, include_sets, tmp_path / 'unity')
+	assert len(batches) == 1
+	write_unity_sources(batches)
+
+	results = []
+	executor = CommandExecutor(num_parallel_jobs=1, callback=lambda *, result, num_remaining_commands: results.append(result))
+	try:
+		executor.extend_queue(unity_batch_jobs(batches))
+		finish_all(executor)
+	finally:
+		executor.close()
+	assert [x.returncode for x in results] == [0]
+	assert (tmp_path / 'unity' / 'unity_00000.o').is_file()
+
+
+@pytest.mark.skipif(shutil.which('cc') is None, reason='requires a C compiler')
+def test_unity_batch_jobs_compile_c_as_c(tmp_path):
+	(tmp_path / 'build').mkdir()
+	for name in ('x', 'y'):
+		(tmp_path / f'{name}.c').write_text(
+			f'#include <stdlib.h>\nint {name}(void) {{ int class = 1; int *p = malloc(4); free(p); return class; }}\n'
+		)
+	compdb = [_record(name, directory=tmp_path / 'build', suffix='.c', compiler='cc') for name in ('x', 'y')]
+	include_sets = IncludeSets(dep_graph_of_raw_dep_records(
+		RawDepRecord(target=Path(f'{name}.o'), is_valid=True, deps=[Path('/usr/include/stdlib.h')])
+		for name in ('x', 'y')
+	))
+
+	batches = plan_unity_batches(compdb, include_sets, tmp_path / 'unity')
+	assert len(batches) == 1
+	write_unity_sources(batches)
+
+	results = []
+	executor = CommandExecutor(num_parallel_jobs=1, callback=lambda *, result, num_remaining_commands: results.append(result))
+	try:
+		executor.extend_queue(unity_batch_jobs(batches))
+		finish_all(executor)
+	finally:
+		executor.close()
+	assert [x.returncode for x in results] == [0], results[0].stderr
@@ -10,7 +10,7 @@ class CommandTuiState:
 	The TUI state of a command
 	'''
 
-	# The current status of command at present (RUNNING/SUCCEEDED/FAILED)
+	# The current status of command at present (RUNNING/SUCCEEDED/FAILED/CANCELLED)
 	status: ExecutionStatus
 
 	# The index of the latest text from the command